@@ -0,0 +1,120 @@
+# ==============================
+# 🗂️ 模型文件（artifact）发现与加载
+# 功能：找出 models/ 下所有能加载的模型文件，按格式选加载函数，并计算内容哈希
+# 支持的格式：
+#   - .joblib：sklearn 模型 / Pipeline
+#   - .forest.npz：Day 21 导出的拍平森林（CompiledForest）
+#   - .forest/：Day 22 的内存映射目录
+#   - .compact.npz：Day 40 的精简格式（量化、压缩后的拍平森林）
+#   - .linear.npz：Day 41 融合后的线性 Pipeline（同名 .joblib 作为特殊输入的后备）
+# Day 34 的性能基准、Day 14 的评估引擎都用这里的函数，新增格式只需要在 FORMATS 里加一行
+# ==============================
+import hashlib
+import json
+import os
+
+
+def load_joblib(path):
+    import joblib
+    return joblib.load(path)
+
+
+def load_compiled(path):
+    from api.forest import load_compiled_forest
+    return load_compiled_forest(path)
+
+
+def load_compact(path):
+    from api.forest import load_compact_forest
+    return load_compact_forest(path)
+
+
+def load_linear(path):
+    from api.linear import LINEAR_SUFFIX, load_fused_linear
+    fallback_path = path[:-len(LINEAR_SUFFIX)] + ".joblib"
+    return load_fused_linear(path, fallback_path if os.path.exists(fallback_path) else None)
+
+
+def load_mmap(path):
+    from api.forest import load_forest_mmap
+    return load_forest_mmap(path)
+
+
+# (文件名后缀, 格式名, 加载函数)；顺序很重要：.forest.npz 要排在更短的后缀前面判断
+FORMATS = (
+    (".compact.npz", "compact_forest", load_compact),
+    (".linear.npz", "fused_linear", load_linear),
+    (".forest.npz", "compiled_forest", load_compiled),
+    (".forest", "mmap_forest", load_mmap),
+    (".joblib", "joblib", load_joblib),
+)
+LOADERS = {fmt: loader for _, fmt, loader in FORMATS}
+
+
+def discover(models_dir):
+    """返回 [(路径, 格式名)]，按文件名排序"""
+    artifacts = []
+    for name in sorted(os.listdir(models_dir)):
+        path = os.path.join(models_dir, name)
+        for suffix, fmt, _ in FORMATS:
+            if name.endswith(suffix):
+                if fmt != "mmap_forest" or os.path.exists(os.path.join(path, "meta.json")):
+                    artifacts.append((path, fmt))
+                break
+    return artifacts
+
+
+def load_artifact(path, fmt):
+    return LOADERS[fmt](path)
+
+
+def _files(path):
+    """模型文件本身，或者目录里的所有文件（按名字排序）"""
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    return [path]
+
+
+def disk_size(path):
+    return sum(os.path.getsize(f) for f in _files(path))
+
+
+def content_hash(path, index=None):
+    """
+    模型文件内容的 sha256（目录按文件名 + 内容一起算）
+    index 是 {路径: [大小, 修改时间, 哈希]} 的字典：大小和修改时间都没变时直接用记下的哈希，不用重新读文件
+    """
+    files = _files(path)
+    stamp = [sum(os.path.getsize(f) for f in files), max(os.stat(f).st_mtime_ns for f in files)]
+    key = os.path.abspath(path)
+    if index is not None and key in index and index[key][:2] == stamp:
+        return index[key][2]
+
+    digest = hashlib.sha256()
+    for f in files:
+        if len(files) > 1:
+            digest.update(os.path.basename(f).encode() + b"\0")
+        with open(f, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+    value = digest.hexdigest()
+    if index is not None:
+        index[key] = stamp + [value]
+    return value
+
+
+def load_hash_index(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_hash_index(path, index):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, path)
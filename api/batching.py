@@ -0,0 +1,171 @@
+# ==============================
+# 🧺 微批处理调度器（Micro-Batching）
+# 功能：把同一时间到达的多个单条 /predict 请求攒成一批，
+#      每种 task_type 只调用一次 model.predict，再把结果分发回各自的请求
+# ==============================
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from api.metrics import add_timing
+
+
+class QueueFullError(Exception):
+    """排队的请求已达上限（由接口转换成 503）"""
+
+
+class MicroBatcher:
+    """
+    按 task_type 分队列的微批处理器：
+    - 最多等待 max_wait_ms 毫秒，或攒够 max_batch_size 行，就发车
+    - 每个队列最多排 max_queue_size 个请求，超过直接拒绝（背压）
+    - 自适应：最近的批次都只有 1 行时（说明没有并发），不再空等，立刻发车
+    """
+
+    def __init__(self, predict_fn, max_wait_ms=2.0, max_batch_size=64, max_queue_size=1024, stats_window=2048):
+        # predict_fn(task_type, X) 是一个 async 函数，输入二维数组，返回一维预测结果
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self.stats_window = stats_window
+
+        self._queues = {}     # task_type -> asyncio.Queue
+        self._workers = {}    # task_type -> 后台协程 Task
+        self._stats = {}      # task_type -> 统计数据
+
+    # ---------- 对外接口 ----------
+    async def submit(self, task_type, features, timings=None):
+        """
+        提交一行特征，等待所在批次算完后返回这一行的预测值
+        timings 不为空时，把这一行的排队耗时（queue）和所在批次的计算耗时（compute）累加进去
+        """
+        queue = self._get_queue(task_type)
+        future = asyncio.get_running_loop().create_future()
+        try:
+            queue.put_nowait((features, future, time.perf_counter(), timings))
+        except asyncio.QueueFull:
+            self._stats[task_type]["rejected"] += 1
+            raise QueueFullError(f"{task_type} 排队请求已达上限 {self.max_queue_size}")
+        return await future
+
+    async def stop(self):
+        """停止所有后台协程，还在排队的请求直接报错"""
+        for worker in self._workers.values():
+            worker.cancel()
+        for queue in self._queues.values():
+            while not queue.empty():
+                _, future, _, _ = queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("服务正在关闭"))
+        self._workers.clear()
+        self._queues.clear()
+
+    def stats(self):
+        """返回每个任务的排队耗时 / 计算耗时统计，用来在 p99 延迟和吞吐之间调参"""
+        report = {
+            "config": {
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_batch_size": self.max_batch_size,
+                "max_queue_size": self.max_queue_size,
+            }
+        }
+        for task_type, s in self._stats.items():
+            report[task_type] = {
+                "batches": s["batches"],
+                "rows": s["rows"],
+                "rejected": s["rejected"],
+                "queue_depth": self._queues[task_type].qsize() if task_type in self._queues else 0,
+                "avg_batch_size": round(s["rows"] / s["batches"], 2) if s["batches"] else 0.0,
+                "queue_ms": _percentiles(s["queue_ms"]),
+                "compute_ms": _percentiles(s["compute_ms"]),
+            }
+        return report
+
+    # ---------- 内部实现 ----------
+    def _get_queue(self, task_type):
+        # 第一次遇到某个 task_type 时再创建队列和后台协程（必须在事件循环里调用）
+        if task_type not in self._queues:
+            self._queues[task_type] = asyncio.Queue(maxsize=self.max_queue_size)
+            self._stats[task_type] = {
+                "batches": 0,
+                "rows": 0,
+                "rejected": 0,
+                "recent_batch_size": 1.0,   # 批大小的指数滑动平均，用于自适应等待
+                "queue_ms": deque(maxlen=self.stats_window),
+                "compute_ms": deque(maxlen=self.stats_window),
+            }
+            self._workers[task_type] = asyncio.create_task(self._worker(task_type, self._queues[task_type]))
+        return self._queues[task_type]
+
+    async def _worker(self, task_type, queue):
+        loop = asyncio.get_running_loop()
+        stats = self._stats[task_type]
+        while True:
+            # 第一步：阻塞等待第一条请求
+            batch = [await queue.get()]
+
+            # 第二步：把已经在排队的请求全部取出来（不用等）
+            while len(batch) < self.max_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            # 第三步：最近有并发时，最多再等 max_wait 毫秒，凑更大的批
+            if stats["recent_batch_size"] > 1.5:
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+            await self._run_batch(task_type, batch)
+
+    async def _run_batch(self, task_type, batch):
+        stats = self._stats[task_type]
+        # 调用方可能已经断开（future 被取消），这些行不用再算
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        for _, _, enqueued_at, timings in batch:
+            stats["queue_ms"].append((start - enqueued_at) * 1000.0)
+            add_timing(timings, "queue", start - enqueued_at)
+
+        try:
+            X = np.asarray([features for features, _, _, _ in batch], dtype=np.float64)
+            preds = await self.predict_fn(task_type, X)
+        except Exception as e:
+            # 整批失败：每个等待的请求都收到同一个异常
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            compute = time.perf_counter() - start
+            stats["compute_ms"].append(compute * 1000.0)
+            for _, _, _, timings in batch:
+                add_timing(timings, "compute", compute)
+
+        stats["batches"] += 1
+        stats["rows"] += len(batch)
+        stats["recent_batch_size"] = 0.8 * stats["recent_batch_size"] + 0.2 * len(batch)
+
+        # 第四步：把结果按顺序分发回每个请求
+        for (_, future, _, _), pred in zip(batch, preds):
+            if not future.done():
+                future.set_result(pred)
+
+
+def _percentiles(samples):
+    """计算 p50 / p99 / 最大值（毫秒）"""
+    if not samples:
+        return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+    arr = np.fromiter(samples, dtype=np.float64)
+    p50, p99 = np.percentile(arr, [50, 99])
+    return {"p50": round(float(p50), 3), "p99": round(float(p99), 3), "max": round(float(arr.max()), 3)}
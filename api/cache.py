@@ -0,0 +1,143 @@
+# ==============================
+# 🗃️ 预测结果缓存（进程内 LRU + TTL）
+# 功能：同样的特征（按小数位量化后）再次请求时，直接返回上次的预测结果，完全不调用 sklearn
+# - 键：(task_type, 模型版本号, 量化后的特征元组)，模型热更新后版本号变了，旧结果自然失效
+# - LRU：超过条数上限或内存上限时，淘汰最久没用过的
+# - TTL：每条结果最多保存 ttl_seconds 秒
+# 所有缓存后端都实现 CacheBackend 的几个方法，接口层不关心结果存在哪里：
+# - PredictionCache（本文件）：进程内字典，最快，但每个 worker 各存一份
+# - RedisCache（api/redis_cache.py）：走 Redis 协议，同一台机器 / 整个集群的 worker 共用
+# ==============================
+import sys
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def quantize_rows(X, decimals):
+    """把二维特征数组按小数位四舍五入，每行变成一个元组（可以当字典的键）"""
+    X = np.asarray(X, dtype=np.float64)
+    if decimals is not None:
+        X = np.round(X, decimals)
+    return [tuple(row) for row in X.tolist()]
+
+
+def _entry_bytes(key):
+    """粗略估算一条缓存占用的内存：键元组 + 里面的浮点数 + 字典 / 链表节点的开销"""
+    features = key[2]
+    return sys.getsizeof(features) + 24 * len(features) + 160
+
+
+class CacheBackend(ABC):
+    """
+    预测缓存后端的接口：按批查询 / 写入，一次调用处理一整批键，避免逐条往返
+    少实现了哪个方法，创建实例时就会报 TypeError（而不是等到第一次用到才出错）
+    """
+    decimals = 6
+    blocking = False   # get_many / put_many 会不会阻塞在网络往返上（是的话接口层放到线程池里调用）
+
+    def make_keys(self, task_type, version, X):
+        """把特征矩阵变成缓存键列表，模型版本号是键的一部分"""
+        return [(task_type, version, row) for row in quantize_rows(X, self.decimals)]
+
+    @abstractmethod
+    def get_many(self, keys):
+        """批量查询，返回和 keys 等长的列表，没命中的位置是 None"""
+
+    @abstractmethod
+    def put_many(self, keys, values):
+        """批量写入"""
+
+    @abstractmethod
+    def invalidate(self, task_type):
+        """模型热更新后调用，清掉这个任务的旧结果"""
+
+    @abstractmethod
+    def stats(self):
+        """命中率等统计信息（/cache/stats）"""
+
+
+class PredictionCache(CacheBackend):
+    def __init__(self, max_entries=100_000, max_bytes=64 * 1024 * 1024, ttl_seconds=300.0, decimals=6):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+
+        self._data = OrderedDict()   # 键 -> (预测值, 过期时间, 估算字节数)；越靠后越是最近用过的
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0           # 因为条数 / 内存上限被淘汰
+        self.expirations = 0         # 因为超过 TTL 被丢弃
+        self.invalidations = 0       # 因为模型换版本被清掉
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                elif entry[1] < now:
+                    self._remove(key)
+                    self.expirations += 1
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._data.move_to_end(key)   # 标记为最近用过
+                    self.hits += 1
+                    results.append(entry[0])
+        return results
+
+    def put_many(self, keys, values):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, value in zip(keys, values):
+                if key in self._data:
+                    self._remove(key)
+                size = _entry_bytes(key)
+                self._data[key] = (value, expires_at, size)
+                self._bytes += size
+            # 超出上限时，从最久没用过的开始淘汰
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, task_type):
+        """清掉某个任务的全部缓存（模型热更新后调用，立刻释放旧版本结果占的内存）"""
+        with self._lock:
+            stale = [key for key in self._data if key[0] == task_type]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "entries": len(self._data),
+            "approx_mb": round(self._bytes / 1024 / 1024, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "config": {
+                "max_entries": self.max_entries,
+                "max_mb": round(self.max_bytes / 1024 / 1024, 2),
+                "ttl_seconds": self.ttl_seconds,
+                "decimals": self.decimals,
+            },
+        }
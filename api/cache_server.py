@@ -0,0 +1,159 @@
+# ==============================
+# 🗄️ 本地共享缓存服务（Redis 协议的小替身）
+# 功能：在同一台机器上起一个很小的缓存进程，所有 uvicorn worker 通过 Unix socket 共用
+#      没有 Redis 的环境（本地开发、单机 Docker）也能用共享缓存，api/redis_cache.py 不用改任何代码
+# - 支持的命令：PING GET MGET SET（EX / PX）DEL DBSIZE FLUSHDB SELECT INFO
+# - 条数超过上限时淘汰最久没用过的（LRU），过期的键在读到时清掉
+# 启动：
+#   python -m api.cache_server --unix /tmp/prediction-cache.sock
+#   python -m api.cache_server --port 6379
+# ==============================
+import argparse
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+
+class CacheStore:
+    """键 -> (值, 过期时间)，越靠后越是最近用过的"""
+
+    def __init__(self, max_entries=1_000_000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl_ms=None):
+        self._data.pop(key, None)
+        self._data[key] = (value, time.monotonic() + ttl_ms / 1000 if ttl_ms else None)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, keys):
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def info(self):
+        return (
+            f"keys:{len(self._data)}\r\nhits:{self.hits}\r\nmisses:{self.misses}\r\n"
+            f"evictions:{self.evictions}\r\nmax_entries:{self.max_entries}\r\n"
+        )
+
+
+def _bulk(value):
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _error(message):
+    return f"-ERR {message}\r\n".encode()
+
+
+def handle_command(store, args):
+    """执行一条命令，返回编码好的 RESP 回复"""
+    name = args[0].upper()
+    if name == b"PING":
+        return b"+PONG\r\n"
+    if name == b"GET" and len(args) == 2:
+        return _bulk(store.get(args[1]))
+    if name == b"MGET" and len(args) >= 2:
+        values = [_bulk(store.get(key)) for key in args[1:]]
+        return b"*%d\r\n" % len(values) + b"".join(values)
+    if name == b"SET" and len(args) >= 3:
+        ttl_ms = None
+        options = [a.upper() for a in args[3:]]
+        if len(options) == 2 and options[0] in (b"EX", b"PX"):
+            ttl_ms = int(options[1]) * (1000 if options[0] == b"EX" else 1)
+        elif options:
+            return _error("SET 只支持 EX / PX 选项")
+        store.set(args[1], args[2], ttl_ms)
+        return b"+OK\r\n"
+    if name == b"DEL" and len(args) >= 2:
+        return b":%d\r\n" % store.delete(args[1:])
+    if name == b"DBSIZE":
+        return b":%d\r\n" % len(store._data)
+    if name == b"FLUSHDB":
+        store._data.clear()
+        return b"+OK\r\n"
+    if name == b"SELECT":
+        return b"+OK\r\n"   # 只有一个库，SELECT 直接忽略
+    if name == b"INFO":
+        return _bulk(store.info().encode())
+    return _error(f"不支持的命令或参数个数不对: {name.decode(errors='replace')}")
+
+
+async def read_command(reader):
+    """读出一条 RESP 数组命令；连接关闭时返回 None"""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()   # 兼容 redis-cli / telnet 的内联命令，例如 "PING\r\n"
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readline()
+        length = int(header[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def make_handler(store):
+    async def handle_client(reader, writer):
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                writer.write(handle_command(store, args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    return handle_client
+
+
+async def serve(unix_path=None, host="127.0.0.1", port=6379, max_entries=1_000_000):
+    store = CacheStore(max_entries=max_entries)
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)   # 上次异常退出留下的 socket 文件
+        server = await asyncio.start_unix_server(make_handler(store), path=unix_path)
+        print(f"🗄️ 共享缓存服务已启动: unix://{unix_path}（最多 {max_entries} 条）")
+    else:
+        server = await asyncio.start_server(make_handler(store), host=host, port=port)
+        print(f"🗄️ 共享缓存服务已启动: redis://{host}:{port}（最多 {max_entries} 条）")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地共享预测缓存（Redis 协议）")
+    parser.add_argument("--unix", help="Unix socket 路径，例如 /tmp/prediction-cache.sock")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--max-entries", type=int, default=1_000_000)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.unix, args.host, args.port, args.max_entries))
+    except KeyboardInterrupt:
+        print("👋 共享缓存服务已停止")
@@ -0,0 +1,68 @@
+# ==============================
+# 🔎 详细预测输出：类别概率、top-k、随机森林的树间分歧
+# 功能：一次前向计算同时得到点预测和这些额外信息，点预测直接从这次计算里取，不再单独调用一次 predict
+# - 分类器：只调用一次 predict_proba，预测类别就是概率最大的类（和 predict 的结果一样），top-k 按概率排序
+# - 随机森林：每棵树的预测只算一次（predict 内部本来也要算），按树的顺序累加再除以树数就是点预测
+#   （和 predict 逐位相同），同一批数字再算标准差和分位数作为不确定性
+# - 其他回归模型：只有点预测
+# 所以详细输出相对普通预测只多了几次向量运算，批量请求也一样
+# ==============================
+import numpy as np
+
+
+def tree_predictions(model, X):
+    """
+    随机森林每棵树的预测，形状 (n_rows, n_trees)；不是随机森林时返回 None
+    支持 CompiledForest / FastPathRegressor（api/forest.py）和 sklearn 的 RandomForestRegressor
+    """
+    if hasattr(model, "tree_predictions"):
+        return model.tree_predictions(X)
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None or getattr(model, "n_outputs_", 1) != 1:
+        return None
+    # 和 RandomForestRegressor.predict 一样：先转成 float32，再逐棵树预测
+    X32 = np.asarray(X, dtype=np.float32)
+    per_tree = np.empty((X32.shape[0], len(estimators)))
+    for j, tree in enumerate(estimators):
+        per_tree[:, j] = tree.predict(X32, check_input=False)
+    return per_tree
+
+
+def predict_details(model, X, top_k=None):
+    """
+    返回 dict（每个值都是按行排列的数组）：
+    - 分类器：prediction（类别）、classes（proba 每一列对应的类别）、proba（n, 类别数）、
+      top_k（n, k，按概率从大到小的列下标）
+    - 随机森林：prediction、std（树间标准差）、p10 / p90（树的预测的分位数）
+    - 其他：只有 prediction
+    """
+    if hasattr(model, "predict_proba") and getattr(model, "classes_", None) is not None:
+        proba = np.asarray(model.predict_proba(X))
+        best = proba.argmax(axis=1)
+        k = proba.shape[1] if top_k is None else max(1, min(top_k, proba.shape[1]))
+        # 稳定排序：概率相同时编号小的类排前面（和 argmax 的选择一致）
+        order = np.argsort(-proba, axis=1, kind="stable")[:, :k]
+        classes = np.asarray(model.classes_)
+        return {"prediction": classes[best], "classes": classes, "proba": proba, "top_k": order}
+
+    per_tree = tree_predictions(model, X)
+    if per_tree is None:
+        return {"prediction": np.asarray(model.predict(X))}
+    # cumsum 严格按树的顺序累加（和 sklearn 一样），np.mean 用成对求和，末位可能不同
+    prediction = np.cumsum(per_tree, axis=1)[:, -1] / per_tree.shape[1]
+    spread = np.sort(per_tree, axis=1)
+    return {
+        "prediction": prediction,
+        "std": per_tree.std(axis=1),
+        "p10": _percentile_of_sorted(spread, 10),
+        "p90": _percentile_of_sorted(spread, 90),
+    }
+
+
+def _percentile_of_sorted(sorted_rows, q):
+    """每行已经排好序时的分位数（线性插值，和 np.percentile 默认方法一样，但单行时快得多）"""
+    position = q / 100 * (sorted_rows.shape[1] - 1)
+    lower = int(position)
+    upper = min(lower + 1, sorted_rows.shape[1] - 1)
+    fraction = position - lower
+    return sorted_rows[:, lower] + (sorted_rows[:, upper] - sorted_rows[:, lower]) * fraction
@@ -0,0 +1,110 @@
+# ==============================
+# 🏭 专用推理执行器
+# 功能：把 model.predict 放到专门的线程池 / 进程池里执行，
+#      每种 task_type 各用各的池子，互不抢占；排队太多时直接拒绝（503）
+# ==============================
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from api.details import predict_details
+from api.loaders import LOADERS
+from api.metrics import add_timing, timed_call
+
+
+class ExecutorSaturatedError(Exception):
+    """某个任务的推理池已满（由接口转换成 503 + Retry-After）"""
+
+
+# 进程池模式下，每个子进程自己缓存加载好的模型：路径 -> (版本号, 模型)
+# 主进程热更新换了版本后，子进程下次收到新版本号时会重新加载
+_process_models = {}
+
+
+def _predict_in_process(task_type, model_path, version, X, details=False, top_k=None):
+    """
+    在子进程里执行：按路径加载模型（同一版本只加载一次），然后预测（details=True 时返回详细输出）
+    加载用的是和注册表相同的 api/loaders.py（子进程继承主进程的环境变量），
+    所以内存映射 / 精简格式 / 融合模型在子进程里同样生效，和线程模式的预测结果一致
+    """
+    cached = _process_models.get(model_path)
+    if cached is None or cached[0] != version:
+        cached = (version, LOADERS[task_type](model_path))
+        _process_models[model_path] = cached
+    if details:
+        return predict_details(cached[1], X, top_k)
+    return cached[1].predict(X)
+
+
+class InferenceExecutor:
+    """
+    每个 task_type 一个独立的池：
+    - kind="thread"：线程池（sklearn 预测大部分时间在 C 代码里，会释放 GIL）
+    - kind="process"：进程池（完全绕开 GIL，模型在子进程里按同样的方式各加载一份；MODEL_MMAP=1 时共享同一份）
+    - 同一任务最多 workers + max_pending 个请求在池里（运行 + 排队），再多就拒绝
+    """
+
+    def __init__(self, kind="thread", workers=None, max_pending=32):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"不支持的执行器类型: {kind}（只能是 thread 或 process）")
+        self.kind = kind
+        self.workers = workers or {"iris": 2, "housing": 2}
+        self.max_pending = max_pending
+        self._pools = {}
+        self._inflight = {task_type: 0 for task_type in self.workers}
+        self._rejected = {task_type: 0 for task_type in self.workers}
+
+        for task_type, n in self.workers.items():
+            if kind == "thread":
+                self._pools[task_type] = ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"infer-{task_type}")
+            else:
+                # 用 spawn 启动子进程，避免在事件循环运行中 fork 带来的问题
+                self._pools[task_type] = ProcessPoolExecutor(
+                    max_workers=n, mp_context=multiprocessing.get_context("spawn")
+                )
+
+    async def predict(self, task_type, model, model_path, version, X, timings=None, details=False, top_k=None):
+        """
+        对二维数组 X 做一次预测；线程模式直接用 model，进程模式用 model_path + 版本号在子进程里加载
+        timings 不为空时，把在池里的排队耗时（queue）和预测耗时（compute）累加进去
+        details=True 时返回 api/details.py 的详细输出（概率 / top-k / 树间分歧）
+        """
+        limit = self.workers[task_type] + self.max_pending
+        if self._inflight[task_type] >= limit:
+            self._rejected[task_type] += 1
+            raise ExecutorSaturatedError(f"{task_type} 推理池已满（{limit} 个请求在处理中），请稍后重试")
+
+        self._inflight[task_type] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            submitted = time.perf_counter()
+            # perf_counter 在 Linux 上是系统级单调时钟，子进程里取的时间也能直接相减
+            if self.kind == "thread":
+                call = (timed_call, predict_details, model, X, top_k) if details else (timed_call, model.predict, X)
+            else:
+                call = (timed_call, _predict_in_process, task_type, model_path, version, X, details, top_k)
+            preds, started, finished = await loop.run_in_executor(self._pools[task_type], *call)
+            add_timing(timings, "queue", started - submitted)
+            add_timing(timings, "compute", finished - started)
+            return preds
+        finally:
+            self._inflight[task_type] -= 1
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "max_pending": self.max_pending,
+            "tasks": {
+                task_type: {
+                    "workers": self.workers[task_type],
+                    "inflight": self._inflight[task_type],
+                    "rejected": self._rejected[task_type],
+                }
+                for task_type in self.workers
+            },
+        }
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
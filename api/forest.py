@@ -0,0 +1,464 @@
+# ==============================
+# 🌲 随机森林快速预测（Compiled Forest）
+# 功能：把训练好的 RandomForestRegressor 拍平成几个连续的 NumPy 数组
+#      （特征、阈值、左右子节点、叶子值），预测时所有树一起向下走，
+#      不再逐棵树调用 sklearn，结果与 best_model.predict 完全一致（逐位相同）
+# ==============================
+import json
+import os
+import threading
+
+import numpy as np
+
+# 推理时真正用到的数组（“位置”布局），内存映射目录里每个数组存成一个 .npy
+RUNTIME_ARRAYS = ("children", "feature", "threshold", "missing_go_to_left", "value", "roots")
+
+
+def export_forest(model):
+    """
+    把 RandomForestRegressor 拍平成一个 dict（全是 NumPy 数组），方便 np.savez 保存
+    - 所有树的节点首尾相接放在同一组数组里，roots 记录每棵树根节点的位置
+    - left / right 是全局节点编号，叶子节点为 -1（和 sklearn 一样）
+    """
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None or getattr(model, "n_outputs_", 1) != 1:
+        raise TypeError("只支持已训练好的单输出 RandomForestRegressor")
+
+    features, thresholds, lefts, rights, values, missing_left, roots = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in estimators:
+        tree = est.tree_
+        is_leaf = tree.children_left == -1
+        features.append(tree.feature)
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+        values.append(tree.value[:, 0, 0])
+        missing_left.append(tree.missing_go_to_left)
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values).astype(np.float64),
+        "missing_go_to_left": np.concatenate(missing_left).astype(bool),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "max_depth": np.int64(max_depth),
+        "n_features": np.int64(model.n_features_in_),
+    }
+
+
+def save_compiled_forest(model, path):
+    """导出并保存为 .npz（不压缩，加载快）"""
+    np.savez(path, **export_forest(model))
+
+
+def load_compiled_forest(path):
+    """从 .npz 加载一个 CompiledForest"""
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    return CompiledForest.from_export(arrays)
+
+
+def save_forest_mmap(forest, directory):
+    """
+    把 CompiledForest 的推理数组逐个存成 .npy（.npz 是压缩包，没法内存映射）
+    多个 uvicorn worker 用 mmap_mode='r' 加载同一个目录时，共用操作系统页缓存里的同一份数据
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in RUNTIME_ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), getattr(forest, name))
+    meta = {"max_depth": forest.max_depth, "n_features": forest.n_features_in_}
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def load_forest_mmap(directory, mmap_mode="r"):
+    """从 save_forest_mmap 保存的目录加载（默认只读内存映射，不复制到进程私有内存）"""
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in RUNTIME_ARRAYS}
+    return CompiledForest(max_depth=meta["max_depth"], n_features=meta["n_features"], **arrays)
+
+
+# ==============================
+# 精简格式（.compact.npz）：只存推理需要的数组，并尽量用小类型
+# - 阈值：向下取整成 float32（sklearn 预测前会把 X 转成 float32，对 float32 输入 x <= t 的结果完全不变，所以不损失精度）；
+#         阈值重复很多时（例如真实数据里的房龄、经纬度）再换成每个特征阈值表里的 uint16 下标
+# - 左孩子不存（深度优先顺序里左孩子总是下一个节点），右孩子存成树内下标；
+#   阈值、右孩子、缺失值方向只给分裂节点存，叶子值只给叶子存
+# - 叶子值：float64 / float32 / int16（线性量化：value = offset + (q + 32768) * scale），只有这一项会改变预测
+# - 剪枝：祖先节点的条件已经决定走向的分支删掉（走不到的节点），两个孩子是同值叶子的节点合并成叶子
+# - 用 np.savez_compressed 压缩
+# ==============================
+COMPACT_SUFFIX = ".compact.npz"
+VALUE_DTYPES = ("float64", "float32", "int16")
+
+
+def _round_down_float32(values):
+    """不大于原值的最大 float32：对任意 float32 输入 x，x <= 结果 和 x <= 原值 等价"""
+    rounded = values.astype(np.float32)
+    over = rounded.astype(np.float64) > values
+    rounded[over] = np.nextafter(rounded[over], np.float32(-np.inf))
+    return rounded
+
+
+def _compact_tree(tree, thresholds, values, prune):
+    """
+    把一棵 sklearn 树按深度优先顺序重新编号，返回 (feature, threshold, right, missing_go_to_left, 叶子值, 最大深度, 剪掉的节点数)
+    thresholds / values 是已经取整 / 量化好的整棵树的数组；feature 每个节点一个（叶子为 -1），
+    threshold / right（树内下标）/ missing_go_to_left 只有分裂节点有
+    """
+    left, right, feature = tree.children_left, tree.children_right, tree.feature
+    missing_left = tree.missing_go_to_left.astype(bool)
+
+    def build(node, bounds):
+        # 返回 ("leaf", 值) 或 ("split", 节点编号, 左子树, 右子树)
+        if left[node] == -1:
+            return ("leaf", values[node])
+        f, t = feature[node], thresholds[node]
+        if prune:
+            lo, hi = bounds.get(f, (-np.inf, np.inf))   # 这个特征在当前节点的取值范围 (lo, hi]
+            # 缺失值走的那一边必须保留，否则带 NaN 的输入结果会变
+            if t >= hi and missing_left[node]:
+                return build(left[node], bounds)        # 右边走不到
+            if t <= lo and not missing_left[node]:
+                return build(right[node], bounds)       # 左边走不到
+            left_sub = build(left[node], {**bounds, f: (lo, min(hi, t))})
+            right_sub = build(right[node], {**bounds, f: (max(lo, t), hi)})
+            if left_sub[0] == "leaf" and right_sub[0] == "leaf" and left_sub[1] == right_sub[1]:
+                return left_sub                          # 两边预测一样，不用再分
+        else:
+            left_sub, right_sub = build(left[node], bounds), build(right[node], bounds)
+        return ("split", node, left_sub, right_sub)
+
+    out_feature, out_threshold, out_right, out_missing, leaf_values = [], [], [], [], []
+    max_depth = 0
+    stack = [(build(0, {}), 0, None)]   # (子树, 深度, 需要回填右孩子的父节点下标)
+    while stack:
+        sub, depth, parent = stack.pop()
+        index = len(out_feature)
+        if parent is not None:
+            out_right[parent] = index   # parent 是父节点在分裂节点里的序号
+        max_depth = max(max_depth, depth)
+        if sub[0] == "leaf":
+            out_feature.append(-1)
+            leaf_values.append(sub[1])
+        else:
+            _, node, left_sub, right_sub = sub
+            out_feature.append(feature[node])
+            out_threshold.append(thresholds[node])
+            out_right.append(0)
+            out_missing.append(missing_left[node])
+            stack.append((right_sub, depth + 1, len(out_right) - 1))   # 右子树后处理，左孩子就是下一个节点
+            stack.append((left_sub, depth + 1, None))
+    n_pruned = tree.node_count - len(out_feature)
+    return out_feature, out_threshold, out_right, out_missing, leaf_values, max_depth, n_pruned
+
+
+def _smallest_uint(max_value):
+    return np.uint16 if max_value <= np.iinfo(np.uint16).max else np.int32
+
+
+def export_compact_forest(model, value_dtype="float32", threshold_index="auto", prune=True):
+    """
+    把 RandomForestRegressor 导出成精简格式的数组 dict（见上面的说明），返回 (arrays, 统计信息)
+    - value_dtype：叶子值的存储类型，float64 不损失精度，float32 / int16 有很小的量化误差
+    - threshold_index：阈值存成每个特征阈值表里的 uint16 下标；"auto" 时只在阈值表不到分裂节点数一半时使用
+      （下标 2 字节 + 阈值表，比每个节点 4 字节的 float32 更小）；某个特征的不同阈值超过 65536 个时不能使用
+    """
+    if value_dtype not in VALUE_DTYPES:
+        raise ValueError(f"value_dtype 只能是 {VALUE_DTYPES}")
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None or getattr(model, "n_outputs_", 1) != 1:
+        raise TypeError("只支持已训练好的单输出 RandomForestRegressor")
+
+    all_values = np.concatenate([est.tree_.value[:, 0, 0] for est in estimators])
+    value_offset, value_scale = float(all_values.min()), float(np.ptp(all_values)) / 65535 or 1.0
+
+    def quantize(v):
+        if value_dtype == "float64":
+            return v
+        if value_dtype == "float32":
+            return v.astype(np.float32)
+        return (np.round((v - value_offset) / value_scale) - 32768).astype(np.int16)
+
+    features, thresholds, rights, missing, leaf_values, node_counts = [], [], [], [], [], []
+    max_depth = n_pruned = n_nodes = 0
+    for est in estimators:
+        tree = est.tree_
+        n_nodes += tree.node_count
+        f, t, r, m, v, depth, pruned = _compact_tree(
+            tree, _round_down_float32(tree.threshold), quantize(tree.value[:, 0, 0]), prune)
+        features += f
+        thresholds += t
+        rights += r
+        missing += m
+        leaf_values += v
+        node_counts.append(len(f))
+        max_depth = max(max_depth, depth)
+        n_pruned += pruned
+
+    feature = np.asarray(features, dtype=np.int8 if model.n_features_in_ < 128 else np.int16)
+    threshold = np.asarray(thresholds, dtype=np.float32)
+    arrays = {
+        "feature": feature,
+        "right": np.asarray(rights, dtype=_smallest_uint(max(node_counts))),
+        "missing_go_to_left": np.packbits(np.asarray(missing, dtype=bool)),
+        "leaf_value": np.asarray(leaf_values, dtype=value_dtype),
+        "node_counts": np.asarray(node_counts, dtype=np.int32),
+        "value_offset": np.float64(value_offset),
+        "value_scale": np.float64(value_scale),
+        "max_depth": np.int64(max_depth),
+        "n_features": np.int64(model.n_features_in_),
+    }
+
+    # 阈值表：每个特征用到的不同阈值（排好序），节点里只存下标
+    split_feature = feature[feature >= 0]
+    tables = [np.unique(threshold[split_feature == j]) for j in range(model.n_features_in_)]
+    table_size = sum(len(table) for table in tables)
+    if threshold_index == "auto":
+        threshold_index = table_size < len(threshold) / 2
+    if threshold_index and max(len(table) for table in tables) <= 65536:
+        index = np.zeros(len(threshold), dtype=np.uint16)
+        for j, table in enumerate(tables):
+            mask = split_feature == j
+            index[mask] = np.searchsorted(table, threshold[mask])
+        arrays["threshold_index"] = index
+        arrays["threshold_table"] = np.concatenate(tables)
+        arrays["threshold_table_sizes"] = np.asarray([len(table) for table in tables], dtype=np.int64)
+    else:
+        arrays["threshold"] = threshold
+
+    stats = {
+        "n_trees": len(estimators), "n_nodes": n_nodes, "n_nodes_pruned": n_pruned, "max_depth": max_depth,
+        "threshold_encoding": "uint16_index" if "threshold_index" in arrays else "float32",
+    }
+    return arrays, stats
+
+
+def save_compact_forest(model, path, compress=True, **options):
+    """导出并保存为精简格式（默认压缩）；options 传给 export_compact_forest，返回统计信息"""
+    arrays, stats = export_compact_forest(model, **options)
+    (np.savez_compressed if compress else np.savez)(path, **arrays)
+    return stats
+
+
+def load_compact_forest(path):
+    """
+    从精简格式加载一个 CompiledForest（叶子值还原成 float64，阈值还原成 float32 取值）
+    直接生成 CompiledForest 的“位置”布局（见下面的类说明），不经过 from_export 的中间数组
+    """
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+
+    feature = arrays["feature"]
+    n_nodes = len(feature)
+    is_leaf = feature < 0
+    node_counts = arrays["node_counts"].astype(np.int64)
+    roots = np.cumsum(node_counts) - node_counts
+    split_ids = np.flatnonzero(~is_leaf)
+    split_feature = feature[split_ids].astype(np.int64)
+    split_right = arrays["right"].astype(np.int64) + np.repeat(roots, node_counts)[split_ids]
+
+    if "threshold_index" in arrays:
+        starts = np.cumsum(arrays["threshold_table_sizes"]) - arrays["threshold_table_sizes"]
+        split_threshold = arrays["threshold_table"][starts[split_feature] + arrays["threshold_index"]]
+    else:
+        split_threshold = arrays["threshold"]
+
+    leaf_value = arrays["leaf_value"]
+    if leaf_value.dtype == np.int16:
+        leaf_value = arrays["value_offset"] + (leaf_value.astype(np.float64) + 32768) * arrays["value_scale"]
+    value = np.zeros(n_nodes)
+    value[is_leaf] = leaf_value
+
+    # 分裂节点的两个位置：2i（比较为 False，走右边）和 2i + 1（比较为 True，走左边，左孩子就是下一个节点）
+    left_pos, right_pos = 2 * split_ids + 1, 2 * split_ids
+    children = np.repeat(2 * np.arange(n_nodes, dtype=np.int64), 2)   # 叶子指向自己
+    children[right_pos] = 2 * split_right
+    children[left_pos] = 2 * (split_ids + 1)
+    feature_pos = np.zeros(2 * n_nodes, dtype=np.int64)
+    threshold_pos = np.full(2 * n_nodes, np.inf)
+    missing_pos = np.zeros(2 * n_nodes, dtype=bool)
+    split_missing = np.unpackbits(arrays["missing_go_to_left"], count=len(split_ids)).astype(bool)
+    for pos in (left_pos, right_pos):
+        feature_pos[pos] = split_feature
+        threshold_pos[pos] = split_threshold
+        missing_pos[pos] = split_missing
+
+    return CompiledForest(
+        children=children,
+        feature=feature_pos,
+        threshold=threshold_pos,
+        missing_go_to_left=missing_pos,
+        value=value,
+        roots=2 * roots,
+        max_depth=arrays["max_depth"],
+        n_features=arrays["n_features"],
+    )
+
+
+class CompiledForest:
+    """
+    拍平后的随机森林，predict 的输入输出和 sklearn 一样
+    内部查表方式：用 2 * 节点编号 作为“位置”，
+      children[位置 + 比较结果] 就是下一层的位置（比较为 True 走左边，False 走右边），
+      这样每往下走一层只需要几次数组索引
+    大批量按 block_rows 行一块依次计算：临时数组（每行每棵树一个位置）的大小固定，
+    不随请求行数增长，也能留在 CPU 缓存里
+    """
+    block_rows = 1024   # 实测 1k 行一块最快（4k / 16k 行时临时数组放不进缓存，反而慢一些）
+
+    def __init__(self, children, feature, threshold, missing_go_to_left, value, roots, max_depth, n_features):
+        self.children = children
+        self.feature = feature
+        self.threshold = threshold
+        self.missing_go_to_left = missing_go_to_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.n_estimators = len(roots)
+
+    @classmethod
+    def from_export(cls, arrays):
+        """从 export_forest 的结果（feature / threshold / left / right / value）构建查表数组"""
+        feature = arrays["feature"]
+        left = arrays["left"].astype(np.int64)
+        right = arrays["right"].astype(np.int64)
+        is_leaf = left == -1
+        node_ids = np.arange(len(feature), dtype=np.int64)
+
+        # 叶子：左右孩子都指向自己，走到叶子后再多走几层也不会动
+        left = np.where(is_leaf, node_ids, left)
+        right = np.where(is_leaf, node_ids, right)
+        children = np.empty(2 * len(feature), dtype=np.int64)
+        children[0::2] = 2 * right
+        children[1::2] = 2 * left
+        # 特征、阈值按“位置”存两份，叶子的阈值设成 +inf
+        return cls(
+            children=children,
+            feature=np.repeat(np.where(is_leaf, 0, feature).astype(np.int64), 2),
+            threshold=np.repeat(np.where(is_leaf, np.inf, arrays["threshold"]), 2),
+            missing_go_to_left=np.repeat(arrays["missing_go_to_left"], 2),
+            value=np.ascontiguousarray(arrays["value"], dtype=np.float64),
+            roots=2 * np.asarray(arrays["roots"], dtype=np.int64),
+            max_depth=arrays["max_depth"],
+            n_features=arrays["n_features"],
+        )
+
+    @property
+    def nbytes(self):
+        """推理时实际占用的内存（字节）"""
+        return sum(getattr(self, name).nbytes for name in RUNTIME_ARRAYS)
+
+    def _check_input(self, X):
+        # sklearn 预测前会把 X 转成 float32，这里保持一致才能逐位相同
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"需要形状为 (n, {self.n_features_in_}) 的二维数组，但收到了 {X.shape}")
+        return X
+
+    def _blocks(self, X):
+        """按 block_rows 行一块，依次返回 (这一块在 X 里的切片, 这一块的叶子位置)"""
+        for start in range(0, X.shape[0], self.block_rows):
+            rows = slice(start, min(start + self.block_rows, X.shape[0]))
+            yield rows, self._apply_block(np.ascontiguousarray(X[rows]))
+
+    def _apply_block(self, X):
+        """一块数据（float32，C 连续）在每棵树里落到的叶子“位置”（2 * 节点编号），形状 (n_rows, n_trees) 或单行时 (n_trees,)"""
+        has_nan = bool(np.isnan(X).any())
+        flat_X = X.ravel()
+        if X.shape[0] == 1:
+            # 单行：用一维数组走树，不需要行偏移，每层少做一次加法（延迟最低）
+            row_offset = None
+            pos = self.roots
+        else:
+            row_offset = (np.arange(X.shape[0], dtype=np.int64) * self.n_features_in_)[:, None]
+            pos = np.broadcast_to(self.roots, (X.shape[0], self.n_estimators))
+
+        # 所有行、所有树同时往下走一层，最多走 max_depth 层
+        for _ in range(self.max_depth):
+            idx = self.feature[pos]
+            if row_offset is not None:
+                idx += row_offset
+            x = flat_X[idx]
+            go_left = x <= self.threshold[pos]
+            if has_nan:
+                # 缺失值按训练时记录的方向走（和 sklearn 一致）
+                go_left |= np.isnan(x) & self.missing_go_to_left[pos]
+            pos = self.children[pos + go_left]
+        return pos
+
+    def apply(self, X):
+        """返回每一行在每棵树里落到的叶子编号，形状 (n_rows, n_trees)"""
+        X = self._check_input(X)
+        leaves = np.empty((X.shape[0], self.n_estimators), dtype=np.int64)
+        for rows, pos in self._blocks(X):
+            leaves[rows] = pos >> 1
+        return leaves
+
+    def tree_predictions(self, X):
+        """每棵树的预测，形状 (n_rows, n_trees)（详细输出用它算树间分歧，见 api/details.py）"""
+        X = self._check_input(X)
+        per_tree = np.empty((X.shape[0], self.n_estimators))
+        for rows, pos in self._blocks(X):
+            per_tree[rows] = self.value[pos >> 1]
+        return per_tree
+
+    def predict(self, X):
+        X = self._check_input(X)
+        preds = np.empty(X.shape[0])
+        for rows, pos in self._blocks(X):
+            # sklearn 是按树的顺序逐棵累加再除以树的数量；
+            # cumsum 也是严格按顺序累加（np.sum 用的是成对求和，末位可能不同）
+            leaf_values = np.atleast_2d(self.value[pos >> 1])
+            preds[rows] = np.cumsum(leaf_values, axis=1)[:, -1] / self.n_estimators
+        return preds
+
+
+class FastPathRegressor:
+    """
+    小批量（单条请求、微批）走 CompiledForest，延迟最低；
+    大批量交回 sklearn（几百行以上时 sklearn 的 Cython 逐行遍历反而更快）
+    两条路径结果逐位相同，调用方无感知
+    model 可以是 None + model_path（sklearn 森林的 .joblib）：第一次遇到大批量时才加载（内存映射 / 精简格式加载时用）
+    """
+
+    def __init__(self, model, compiled, max_rows=64, model_path=None):
+        self._model = model
+        self.model_path = model_path
+        self.compiled = compiled
+        self.max_rows = max_rows
+        self.n_features_in_ = compiled.n_features_in_
+        self._lock = threading.Lock()   # 几十 MB 的森林，并发的大批量请求只加载一次
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    if self.model_path is None:
+                        raise ValueError(f"超过 {self.max_rows} 行的批量需要 sklearn 模型，但没有提供 model_path")
+                    import joblib
+                    self._model = joblib.load(self.model_path)
+        return self._model
+
+    def predict(self, X):
+        X = np.asarray(X)
+        if X.ndim == 2 and X.shape[0] <= self.max_rows:
+            return self.compiled.predict(X)
+        return self.model.predict(X)
+
+    def tree_predictions(self, X):
+        X = np.asarray(X)
+        if X.ndim == 2 and X.shape[0] <= self.max_rows:
+            return self.compiled.tree_predictions(X)
+        from api.details import tree_predictions
+        return tree_predictions(self.model, X)
@@ -0,0 +1,107 @@
+# ==============================
+# 📦 模型加载方式（接口进程和推理子进程共用）
+# 功能：按环境变量决定每个模型怎么加载——融合的线性模型、内存映射 / 精简格式的随机森林、sklearn 原模型 + 快速路径
+# 注册表（api/main.py）和进程池模式的推理子进程（api/executor.py）都从这里加载，
+# 所以同一组环境变量下，两边用的是同一种模型，预测结果也完全一样
+# 本文件不导入 FastAPI，也不导入 sklearn（joblib 在加载函数里才导入）
+# ==============================
+import os
+
+from api.forest import COMPACT_SUFFIX, FastPathRegressor, load_compact_forest, load_compiled_forest, load_forest_mmap
+from api.linear import LINEAR_SUFFIX, FusedLinearModel, check_equivalence, load_fused_linear, probe_rows
+
+# 对应的拍平森林文件和目录（可选）：
+# - day21_export_compiled_forest.py 导出的 <文件名>.forest.npz
+# - day22_save_models_mmap.py 保存的内存映射目录 <文件名>.forest/
+# - day40_export_compact_forest.py 导出的精简格式 <文件名>.compact.npz
+FOREST_SUFFIX = ".forest"
+
+# HOUSING_COMPACT=1：房价模型直接加载精简格式（几 MB，不用反序列化几十 MB 的 sklearn 森林）；
+# 叶子值量化过时预测和原模型有很小的差别，导出时已经检查过在容差以内；
+# 所有批量大小都用精简格式（同一行不管在多大的批量里，预测都一样），不需要 .joblib，镜像里可以不放它
+# （models/ 里没有 .joblib 时，注册表直接按 .compact.npz 的文件名找版本，见 api/main.py）
+HOUSING_COMPACT = os.environ.get("HOUSING_COMPACT", "0") == "1"
+
+# MODEL_MMAP=1：用只读内存映射（mmap_mode='r'）加载模型，
+# 同一台机器上的多个 uvicorn worker 共用操作系统页缓存里的同一份数组，而不是各复制一份
+MODEL_MMAP = os.environ.get("MODEL_MMAP", "0") == "1"
+mmap_mode = "r" if MODEL_MMAP else None
+
+# 房价森林的快速路径：FOREST_FAST_PATH_MAX_ROWS 行以内走拍平的森林，更大的批量交给 sklearn
+FOREST_FAST_PATH_MAX_ROWS = int(os.environ.get("FOREST_FAST_PATH_MAX_ROWS", "64"))
+
+# FOREST_SKLEARN_FALLBACK=1：内存映射 / 精简格式加载时，超过 FOREST_FAST_PATH_MAX_ROWS 行的批量也交给 sklearn（快 2~3 倍），
+# 代价是每个 worker 第一次遇到大批量时各自加载一份私有的 sklearn 森林，多 worker 共享内存的好处就没了，
+# 精简格式还需要镜像里带上 .joblib，而且同一行在小批量里是量化后的预测、在大批量里是原模型的预测；
+# 默认关闭：所有批量都用拍平的森林（按块计算，内存不随行数增长）
+FOREST_SKLEARN_FALLBACK = os.environ.get("FOREST_SKLEARN_FALLBACK", "0") == "1"
+
+# LINEAR_FUSED=1（默认）：鸢尾花的 StandardScaler → LogisticRegression 折成一次矩阵乘法预测（见 api/linear.py）；
+# 有 day41_export_linear_pipelines.py 导出的 <文件名>.linear.npz 时直接加载它，连 sklearn 都不用导入
+LINEAR_FUSED = os.environ.get("LINEAR_FUSED", "1") == "1"
+
+
+def is_fresh(forest_path, model_path):
+    """导出的文件（拍平森林、精简格式、融合模型）必须比模型文件新，否则说明模型被覆盖过，导出的文件已经过期，不能再用"""
+    return os.path.exists(forest_path) and os.path.getmtime(forest_path) >= os.path.getmtime(model_path)
+
+
+def load_iris(path):
+    fused_path = os.path.splitext(path)[0] + LINEAR_SUFFIX
+    if LINEAR_FUSED and is_fresh(fused_path, path):
+        print("➗ 鸢尾花模型以融合方式加载（遇到特殊输入时再加载完整 Pipeline）")
+        return load_fused_linear(fused_path, fallback_path=path)
+
+    import joblib  # 延迟导入：加载 pipeline 时才会连带导入 sklearn
+    # 加载你在 Day 11 保存的逻辑回归模型
+    model = joblib.load(path, mmap_mode=mmap_mode)
+    if LINEAR_FUSED:
+        # 内存里现场融合的模型没有经过 day41 的导出检查，先在探测数据上和原 Pipeline 对一遍，不一致就不用
+        try:
+            fused = FusedLinearModel.from_pipeline(model)
+            check_equivalence(fused, model, probe_rows(model))
+            model = fused
+        except (TypeError, AttributeError):
+            pass   # 不是线性 Pipeline，照常用原模型
+        except AssertionError as e:
+            print(f"⚠️ 鸢尾花模型融合后和原 Pipeline 不一致，改用原 Pipeline（{e}）")
+    return model
+
+
+def load_housing(path):
+    if path.endswith(COMPACT_SUFFIX):
+        # 只部署了精简格式（models/ 里没有 .joblib）
+        print("📦 房价模型以精简格式加载（没有 .joblib）")
+        return load_compact_forest(path)
+    forest_base = os.path.splitext(path)[0] + FOREST_SUFFIX
+    if MODEL_MMAP and is_fresh(os.path.join(forest_base, "meta.json"), path):
+        # sklearn 的树在加载时会把数组复制到进程私有内存，mmap 对它没用；
+        # 所以这里只加载拍平后的森林（纯 NumPy 数组，真正做到多个 worker 共享），所有批量大小都用它
+        print("🗺️ 房价模型以内存映射方式加载（多个 worker 共享同一份）")
+        return _with_sklearn_fallback(load_forest_mmap(forest_base), path)
+    compact_path = os.path.splitext(path)[0] + COMPACT_SUFFIX
+    if HOUSING_COMPACT and is_fresh(compact_path, path):
+        print("📦 房价模型以精简格式加载")
+        return _with_sklearn_fallback(load_compact_forest(compact_path), path)
+
+    import joblib
+    # 加载你在 Day 15 调优后的随机森林模型
+    model = joblib.load(path, mmap_mode=mmap_mode)
+
+    # 如果导出过拍平的森林，小批量预测走快速路径（结果与 sklearn 逐位相同）
+    # HOUSING_FAST_PATH=0 可关闭；FOREST_FAST_PATH_MAX_ROWS 控制多少行以内走快速路径
+    if os.environ.get("HOUSING_FAST_PATH", "1") == "1" and is_fresh(forest_base + ".npz", path):
+        model = FastPathRegressor(model, load_compiled_forest(forest_base + ".npz"), max_rows=FOREST_FAST_PATH_MAX_ROWS)
+        print("🌲 房价模型已启用快速预测路径")
+    return model
+
+
+def _with_sklearn_fallback(forest, path):
+    """FOREST_SKLEARN_FALLBACK=1 时，大批量交给 sklearn 森林（第一次遇到时才从 path 加载）；默认直接用拍平的森林"""
+    if not FOREST_SKLEARN_FALLBACK:
+        return forest
+    return FastPathRegressor(None, forest, max_rows=FOREST_FAST_PATH_MAX_ROWS, model_path=path)
+
+
+# 任务类型 -> 加载函数
+LOADERS = {"iris": load_iris, "housing": load_housing}
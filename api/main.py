@@ -4,20 +4,97 @@
 # ==============================
 
 # 第一步：导入必要的工具包
-from fastapi import FastAPI, HTTPException  # FastAPI 用于创建 Web 接口，HTTPException 用于返回错误
+import asyncio                             # 用于在后台预热模型
+from contextlib import asynccontextmanager  # 用于定义服务启动 / 关闭时要做的事（lifespan）
+from fastapi import FastAPI, HTTPException, Query, Request  # FastAPI 用于创建 Web 接口，HTTPException 用于返回错误
+from fastapi.exception_handlers import request_validation_exception_handler  # FastAPI 默认的 422 处理
+from fastapi.exceptions import RequestValidationError
+from fastapi.concurrency import run_in_threadpool  # 把耗 CPU 的 model.predict 放到线程池，避免卡住事件循环
+from fastapi.responses import JSONResponse, PlainTextResponse, Response  # 需要自定义状态码时直接返回 JSON；快速路径直接返回字节
 from pydantic import BaseModel, Field      # Pydantic 用于校验用户输入的数据格式
-from typing import List, Literal           # 用于定义“只能是某些值”的类型（比如 task_type 只能是 "iris" 或 "housing"）
-import joblib                              # 用于加载你之前保存的 .joblib 模型
+from typing import Annotated, List, Literal # 用于定义“只能是某些值”的类型（比如 task_type 只能是 "iris" 或 "housing"）
+import numpy as np                         # 用于把批量特征拼成一个二维数组，一次性交给模型
 import os                                  # 用于处理文件路径（跨平台兼容）
+import time                                # 用于统计排队 / 计算耗时
+
+from api.cache import PredictionCache  # 预测结果缓存（LRU + TTL）
+from api.redis_cache import RedisCache  # 共享预测缓存（Redis 协议，所有 worker 共用）
+from api.batching import MicroBatcher, QueueFullError  # 微批处理：把并发的单条请求攒成一批再预测
+from api import fastjson  # 快速 JSON 路径：跳过 Pydantic，直接解析成数组
+from api import wire  # 二进制传输格式：原始 float32 / float64、Arrow
+from api import streaming  # 流式打分：边读 NDJSON / CSV 边返回结果
+from api import metrics  # 监控指标：请求数、错误数、分段耗时直方图（/metrics）
+from api.memory import rss_mb
+from api.profiler import Profiler  # 采样分析器：抓调用栈 + 记录被采样请求的分段耗时
+from api.executor import ExecutorSaturatedError, InferenceExecutor  # 专用推理线程池 / 进程池
+from api.loaders import HOUSING_COMPACT, LOADERS  # 每个模型的加载方式（融合线性模型、拍平 / 内存映射 / 精简格式的随机森林）
+from api.details import predict_details  # 详细输出：概率、top-k、随机森林树间分歧（和点预测同一次计算）
+from api.registry import ModelNotAvailableError, ModelRegistry, latest_artifact  # 模型注册表：懒加载 + 版本热更新
+
+
+# 定时检查 models/ 目录有没有新版本模型（检查和加载都在线程池里做，不影响正在处理的请求）
+async def _watch_models(interval):
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(_reload_models)
+
+
+# 服务启动时：如果配置了 MODEL_WARMUP，在后台提前加载模型（不阻塞接收请求）；
+#            如果配置了 MODEL_RELOAD_INTERVAL，在后台定时检查新版本
+# 服务关闭时：清理资源（比如微批处理的后台协程、推理池）
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background = []
+    if WARMUP_MODELS:
+        background.append(asyncio.create_task(run_in_threadpool(registry.warm_up, WARMUP_MODELS)))
+    if MODEL_RELOAD_INTERVAL > 0:
+        background.append(asyncio.create_task(_watch_models(MODEL_RELOAD_INTERVAL)))
+    yield
+    for task in background:
+        task.cancel()
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+    if inference_executor is not None:
+        inference_executor.shutdown()
+    if api_metrics.profiler is not None:
+        api_metrics.profiler.flush()
+
 
 # 第二步：创建 FastAPI 应用对象
 # 这个 app 就是你的“服务器”，所有接口都注册在它上面
 app = FastAPI(
     title="AI 30 Days Challenge - Prediction API",
     description="一个统一的 AI 预测服务，支持鸢尾花分类和加州房价预测",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
+# 每个请求都记录请求数 / 错误数 / 耗时（纯 ASGI 中间件，每个请求只多几微秒），GET /metrics 查看
+api_metrics = metrics.Metrics()
+app.add_middleware(metrics.MetricsMiddleware, metrics=api_metrics)
+
+
+# features 里的 NaN / 无穷大会按 422 拒绝（见 PredictionRequest），但默认的 422 响应会把原始输入原样放回去，
+# 而 NaN / 无穷大不是合法 JSON，序列化时报错变成 500；这里把这些值换成字符串，其余和默认响应完全一样
+@app.exception_handler(RequestValidationError)
+async def _validation_error(request: Request, exc: RequestValidationError):
+    for error in exc.errors():
+        if isinstance(error.get("input"), float) and not np.isfinite(error["input"]):
+            error["input"] = str(error["input"])
+    return await request_validation_exception_handler(request, exc)
+
+# 可选的采样分析（默认关闭，关闭时不启动任何线程）：
+# - PROFILE_SAMPLE_RATE：按比例采样请求，例如 0.01 表示 1%
+# - PROFILE_INTERVAL_MS：抓调用栈的间隔
+# - PROFILE_DIR：结果写到哪个目录
+# 也可以不设置比例，临时用 POST /admin/profile?seconds=30 开一个时间窗口
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+if PROFILE_SAMPLE_RATE > 0:
+    api_metrics.profiler = Profiler(PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE, interval_ms=PROFILE_INTERVAL_MS)
+    print(f"🔬 已开启采样分析：{PROFILE_SAMPLE_RATE:.2%} 的请求，结果写到 {PROFILE_DIR}/")
+
 # 第三步：定义模型存放的目录
 # __file__ 是当前文件（main.py）的路径
 # os.path.dirname(__file__) → 得到 api/ 目录
@@ -25,31 +102,282 @@ app = FastAPI(
 # 所以 MODEL_DIR = "E:\AI_learning\models"
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
 
-# 第四步：启动时自动加载两个模型（只加载一次，提高速度）
-# 注意：如果模型文件不存在，程序会报错！所以你要确认文件名正确
-try:
-    print("🔍 正在加载鸢尾花分类模型...")
-    # 加载你在 Day 11 保存的逻辑回归模型
-    iris_model = joblib.load(os.path.join(MODEL_DIR, "iris_pipeline_v2.joblib"))
-    
-    print("🔍 正在加载房价回归模型...")
-    # 加载你在 Day 15 调优后的随机森林模型（推荐用 v2）
-    housing_model = joblib.load(os.path.join(MODEL_DIR, "regressor_v2_rf_tuned.joblib"))
-    
-    print("✅ 所有模型加载成功！")
-except FileNotFoundError as e:
-    # 如果文件没找到，打印具体缺失的文件
-    print(f"❌ 模型文件未找到: {e}")
-    print("请检查 models/ 目录下是否有以下文件：")
-    print("  - iris_pipeline_v2.joblib")
-    print("  - regressor_v2_rf_tuned.joblib")
-    # 设置为 None，后续请求会返回 500 错误
-    iris_model = None
-    housing_model = None
-except Exception as e:
-    print(f"❌ 模型加载出错: {e}")
-    iris_model = None
-    housing_model = None
+# 每种任务的模型文件名规则（括号里是版本号），总是使用版本号最大的那个文件：
+# - iris_pipeline_v2.joblib、iris_pipeline_v3.joblib ...
+# - regressor_v2_rf_tuned.joblib、regressor_v3_rf_tuned.joblib ...
+# 同一个文件被覆盖（修改时间变了）也算新版本
+MODEL_PATTERNS = {
+    "iris": r"iris_pipeline_v(\d+)\.joblib",
+    "housing": r"regressor_v(\d+)_rf_tuned\.joblib",
+}
+
+# HOUSING_COMPACT=1 而 models/ 里没有房价模型的 .joblib 时（镜像里只放了精简格式），按精简格式的文件名找版本
+COMPACT_PATTERNS = {"housing": r"regressor_v(\d+)_rf_tuned\.compact\.npz"}
+
+# MODEL_RELOAD_INTERVAL：每隔多少秒检查一次新版本模型（0 表示不自动检查，可以调用 POST /admin/reload）
+MODEL_RELOAD_INTERVAL = float(os.environ.get("MODEL_RELOAD_INTERVAL", "0"))
+
+# 第四步：登记两个模型（懒加载：启动时不加载，第一次用到时才加载）
+# 这样服务启动很快；只处理鸢尾花的实例，永远不用为房价大模型付加载时间
+# 每个模型怎么加载（融合线性模型、内存映射 / 精简格式森林、快速路径……）见 api/loaders.py，
+# 进程池模式的推理子进程也用同一套加载函数
+
+# 预热用的样例数据：新模型上线前先预测一次，确认能用，也让第一次真实请求不用付额外开销
+PROBE_FEATURES = {
+    "iris": [[5.1, 3.5, 1.4, 0.2]],
+    "housing": [[8.3252, 41.0, 6.984127, 1.023810, 322.0, 2.555556, 37.88, -122.23]],
+}
+
+
+
+def _resolve(task_type, settle_seconds):
+    """找当前应该使用的 (版本号, 路径)：优先 .joblib；开启精简格式且一个 .joblib 都没有时，用 .compact.npz"""
+    found = latest_artifact(MODEL_DIR, MODEL_PATTERNS[task_type], settle_seconds)
+    if (found is None and HOUSING_COMPACT and task_type in COMPACT_PATTERNS
+            and latest_artifact(MODEL_DIR, MODEL_PATTERNS[task_type], 0) is None):
+        found = latest_artifact(MODEL_DIR, COMPACT_PATTERNS[task_type], settle_seconds)
+    return found
+
+
+registry = ModelRegistry()
+for _task_type, _loader in LOADERS.items():
+    registry.register(
+        _task_type,
+        resolve=lambda settle_seconds, task_type=_task_type: _resolve(task_type, settle_seconds),
+        loader=_loader,
+        probe=lambda model, X=np.asarray(PROBE_FEATURES[_task_type]): model.predict(X),
+    )
+
+# MODEL_WARMUP：启动后在后台提前加载哪些模型，例如 "iris,housing" 或 "all"；不设置就完全懒加载
+_warmup = os.environ.get("MODEL_WARMUP", "").strip()
+WARMUP_MODELS = list(MODEL_PATTERNS) if _warmup == "all" else [name for name in _warmup.split(",") if name]
+
+# 鸢尾花类别名（顺序必须和 Day 11 一致！）
+SPECIES_MAP = ["setosa", "versicolor", "virginica"]
+
+# 每种任务需要的特征数量和中文名（用于报错信息）
+N_FEATURES = {"iris": 4, "housing": 8}
+TASK_NAMES = {"iris": "鸢尾花", "housing": "加州房价"}
+
+
+async def _get_model(task_type: str):
+    """
+    根据任务类型取出当前在线的模型（LoadedModel：模型 + 版本号 + 路径）
+    还没加载时在线程池里加载（不卡住事件循环）
+    """
+    try:
+        if registry.is_loaded(task_type):
+            return registry.current(task_type)
+        return await run_in_threadpool(registry.current, task_type)
+    except ModelNotAvailableError as e:
+        raise HTTPException(status_code=500, detail=f"{TASK_NAMES[task_type]}模型未加载，请检查文件（{e}）")
+
+
+# 第 4.4 步：可选的专用推理执行器（默认关闭，沿用 FastAPI 自带的线程池）
+# - INFERENCE_EXECUTOR：thread（专用线程池）或 process（进程池，绕开 GIL）
+# - INFERENCE_WORKERS_IRIS / INFERENCE_WORKERS_HOUSING：每种任务各自的 worker 数
+# - INFERENCE_MAX_PENDING：每种任务最多排队多少个请求，超过返回 503
+# - INFERENCE_RETRY_AFTER：503 时告诉客户端几秒后重试
+inference_executor = None
+RETRY_AFTER_SECONDS = os.environ.get("INFERENCE_RETRY_AFTER", "1")
+if os.environ.get("INFERENCE_EXECUTOR"):
+    inference_executor = InferenceExecutor(
+        kind=os.environ["INFERENCE_EXECUTOR"],
+        workers={
+            "iris": int(os.environ.get("INFERENCE_WORKERS_IRIS", "1")),
+            "housing": int(os.environ.get("INFERENCE_WORKERS_HOUSING", "2")),
+        },
+        max_pending=int(os.environ.get("INFERENCE_MAX_PENDING", "32"))
+    )
+    print(f"🏭 已开启专用推理执行器: {inference_executor.kind}")
+
+
+async def _model_predict(task_type: str, X: np.ndarray, timings=None) -> np.ndarray:
+    """
+    对一个二维数组做一次 predict：优先交给专用推理池，否则用 FastAPI 自带的线程池
+    timings 不为空时，把排队耗时（queue）和预测耗时（compute）累加进去（用于 /metrics）
+    """
+    # 先拿到当前版本的引用：即使预测途中模型被热更新替换，这次请求也会用旧版本算完
+    loaded = await _get_model(task_type)
+    if inference_executor is None:
+        submitted = time.perf_counter()
+        preds, started, finished = await run_in_threadpool(metrics.timed_call, loaded.model.predict, X)
+        metrics.add_timing(timings, "queue", started - submitted)
+        metrics.add_timing(timings, "compute", finished - started)
+        return preds
+    try:
+        return await inference_executor.predict(task_type, loaded.model, loaded.path, loaded.version, X, timings)
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": RETRY_AFTER_SECONDS})
+
+
+async def _model_details(task_type: str, X: np.ndarray, top_k: int | None, timings=None) -> dict:
+    """和 _model_predict 一样，但返回详细输出（点预测 + 概率 / top-k / 树间分歧，同一次计算得到）"""
+    loaded = await _get_model(task_type)
+    if inference_executor is None:
+        submitted = time.perf_counter()
+        details, started, finished = await run_in_threadpool(metrics.timed_call, predict_details, loaded.model, X, top_k)
+        metrics.add_timing(timings, "queue", started - submitted)
+        metrics.add_timing(timings, "compute", finished - started)
+        return details
+    try:
+        return await inference_executor.predict(
+            task_type, loaded.model, loaded.path, loaded.version, X, timings, details=True, top_k=top_k
+        )
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": RETRY_AFTER_SECONDS})
+
+
+# 第 4.5 步：可选的微批处理（默认关闭，设置环境变量 MICROBATCH_ENABLED=1 开启）
+# - MICROBATCH_MAX_WAIT_MS：一批最多等多少毫秒
+# - MICROBATCH_MAX_BATCH：一批最多多少行
+# - MICROBATCH_MAX_QUEUE：每种任务最多排队多少个请求，超过返回 503
+micro_batcher = None
+if os.environ.get("MICROBATCH_ENABLED", "0") == "1":
+    micro_batcher = MicroBatcher(
+        _model_predict,
+        max_wait_ms=float(os.environ.get("MICROBATCH_MAX_WAIT_MS", "2")),
+        max_batch_size=int(os.environ.get("MICROBATCH_MAX_BATCH", "64")),
+        max_queue_size=int(os.environ.get("MICROBATCH_MAX_QUEUE", "1024"))
+    )
+    print("🧺 已开启微批处理")
+
+
+# 第 4.6 步：可选的预测结果缓存（默认关闭）
+# - PREDICTION_CACHE=1 或 memory：进程内缓存，每个 worker 各一份
+# - PREDICTION_CACHE=redis：共享缓存，地址由 PREDICTION_CACHE_URL 指定
+#   （真正的 Redis，或者 python -m api.cache_server --unix /tmp/prediction-cache.sock 起的本地替身）
+# - PREDICTION_CACHE_MAX_ENTRIES：最多缓存多少条（进程内缓存）
+# - PREDICTION_CACHE_MAX_MB：缓存最多占用多少内存（估算值，进程内缓存）
+# - PREDICTION_CACHE_TIMEOUT_MS：共享缓存单次往返的超时，超时就当没命中
+# - PREDICTION_CACHE_TTL：每条结果最多保存多少秒
+# - PREDICTION_CACHE_DECIMALS：特征保留几位小数后作为缓存键（越少命中率越高，但结果越“近似”）
+PREDICTION_CACHE = os.environ.get("PREDICTION_CACHE", "0").lower()
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "300"))
+PREDICTION_CACHE_DECIMALS = int(os.environ.get("PREDICTION_CACHE_DECIMALS", "6"))
+prediction_cache = None
+if PREDICTION_CACHE in ("1", "memory"):
+    prediction_cache = PredictionCache(
+        max_entries=int(os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", "100000")),
+        max_bytes=int(float(os.environ.get("PREDICTION_CACHE_MAX_MB", "64")) * 1024 * 1024),
+        ttl_seconds=PREDICTION_CACHE_TTL,
+        decimals=PREDICTION_CACHE_DECIMALS
+    )
+    print("🗃️ 已开启预测结果缓存（进程内）")
+elif PREDICTION_CACHE == "redis":
+    prediction_cache = RedisCache(
+        os.environ.get("PREDICTION_CACHE_URL", "unix:///tmp/prediction-cache.sock"),
+        ttl_seconds=PREDICTION_CACHE_TTL,
+        decimals=PREDICTION_CACHE_DECIMALS,
+        timeout=float(os.environ.get("PREDICTION_CACHE_TIMEOUT_MS", "50")) / 1000
+    )
+    print(f"🌐 已开启共享预测缓存: {prediction_cache.client.url}")
+
+
+def _reload_models():
+    """检查新版本模型；有模型被替换时，顺便清掉它在缓存里的旧结果"""
+    swapped = registry.check_for_updates()
+    if prediction_cache is not None:
+        for name in swapped:
+            prediction_cache.invalidate(name)
+    return swapped
+
+
+async def _compute_one(task_type: str, features: List[float]):
+    """真正计算单行：开启微批处理时排队拼批，否则直接在线程池里预测"""
+    timings = metrics.current_stages()
+    if micro_batcher is not None:
+        try:
+            return await micro_batcher.submit(task_type, features, timings)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": RETRY_AFTER_SECONDS})
+    X = np.asarray([features], dtype=np.float64)
+    return (await _model_predict(task_type, X, timings))[0]
+
+
+async def _cache_call(method, *args):
+    """
+    调用预测缓存的 get_many / put_many：共享缓存（Redis）每次都是阻塞的网络往返，
+    放到线程池里，等待期间事件循环照常处理其他请求；进程内缓存只是查字典，直接调用
+    """
+    if prediction_cache.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+async def _predict_one(task_type: str, features: List[float]):
+    """预测单行：开启缓存时先查缓存，命中就完全不用调用模型"""
+    if prediction_cache is None:
+        pred = await _compute_one(task_type, features)
+        metrics.computed()
+        return pred
+
+    version = (await _get_model(task_type)).version
+    keys = prediction_cache.make_keys(task_type, version, [features])
+    cached = (await _cache_call(prediction_cache.get_many, keys))[0]
+    if cached is None:
+        cached = await _compute_one(task_type, features)
+        await _cache_call(prediction_cache.put_many, keys, [cached])
+    metrics.computed()
+    return cached
+
+
+async def _predict_rows(task_type: str, X: np.ndarray):
+    """预测多行：开启缓存时先批量查缓存，只把没命中的行交给模型，结果顺序不变"""
+    timings = metrics.current_stages()
+    if prediction_cache is None:
+        preds = await _model_predict(task_type, X, timings)
+        metrics.computed()
+        return preds
+
+    version = (await _get_model(task_type)).version
+    keys = prediction_cache.make_keys(task_type, version, X)
+    results = await _cache_call(prediction_cache.get_many, keys)
+    missing = [i for i, value in enumerate(results) if value is None]
+    if missing:
+        preds = await _model_predict(task_type, X[missing], timings)
+        await _cache_call(prediction_cache.put_many, [keys[i] for i in missing], preds)
+        for i, pred in zip(missing, preds):
+            results[i] = pred
+    metrics.computed()
+    return results
+
+
+def _detail_rows(task_type: str, details: dict) -> List[dict]:
+    """详细输出转成每行一个 dict（点预测的处理方式和 _format_iris / _format_housing 一致）"""
+    rows = []
+    if task_type == "iris":
+        names = [SPECIES_MAP[int(c)] for c in details["classes"]]
+        for idx, proba, top in zip(details["prediction"], np.round(details["proba"], 4).tolist(), details["top_k"].tolist()):
+            species = SPECIES_MAP[int(idx)]
+            rows.append({
+                "task_type": "iris", "prediction": species, "label": species,
+                "probabilities": dict(zip(names, proba)),
+                "top_k": [{"label": names[j], "probability": proba[j]} for j in top],
+            })
+        return rows
+
+    prices = np.round(np.maximum(details["prediction"], 0.0), 2).tolist()   # 不为负 + 保留两位小数
+    if "std" not in details:   # 不是随机森林，没有树间分歧
+        return [{"task_type": "housing", "prediction": price, "label": None} for price in prices]
+    spread = zip(
+        np.round(details["std"], 4).tolist(),
+        np.round(np.maximum(details["p10"], 0.0), 2).tolist(),
+        np.round(np.maximum(details["p90"], 0.0), 2).tolist(),
+    )
+    for price, (std, p10, p90) in zip(prices, spread):
+        rows.append({
+            "task_type": "housing", "prediction": price, "label": None,
+            "uncertainty": {"std": std, "p10": p10, "p90": p90},
+        })
+    return rows
+
+
+async def _predict_details(task_type: str, X: np.ndarray, top_k: int | None) -> List[dict]:
+    """详细输出（不走预测缓存和微批处理：缓存里只有点预测）"""
+    details = await _model_details(task_type, X, top_k, metrics.current_stages())
+    metrics.computed()
+    return _detail_rows(task_type, details)
 
 # 第五步：定义用户请求的数据格式（用 Pydantic）
 # 当用户发 POST 请求时，必须符合这个结构
@@ -60,32 +388,56 @@ class PredictionRequest(BaseModel):
         description="任务类型：'iris' 表示鸢尾花分类，'housing' 表示房价预测"
     )
     # features 是一个浮点数列表，比如 [5.1, 3.5, 1.4, 0.2]
-    features: List[float] = Field(
+    # 每个值必须是 JSON 数字（strict：不接受 "5.1" 这样的字符串和 true / false），而且不能是 NaN / 无穷大；
+    # 和快速路径（api/fastjson.py 的 to_matrix）规则一样，同样的请求体在两个接口上结果一样
+    features: List[Annotated[float, Field(strict=True, allow_inf_nan=False)]] = Field(
         ...,
         description="特征列表。鸢尾花需要 4 个，房价需要 8 个。"
     )
 
 # 第六步：定义返回给用户的数据格式
+class ClassProbability(BaseModel):
+    label: str
+    probability: float
+
+
+class Uncertainty(BaseModel):
+    std: float                         # 各棵树预测的标准差
+    p10: float                         # 各棵树预测的 10% 分位数
+    p90: float                         # 各棵树预测的 90% 分位数
+
+
 class PredictionResponse(BaseModel):
     task_type: str                     # 返回任务类型
     prediction: float | str            # 分类返回字符串（如 "setosa"），回归返回数字（如 2.96）
     label: str | None = None          # 额外信息：分类时返回人类可读标签，回归时为 null
+    # 以下字段只在 ?details=true 时返回（和点预测是同一次计算得到的，几乎不增加耗时）
+    probabilities: dict[str, float] | None = None   # 鸢尾花：每个类别的概率
+    top_k: List[ClassProbability] | None = None     # 鸢尾花：概率最高的 k 个类别（?top_k=，默认全部）
+    uncertainty: Uncertainty | None = None          # 房价（随机森林）：各棵树预测的分歧
+
+
+# 详细输出的查询参数：/predict?details=true&top_k=2
+DETAILS_QUERY = Query(False, description="同时返回类别概率 / top-k（鸢尾花）或随机森林的树间分歧（房价）")
+TOP_K_QUERY = Query(None, ge=1, description="details=true 时返回概率最高的几个类别（默认全部）")
 
 # 第七步：定义核心预测接口
 # 当用户访问 POST /predict 时，执行这个函数
-@app.post("/predict", response_model=PredictionResponse)
-def predict(request: PredictionRequest):  # request 自动被 Pydantic 校验
+# response_model_exclude_unset：没有要求详细输出时，返回的 JSON 和原来完全一样（不多出值为 null 的字段）
+@app.post("/predict", response_model=PredictionResponse, response_model_exclude_unset=True)
+async def predict(request: PredictionRequest, details: bool = DETAILS_QUERY, top_k: int | None = TOP_K_QUERY):  # request 自动被 Pydantic 校验
     """
     统一预测接口：
     - 如果 task_type 是 "iris"，调用鸢尾花模型
     - 如果 task_type 是 "housing"，调用房价模型
+    - details=true 时额外返回概率 / top-k / 树间分歧
     """
+    metrics.begin(request.task_type)   # 到这里为止的耗时算作 parse（读请求体 + Pydantic 校验）
     
     # =============== 处理鸢尾花分类 ===============
     if request.task_type == "iris":
-        # 检查模型是否加载成功
-        if iris_model is None:
-            raise HTTPException(status_code=500, detail="鸢尾花模型未加载，请检查文件")
+        # 检查模型是否加载成功（第一次用到时才加载，加载失败返回 500）
+        await _get_model("iris")
         
         # 检查特征数量是否为 4（鸢尾花有 4 个特征）
         if len(request.features) != 4:
@@ -94,13 +446,15 @@ def predict(request: PredictionRequest):  # request 自动被 Pydantic 校验
                 detail=f"鸢尾花需要 4 个特征，但收到了 {len(request.features)} 个"
             )
         
-        # 调用模型预测
-        # 注意：predict() 需要二维数组，所以用 [request.features] 包一层
-        pred_class_index = iris_model.predict([request.features])[0]  # 得到数字：0, 1, 或 2
+        if details:
+            row = (await _predict_details("iris", np.asarray([request.features], dtype=np.float64), top_k))[0]
+            return PredictionResponse(**row)
+
+        # 调用模型预测（单行会被包成二维数组；开启微批处理时会和其他请求拼成一批）
+        pred_class_index = await _predict_one("iris", request.features)  # 得到数字：0, 1, 或 2
         
-        # 把数字转成花的名字（顺序必须和 Day 11 一致！）
-        species_map = ["setosa", "versicolor", "virginica"]
-        predicted_species = species_map[int(pred_class_index)]
+        # 把数字转成花的名字
+        predicted_species = SPECIES_MAP[int(pred_class_index)]
         
         # 返回结果
         return PredictionResponse(
@@ -111,8 +465,7 @@ def predict(request: PredictionRequest):  # request 自动被 Pydantic 校验
 
     # =============== 处理房价预测 ===============
     elif request.task_type == "housing":
-        if housing_model is None:
-            raise HTTPException(status_code=500, detail="房价模型未加载，请检查文件")
+        await _get_model("housing")
         
         if len(request.features) != 8:
             raise HTTPException(
@@ -120,8 +473,12 @@ def predict(request: PredictionRequest):  # request 自动被 Pydantic 校验
                 detail=f"加州房价需要 8 个特征，但收到了 {len(request.features)} 个"
             )
         
+        if details:
+            row = (await _predict_details("housing", np.asarray([request.features], dtype=np.float64), top_k))[0]
+            return PredictionResponse(**row)
+
         # 调用模型预测
-        predicted_price = housing_model.predict([request.features])[0]  # 单位：千美元
+        predicted_price = await _predict_one("housing", request.features)  # 单位：千美元
         
         # ⚠️ 关键安全措施：确保房价不为负（你 Day 13 学到的教训！）
         predicted_price = max(0.0, predicted_price)
@@ -137,4 +494,346 @@ def predict(request: PredictionRequest):  # request 自动被 Pydantic 校验
 
     # =============== 其他情况（理论上不会发生，因为 Literal 限制了）===============
     else:
-        raise HTTPException(status_code=400, detail="task_type 必须是 'iris' 或 'housing'")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail="task_type 必须是 'iris' 或 'housing'")
+
+# ==============================
+# 🚀 批量预测接口 /predict/batch
+# 一次请求发送成百上千行特征，每种任务只调用一次 model.predict（向量化），
+# 省掉逐行请求带来的 HTTP + Pydantic + sklearn 调度开销
+# ==============================
+
+# 单次批量请求最多允许的行数（防止一个请求把内存撑爆），可通过环境变量调整
+MAX_BATCH_ROWS = int(os.environ.get("MAX_BATCH_ROWS", "10000"))
+
+
+class BatchPredictionRequest(BaseModel):
+    # 每一项就是一个普通的单条请求，允许 iris 和 housing 混在一起
+    items: List[PredictionRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_ROWS,
+        description="批量预测列表，每项包含 task_type 和 features，可混合不同任务"
+    )
+
+
+class BatchPredictionResponse(BaseModel):
+    count: int                           # 返回结果条数（等于输入条数）
+    results: List[PredictionResponse]    # 结果顺序与输入顺序完全一致
+
+
+def _batch_label(groups) -> str:
+    """批量请求在监控指标里的 task_type：只有一种任务时用任务名，混合时记作 mixed"""
+    present = [task_type for task_type, indices in groups.items() if indices]
+    return present[0] if len(present) == 1 else "mixed"
+
+
+def _build_matrix(task_type: str, rows: List[List[float]], indices: List[int]) -> np.ndarray:
+    """把同一任务的多行特征校验后拼成一个 (n, n_features) 的 float64 数组"""
+    n_features = N_FEATURES[task_type]
+    # 先找出特征数量不对的行，报错时告诉用户是第几条（按输入顺序）
+    bad = [i for i, row in zip(indices, rows) if len(row) != n_features]
+    if bad:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{TASK_NAMES[task_type]}需要 {n_features} 个特征，第 {bad[:10]} 条数据特征数量不对"
+        )
+    return np.asarray(rows, dtype=np.float64)
+
+
+def _format_iris(pred_class_indices) -> List[PredictionResponse]:
+    """把模型输出的类别编号转成花的名字"""
+    results = []
+    for idx in pred_class_indices:
+        species = SPECIES_MAP[int(idx)]
+        results.append(PredictionResponse(task_type="iris", prediction=species, label=species))
+    return results
+
+
+def _format_housing(predicted_prices) -> List[PredictionResponse]:
+    """房价：不为负 + 保留两位小数（和单条接口的处理完全一致）"""
+    results = []
+    for price in predicted_prices:
+        price = round(float(max(0.0, price)), 2)
+        results.append(PredictionResponse(task_type="housing", prediction=price, label=None))
+    return results
+
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse, response_model_exclude_unset=True)
+async def predict_batch(request: BatchPredictionRequest, details: bool = DETAILS_QUERY, top_k: int | None = TOP_K_QUERY):
+    """
+    批量预测接口：
+    - 按 task_type 分组，每组拼成一个 NumPy 数组
+    - 每个模型只调用一次 predict（向量化计算；details=true 时每组也只算一次）
+    - 按输入顺序返回结果
+    """
+    # 第一步：按任务类型分组，记住每一行在输入里的位置
+    groups = {"iris": [], "housing": []}
+    for i, item in enumerate(request.items):
+        groups[item.task_type].append(i)
+    metrics.begin(_batch_label(groups))
+
+    formatters = {"iris": _format_iris, "housing": _format_housing}
+    results: List[PredictionResponse | None] = [None] * len(request.items)
+
+    # 第二步：每组一次性预测，再把结果放回原来的位置
+    for task_type, indices in groups.items():
+        if not indices:
+            continue
+        await _get_model(task_type)   # 模型加载失败时直接返回 500
+        X = _build_matrix(task_type, [request.items[i].features for i in indices], indices)
+        if details:
+            responses = [PredictionResponse(**row) for row in await _predict_details(task_type, X, top_k)]
+        else:
+            responses = formatters[task_type](await _predict_rows(task_type, X))
+        for i, response in zip(indices, responses):
+            results[i] = response
+
+    return BatchPredictionResponse(count=len(results), results=results)
+
+
+# ==============================
+# ⚡ 快速预测接口 /predict/fast 和 /predict/batch/fast
+# 请求和返回的 JSON 与 /predict、/predict/batch 完全一样，但不经过 Pydantic：
+# 请求体直接解析成 float64 数组、向量化校验，结果直接拼成 JSON 字节返回
+# 特征只有 4 / 8 个数字时，Pydantic 校验和逐行创建响应对象比模型本身还慢
+# ==============================
+IRIS_FRAGMENTS = fastjson.iris_fragments(SPECIES_MAP)
+
+
+def _format_fragments(task_type: str, preds) -> List[bytes]:
+    """把模型输出转成每行结果的 JSON 片段（处理方式和 _format_iris / _format_housing 一致）"""
+    if task_type == "iris":
+        return [IRIS_FRAGMENTS[int(idx)] for idx in preds]
+    return [fastjson.housing_fragment(round(float(max(0.0, price)), 2)) for price in preds]
+
+
+@app.post("/predict/fast", response_model=PredictionResponse)
+async def predict_fast(request: Request, details: bool = DETAILS_QUERY, top_k: int | None = TOP_K_QUERY):
+    try:
+        task_type, features = fastjson.parse_item(fastjson.loads(await request.body()), N_FEATURES)
+        n_features = N_FEATURES[task_type]
+        if len(features) != n_features:
+            raise fastjson.PayloadError(
+                f"{TASK_NAMES[task_type]}需要 {n_features} 个特征，但收到了 {len(features)} 个", status_code=400
+            )
+        X = fastjson.to_matrix([features], [0], n_features, TASK_NAMES[task_type])
+    except fastjson.PayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    metrics.begin(task_type)
+
+    await _get_model(task_type)
+    if details:
+        row = (await _predict_details(task_type, X, top_k))[0]
+        return Response(content=fastjson.dumps(row), media_type="application/json")
+    pred = await _predict_one(task_type, X[0])
+    return Response(content=_format_fragments(task_type, [pred])[0], media_type="application/json")
+
+
+# 二进制格式一次最多允许的行数（原始 float32 的 100 万行房价特征约 32 MB）
+MAX_BINARY_ROWS = int(os.environ.get("MAX_BINARY_ROWS", "1000000"))
+
+
+async def _predict_binary(request: Request, content_type: str):
+    """
+    二进制请求：整个请求体只有一种任务（查询参数 ?task_type=housing），
+    解析成数组后直接交给模型，结果按 Accept 编码（默认和请求同一种格式）
+    """
+    task_type = request.query_params.get("task_type")
+    if task_type not in N_FEATURES:
+        raise HTTPException(status_code=400, detail="二进制格式需要查询参数 task_type=iris 或 task_type=housing")
+    try:
+        accept = wire.negotiate(request.headers.get("accept"), default=content_type)
+        X = wire.decode(await request.body(), content_type, request.headers.get("x-shape"), N_FEATURES[task_type])
+    except wire.WireFormatError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if len(X) > MAX_BINARY_ROWS:
+        raise HTTPException(status_code=413, detail=f"一次最多 {MAX_BINARY_ROWS} 行，收到了 {len(X)} 行")
+    metrics.begin(task_type)
+
+    await _get_model(task_type)
+    preds = await _predict_rows(task_type, X)
+    if accept == wire.JSON:
+        fragments = _format_fragments(task_type, preds)
+        return Response(content=fastjson.batch_body(fragments), media_type="application/json")
+
+    if task_type == "housing":
+        preds = np.round(np.maximum(np.asarray(preds, dtype=np.float64), 0.0), 2)   # 不为负 + 保留两位小数
+    labels = SPECIES_MAP if task_type == "iris" else None
+    try:
+        content, media_type, headers = wire.encode(np.asarray(preds), accept, labels=labels)
+    except wire.WireFormatError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+@app.post("/predict/batch/fast", response_model=BatchPredictionResponse)
+async def predict_batch_fast(request: Request, details: bool = DETAILS_QUERY, top_k: int | None = TOP_K_QUERY):
+    """
+    批量预测（快速路径），按 Content-Type 选择请求格式：
+    - application/json：和 /predict/batch 一样的 {"items": [...]}
+    - application/x-raw-float32 / x-raw-float64 / vnd.apache.arrow.stream：二进制，见 api/wire.py
+    """
+    content_type = wire.media_type(request.headers.get("content-type"))
+    if content_type in wire.BINARY_TYPES:
+        if details:
+            raise HTTPException(status_code=400, detail="二进制格式不支持 details，请用 JSON 请求")
+        return await _predict_binary(request, content_type)
+
+    try:
+        body = fastjson.loads(await request.body())
+        items = body.get("items") if isinstance(body, dict) else None
+        if not isinstance(items, list) or not 1 <= len(items) <= MAX_BATCH_ROWS:
+            raise fastjson.PayloadError(f"items 必须是 1 到 {MAX_BATCH_ROWS} 条请求组成的列表")
+
+        # 按任务类型分组，记住每一行在输入里的位置
+        groups = {"iris": ([], []), "housing": ([], [])}
+        for i, item in enumerate(items):
+            task_type, features = fastjson.parse_item(item, N_FEATURES)
+            groups[task_type][0].append(i)
+            groups[task_type][1].append(features)
+        matrices = {
+            task_type: fastjson.to_matrix(rows, indices, N_FEATURES[task_type], TASK_NAMES[task_type])
+            for task_type, (indices, rows) in groups.items() if indices
+        }
+    except fastjson.PayloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    metrics.begin(_batch_label({task_type: indices for task_type, (indices, _) in groups.items()}))
+
+    fragments: List[bytes | None] = [None] * len(items)
+    for task_type, X in matrices.items():
+        await _get_model(task_type)
+        if details:
+            task_fragments = [fastjson.dumps(row) for row in await _predict_details(task_type, X, top_k)]
+        else:
+            task_fragments = _format_fragments(task_type, await _predict_rows(task_type, X))
+        for i, fragment in zip(groups[task_type][0], task_fragments):
+            fragments[i] = fragment
+    return Response(content=fastjson.batch_body(fragments), media_type="application/json")
+
+
+# ==============================
+# 🌊 流式打分接口 /predict/stream
+# 离线大批量打分：请求体是 NDJSON 或 CSV，服务端每读够 chunk_size 行就预测一次并立刻返回，
+# 返回 NDJSON，每个输入行对应一个输出行（格式不对的行返回 {"error": ...}）
+# 例：curl -T data.csv -H "Content-Type: text/csv" "http://localhost:8000/predict/stream?task_type=housing"
+# ==============================
+STREAM_CHUNK_ROWS = int(os.environ.get("STREAM_CHUNK_ROWS", "1000"))
+
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request, task_type: str | None = None, chunk_size: int = STREAM_CHUNK_ROWS):
+    content_type = wire.media_type(request.headers.get("content-type")) or streaming.NDJSON
+    if task_type is not None and task_type not in N_FEATURES:
+        raise HTTPException(status_code=400, detail="task_type 必须是 'iris' 或 'housing'")
+    if not 1 <= chunk_size <= MAX_BATCH_ROWS:
+        raise HTTPException(status_code=400, detail=f"chunk_size 必须在 1 到 {MAX_BATCH_ROWS} 之间")
+
+    lines = streaming.iter_lines(request.stream())
+    if content_type == streaming.CSV:
+        if task_type is None:
+            raise HTTPException(status_code=400, detail="CSV 格式需要查询参数 task_type")
+        lines = streaming.skip_csv_header(lines)
+        parse_row = lambda line: streaming.parse_csv_row(line, task_type)
+    elif content_type in (streaming.NDJSON, "application/jsonl", "application/json"):
+        parse_row = lambda line: streaming.parse_ndjson_row(line, task_type, N_FEATURES)
+    else:
+        raise HTTPException(status_code=415, detail=f"不支持的请求格式: {content_type}（支持 NDJSON 和 CSV）")
+
+    # 先确认要用到的模型能加载，加载失败时还能返回正常的 500（开始输出之后就改不了状态码了）
+    for name in ([task_type] if task_type else N_FEATURES):
+        await _get_model(name)
+
+    results = streaming.score_stream(
+        lines, parse_row, N_FEATURES, TASK_NAMES, _predict_rows, _format_fragments, chunk_size
+    )
+    return streaming.BodyStreamingResponse(results, media_type=streaming.NDJSON)
+
+
+# 微批处理统计：排队耗时 vs 计算耗时（用于调 MICROBATCH_* 参数）
+@app.get("/batcher/stats")
+def batcher_stats():
+    if micro_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **micro_batcher.stats()}
+
+
+# 健康检查：不碰模型、不占推理池，推理再忙也能立刻返回
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+# 就绪检查：MODEL_WARMUP 里的模型都加载好了才返回 200，同时列出哪些模型已常驻内存
+@app.get("/ready")
+async def ready():
+    models = registry.status()
+    is_ready = all(models[name]["loaded"] for name in WARMUP_MODELS)
+    body = {"ready": is_ready, "warmup": WARMUP_MODELS, "models": models}
+    if not is_ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+# 推理池状态：每种任务的 worker 数、处理中的请求数、被拒绝的次数
+@app.get("/executor/stats")
+def executor_stats():
+    if inference_executor is None:
+        return {"enabled": False}
+    return {"enabled": True, **inference_executor.stats()}
+
+
+# 手动触发一次模型热更新检查（例如 Day 15 重新训练并保存新模型之后调用）
+@app.post("/admin/reload")
+async def admin_reload():
+    swapped = await run_in_threadpool(_reload_models)
+    return {"swapped": swapped, "models": registry.status()}
+
+
+# 预测缓存统计：命中 / 未命中 / 淘汰次数
+@app.get("/cache/stats")
+def cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+
+# 监控指标（Prometheus 文本格式）：请求数 / 错误数 / 耗时直方图 + 模型加载耗时 + 进程内存
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    lines = [api_metrics.render().rstrip("\n")]
+    models = registry.status()
+    metrics.gauge(lines, "model_loaded", "模型是否已加载（1 = 已加载），version 标签是当前版本", ("model", "version"),
+                  {(name, m["version"] or ""): int(m["loaded"]) for name, m in models.items()})
+    metrics.gauge(lines, "model_load_duration_seconds", "最近一次加载模型的耗时（秒）", ("model",),
+                  {(name,): m["load_seconds"] for name, m in models.items() if m["load_seconds"] is not None})
+    metrics.gauge(lines, "model_swaps_total", "模型热更新替换次数", ("model",),
+                  {(name,): m["swaps"] for name, m in models.items()})
+    usage = rss_mb()
+    if usage is not None:
+        metrics.gauge(lines, "process_memory_bytes", "进程常驻内存（rss 总量 / anon 私有 / file 文件映射）", ("kind",),
+                      {(kind,): int(mb * 1024 * 1024) for kind, mb in usage.items()})
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+# 采样分析：开一个时间窗口，窗口内所有请求都采样、持续抓调用栈，结束后写到 PROFILE_DIR
+@app.post("/admin/profile")
+def admin_profile(seconds: float = 30.0, interval_ms: float = PROFILE_INTERVAL_MS):
+    if not 0 < seconds <= 600:
+        raise HTTPException(status_code=400, detail="seconds 必须在 0 到 600 之间")
+    if api_metrics.profiler is None:
+        api_metrics.profiler = Profiler(PROFILE_DIR, sample_rate=0.0, interval_ms=interval_ms)
+    if api_metrics.profiler.window_running():
+        raise HTTPException(status_code=409, detail="已经有一个分析窗口在运行")
+    api_metrics.profiler.start_window(seconds, interval_ms)
+    return api_metrics.profiler.status()
+
+
+@app.get("/admin/profile")
+def admin_profile_status():
+    if api_metrics.profiler is None:
+        return {"enabled": False}
+    return {"enabled": True, **api_metrics.profiler.status()}
+
+
+# 只给已注册的接口路径单独统计（其他路径记作 "other"）
+api_metrics.known_paths = {route.path for route in app.routes}
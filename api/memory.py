@@ -0,0 +1,29 @@
+# ==============================
+# 🧠 进程内存统计
+# 功能：读取当前进程的常驻内存（RSS），并区分
+#      - anon：进程私有内存（每个 worker 各占一份）
+#      - file：文件映射内存（mmap 的模型在这里，多个 worker 共用页缓存）
+# 只在 Linux（包括 Docker 容器）上可用，其他系统返回 None
+# ==============================
+
+
+def rss_mb():
+    """返回 {"rss": 总常驻内存, "anon": 私有内存, "file": 文件映射内存}，单位 MB；读不到时返回 None"""
+    keys = {"VmRSS": "rss", "RssAnon": "anon", "RssFile": "file"}
+    usage = {}
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in keys:
+                    usage[keys[name]] = round(int(value.split()[0]) / 1024, 1)   # kB → MB
+    except OSError:
+        return None
+    return usage or None
+
+
+def format_rss(usage):
+    """把 rss_mb() 的结果格式化成一行日志"""
+    if usage is None:
+        return "未知（仅支持 Linux）"
+    return f"{usage.get('rss', 0):.1f} MB（私有 {usage.get('anon', 0):.1f} MB，文件映射 {usage.get('file', 0):.1f} MB）"
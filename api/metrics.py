@@ -0,0 +1,224 @@
+# ==============================
+# 📈 接口监控指标（Prometheus 文本格式）
+# 功能：统计每个接口 / task_type 的请求数、错误数、总耗时直方图，以及分段耗时：
+#   - parse：收到请求 → 进入接口函数（读请求体 + 校验）
+#   - queue：在线程池 / 推理池 / 微批队列里排队
+#   - compute：model.predict 本身
+#   - serialize：算完 → 开始发送响应（组装结果 + 转成 JSON）
+# 记录方式：每个请求一个 RequestTimer（放在 contextvar 里，接口函数随时能取到），
+#          请求结束时由中间件在事件循环线程里一次性写进直方图——所有写入都在同一个线程，不需要加锁
+# 不依赖 prometheus_client，GET /metrics 直接返回文本格式
+# ==============================
+import contextvars
+import time
+from bisect import bisect_left
+
+# 直方图的桶（秒）：从 0.1ms 到 10s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar("request_timer", default=None)
+
+
+def timed_call(fn, *args):
+    """在工作线程 / 子进程里调用，返回 (结果, 开始时间, 结束时间)，用来区分排队和计算耗时"""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, started, time.perf_counter()
+
+
+def add_timing(timings, stage, seconds):
+    """把一段耗时累加到 timings 字典里（timings 为 None 时什么都不做）"""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class RequestTimer:
+    __slots__ = ("start", "last_mark", "task_type", "stages")
+
+    def __init__(self, start):
+        self.start = start
+        self.last_mark = start
+        self.task_type = ""
+        self.stages = {}   # 阶段 -> 秒
+
+    def mark_computed(self):
+        """模型算完了：之后到开始发送响应的时间算作 serialize"""
+        self.last_mark = time.perf_counter()
+
+
+def current_stages():
+    """当前请求的分段耗时字典（不在请求里时返回 None），传给推理池 / 微批处理器去累加"""
+    timer = _current.get()
+    return timer.stages if timer is not None else None
+
+
+def begin(task_type):
+    """接口函数开头调用：记下 task_type，之前的时间算作 parse；返回分段耗时字典（没有中间件时返回 None）"""
+    timer = _current.get()
+    if timer is None:
+        return None
+    timer.last_mark = time.perf_counter()
+    timer.task_type = task_type
+    timer.stages["parse"] = timer.last_mark - timer.start
+    return timer.stages
+
+
+def computed():
+    timer = _current.get()
+    if timer is not None:
+        timer.mark_computed()
+
+
+def _observe(hist, value, _buckets=LATENCY_BUCKETS, _bisect=bisect_left):
+    hist.counts[_bisect(_buckets, value)] += 1
+    hist.sum += value
+    hist.count += 1
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)   # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        _observe(self, value)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+
+class Series:
+    """同一个 (接口路径, task_type) 的全部统计，记录时只需要一次字典查找"""
+    __slots__ = ("statuses", "latency", "stages")
+
+    def __init__(self):
+        self.statuses = {}         # 状态码 -> 次数
+        self.latency = Histogram()
+        self.stages = {}           # 阶段 -> Histogram
+
+
+class Metrics:
+    def __init__(self):
+        self.known_paths = None     # 只给已注册的路由单独统计，其他路径都记作 "other"（防止标签爆炸）
+        self.series = {}            # (path, task_type) -> Series
+        self.profiler = None        # api/profiler.py 的 Profiler；开启分析时才会设置
+
+    def record(self, path, status, timer, response_start, end):
+        """请求结束时由中间件调用（事件循环线程）；这里每个请求都会走一遍，所以写得比较“省”"""
+        if self.known_paths is not None and path not in self.known_paths:
+            path = "other"
+        task_type = timer.task_type
+        series = self.series.get((path, task_type))
+        if series is None:
+            series = self.series[(path, task_type)] = Series()
+        statuses = series.statuses
+        statuses[status] = statuses.get(status, 0) + 1
+        _observe(series.latency, end - timer.start)
+
+        if not task_type:
+            return   # 不是预测接口（/health 等），没有分段耗时
+        stages = timer.stages
+        if response_start is not None and response_start >= timer.last_mark:
+            stages["serialize"] = response_start - timer.last_mark   # 流式接口边算边发，没有单独的 serialize 阶段
+        histograms = series.stages
+        for stage, seconds in stages.items():
+            hist = histograms.get(stage)
+            if hist is None:
+                hist = histograms[stage] = Histogram()
+            _observe(hist, seconds)
+
+    def render(self):
+        requests, errors, latency, stage_latency = {}, {}, {}, {}
+        for (path, task_type), series in self.series.items():
+            for status, count in series.statuses.items():
+                requests[(path, task_type, status)] = count
+                if status >= 400:
+                    errors[(path, task_type, status)] = count
+            latency[(path, task_type)] = series.latency
+            for stage, hist in series.stages.items():
+                # 同一个 task_type 的分段耗时合并所有接口（/predict、/predict/fast ...）
+                merged = stage_latency.setdefault((stage, task_type), Histogram())
+                merged.merge(hist)
+
+        lines = []
+        _counter(lines, "api_requests_total", "请求总数", ("path", "task_type", "status"), requests)
+        _counter(lines, "api_request_errors_total", "返回 4xx / 5xx 的请求数", ("path", "task_type", "status"), errors)
+        _histogram(lines, "api_request_duration_seconds", "请求总耗时（秒）", ("path", "task_type"), latency)
+        _histogram(lines, "api_stage_duration_seconds", "分段耗时（秒）：parse / queue / compute / serialize", ("stage", "task_type"), stage_latency)
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names, values):
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _counter(lines, name, help_text, label_names, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for values, count in sorted(samples.items()):
+        lines.append(f"{name}{_labels(label_names, values)} {count}")
+
+
+def gauge(lines, name, help_text, label_names, samples):
+    """samples：{标签值元组: 数值}"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} gauge")
+    for values, value in sorted(samples.items()):
+        lines.append(f"{name}{_labels(label_names, values)} {value}")
+
+
+def _histogram(lines, name, help_text, label_names, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for values, hist in sorted(samples.items()):
+        cumulative = 0
+        for le, count in zip(LATENCY_BUCKETS + ("+Inf",), hist.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(label_names + ('le',), values + (le,))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(label_names, values)} {hist.sum}")
+        lines.append(f"{name}_count{_labels(label_names, values)} {hist.count}")
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件（比 BaseHTTPMiddleware 开销小得多）：给每个请求挂一个 RequestTimer，结束时记录指标"""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer(time.perf_counter())
+        token = _current.set(timer)
+        status = 500
+        response_start = None
+        profiler = self.metrics.profiler
+        sampled = profiler is not None and profiler.begin_request()
+
+        async def send_with_status(message):
+            nonlocal status, response_start
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_start = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            end = time.perf_counter()
+            self.metrics.record(scope["path"], status, timer, response_start, end)
+            if sampled:
+                profiler.end_request(scope["path"], status, timer, end)
@@ -0,0 +1,168 @@
+# ==============================
+# 🔬 采样分析器（看 p99 变慢时时间花在哪）
+# 功能：后台线程每隔 interval_ms 毫秒抓一次所有线程的 Python 调用栈，累计成“折叠栈”格式，
+#      同时记录被采样请求的分段耗时（parse / queue / compute / serialize）
+# 两种触发方式：
+#   - 按比例：PROFILE_SAMPLE_RATE=0.01 表示 1% 的请求被采样；有被采样的请求在处理时才抓栈
+#   - 时间窗口：POST /admin/profile?seconds=30，接下来 30 秒内所有请求都采样、一直抓栈
+# 结果写到 PROFILE_DIR（默认 profiles/）：
+#   - profile_<时间>_<pid>_<序号>.folded：每行 “线程;函数;函数;... 次数”，可以直接用 flamegraph.pl 或 speedscope 画火焰图
+#   - profile_<时间>_<pid>_<序号>.requests.jsonl：每个被采样请求一行（接口、task_type、状态码、总耗时、分段耗时）
+# 不开启时不创建任何线程，请求路径上只多一次 “是不是 None” 的判断
+# ==============================
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _fold_stack(frame):
+    """把一个线程当前的调用栈变成 “外层;...;内层” 的字符串"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    def __init__(self, output_dir="profiles", sample_rate=0.0, interval_ms=5.0, flush_seconds=60.0):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000.0
+        self.flush_seconds = flush_seconds
+
+        self._lock = threading.Lock()
+        self._active = threading.Event()     # 有被采样的请求在处理中，或者时间窗口还没结束
+        self._inflight = 0
+        self._window_until = 0.0
+        self._window_open = False            # 时间窗口开过、但结果还没写文件
+        self._stacks = Counter()             # 折叠栈 -> 采样次数
+        self._requests = []                  # 被采样请求的耗时记录
+        self._samples = 0
+        self._files = []
+        self._flushes = 0                    # 第几次写文件（同一秒里写多次时文件名也不会重复）
+        self._thread = None
+
+    # ---------- 请求路径（由 MetricsMiddleware 调用）----------
+    def begin_request(self):
+        """决定这个请求要不要采样；要采样时确保抓栈线程在工作"""
+        if time.monotonic() < self._window_until:
+            sampled = True
+        else:
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if sampled:
+            with self._lock:
+                self._inflight += 1
+                self._active.set()
+            self._ensure_thread()
+        return sampled
+
+    def end_request(self, path, status, timer, end):
+        record = {
+            "time": round(time.time(), 3),
+            "path": path,
+            "task_type": timer.task_type,
+            "status": status,
+            "total_ms": round((end - timer.start) * 1000, 3),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in timer.stages.items()},
+        }
+        with self._lock:
+            self._requests.append(record)
+            self._inflight -= 1
+            if self._inflight == 0 and not self._window_open:
+                self._active.clear()
+
+    # ---------- 时间窗口 ----------
+    def start_window(self, seconds, interval_ms=None):
+        """接下来 seconds 秒内所有请求都采样、持续抓栈；结束时自动写文件"""
+        with self._lock:
+            if interval_ms is not None:
+                self.interval = interval_ms / 1000.0
+            self._window_until = time.monotonic() + seconds
+            self._window_open = True
+            self._active.set()
+        self._ensure_thread()
+
+    def window_running(self):
+        return time.monotonic() < self._window_until
+
+    # ---------- 抓栈线程 ----------
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        my_id = threading.get_ident()
+        last_flush = time.monotonic()
+        while True:
+            if not self._active.wait(timeout=self.flush_seconds):
+                # 空闲：有没写出去的数据就写出去
+                self.flush()
+                last_flush = time.monotonic()
+                continue
+
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == my_id:
+                    continue
+                stack = _fold_stack(frame)
+                with self._lock:
+                    self._stacks[f"{names.get(thread_id, thread_id)};{stack}"] += 1
+            self._samples += 1
+
+            now = time.monotonic()
+            if self._window_open and now >= self._window_until:
+                # 时间窗口刚结束：没有其他采样请求时停下，并立刻写文件
+                with self._lock:
+                    self._window_open = False
+                    if self._inflight == 0:
+                        self._active.clear()
+                self.flush()
+                last_flush = now
+            elif now - last_flush >= self.flush_seconds:
+                self.flush()
+                last_flush = now
+            time.sleep(self.interval)
+
+    # ---------- 输出 ----------
+    def flush(self):
+        """把累计的栈和请求耗时写到一对新文件里，返回文件路径（没有数据时返回 None）"""
+        with self._lock:
+            stacks, self._stacks = self._stacks, Counter()
+            requests, self._requests = self._requests, []
+            self._flushes += 1
+            sequence = self._flushes
+        if not stacks and not requests:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{sequence:04d}")
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(base + ".requests.jsonl", "w", encoding="utf-8") as f:
+            for record in requests:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._files.append(base)
+        print(f"🔬 分析结果已保存: {base}.folded（{sum(stacks.values())} 个栈样本，{len(requests)} 个请求）")
+        return base
+
+    def status(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval * 1000.0,
+            "window_running": self.window_running(),
+            "window_remaining_s": round(max(0.0, self._window_until - time.monotonic()), 1),
+            "inflight_sampled": self._inflight,
+            "samples_taken": self._samples,
+            "output_dir": self.output_dir,
+            "files": [os.path.basename(base) for base in self._files[-20:]],
+        }
@@ -0,0 +1,215 @@
+# ==============================
+# 🌐 共享预测缓存（Redis 协议客户端）
+# 功能：把预测结果放到进程外的缓存服务里，同一台机器的所有 uvicorn worker、
+#      甚至多个容器副本都能共用同一份缓存
+# - 只用标准库 socket 实现了 Redis 协议（RESP）里用到的几条命令，不需要安装 redis 包
+# - 可以连真正的 Redis，也可以连 api/cache_server.py 这个本地替身（走 Unix socket，同机 worker 共用）
+# - 一批键只用一次往返：查询用 MGET，写入把多条 SET ... PX 拼成一次发送（pipeline）
+# - 缓存服务连不上或超时时，只当作没命中，绝不影响预测本身
+# 地址格式：
+#   unix:///tmp/prediction-cache.sock
+#   redis://127.0.0.1:6379/0
+# ==============================
+import json
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from api.cache import CacheBackend
+
+
+class RedisError(Exception):
+    """缓存服务返回了错误回复（-ERR ...）"""
+
+
+def encode_command(*args):
+    """把一条命令编码成 RESP 数组：*参数个数 $长度 内容..."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, (int, float)):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def read_reply(reader):
+    """从缓冲读取器里读出一条完整回复（简单字符串 / 错误 / 整数 / 字符串 / 数组）"""
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("缓存服务关闭了连接")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        return RedisError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [read_reply(reader) for _ in range(length)]
+    raise RedisError(f"无法解析的回复: {line!r}")
+
+
+class RedisClient:
+    """最小的 Redis 客户端：一条长连接 + 一把锁，断线后下次调用自动重连"""
+
+    def __init__(self, url, timeout=0.05):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", "unix"):
+            raise ValueError(f"不支持的缓存地址: {url}（只支持 redis:// 和 unix://）")
+        self.url = url
+        self.timeout = timeout
+        self._parsed = parsed
+        self._db = int(parsed.path.strip("/") or 0) if parsed.scheme == "redis" else 0
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._parsed.scheme == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self._parsed.path)
+        else:
+            sock = socket.create_connection((self._parsed.hostname or "127.0.0.1", self._parsed.port or 6379), self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+        if self._db:
+            self._send([("SELECT", self._db)])
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._reader = None
+
+    def _send(self, commands):
+        self._sock.sendall(b"".join(encode_command(*cmd) for cmd in commands))
+        return [read_reply(self._reader) for _ in commands]
+
+    def pipeline(self, commands):
+        """一次发送多条命令，按顺序返回每条的回复（只有一次网络往返）"""
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._send(commands)
+            except (OSError, ConnectionError):
+                # 连接坏了：关掉，下次调用重连
+                self.close()
+                raise
+
+    def execute(self, *args):
+        reply = self.pipeline([args])[0]
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+
+class RedisCache(CacheBackend):
+    """
+    预测缓存的 Redis 后端
+    - 键：前缀:任务:模型版本:量化后特征的二进制（float64），版本号变了旧键自然用不到，靠 TTL 过期
+    - 值：JSON 文本（鸢尾花是类别编号，房价是浮点数）
+    - 每次查询 / 写入都是一次阻塞的 socket 往返（最长等 timeout），接口层会放到线程池里调用
+    """
+    blocking = True
+
+    def __init__(self, url, ttl_seconds=300.0, decimals=6, timeout=0.05, prefix="pred", retry_seconds=5.0):
+        self.client = RedisClient(url, timeout=timeout)
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+        self.prefix = prefix
+        self.retry_seconds = retry_seconds   # 出错后这么多秒内不再尝试，避免每个请求都卡在超时上
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.round_trips = 0
+        self.last_error = None
+
+    def make_keys(self, task_type, version, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.decimals is not None:
+            X = np.round(X, self.decimals)
+        X = X + 0.0   # 把 -0.0 变成 0.0，保证相同的值得到相同的键
+        head = f"{self.prefix}:{task_type}:{version}:".encode()
+        return [head + row.tobytes() for row in X]
+
+    def _call(self, commands):
+        """发送一批命令；缓存服务不可用时返回 None"""
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            replies = self.client.pipeline(commands)
+        except (OSError, ConnectionError, RedisError) as e:
+            with self._lock:
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ 预测缓存服务不可用（{self.last_error}），{self.retry_seconds:.0f}s 内直接跳过缓存")
+            self._down_until = time.monotonic() + self.retry_seconds
+            return None
+        with self._lock:
+            self.round_trips += 1
+        return replies
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        replies = self._call([("MGET", *keys)])
+        values = replies[0] if replies and isinstance(replies[0], list) else [None] * len(keys)
+        results = [json.loads(v) if v is not None else None for v in values]
+        hits = sum(v is not None for v in results)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return results
+
+    def put_many(self, keys, values):
+        if not keys:
+            return
+        ttl_ms = int(self.ttl_seconds * 1000)
+        commands = [
+            ("SET", key, json.dumps(value.item() if hasattr(value, "item") else value), "PX", ttl_ms)
+            for key, value in zip(keys, values)
+        ]
+        self._call(commands)
+
+    def invalidate(self, task_type):
+        """版本号是键的一部分，换版本后旧键不会再被查到，留给 TTL 清理即可（共享缓存里不做全库扫描）"""
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "url": self.client.url,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "round_trips": self.round_trips,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "config": {
+                "ttl_seconds": self.ttl_seconds,
+                "decimals": self.decimals,
+                "timeout_s": self.client.timeout,
+            },
+        }
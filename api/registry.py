@@ -0,0 +1,178 @@
+# ==============================
+# 📚 模型注册表（懒加载 + 版本热更新）
+# 功能：启动时不加载任何模型，第一次用到某个模型时才加载；
+#      每个模型一把锁，并发的第一批请求只会触发一次加载；
+#      models/ 目录里出现新版本文件时，在后台加载、用样例数据预热，然后原子替换
+# ==============================
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from api.memory import format_rss, rss_mb
+
+# 一个已加载的模型版本：模型对象、版本号、文件路径、加载完成的时间
+LoadedModel = namedtuple("LoadedModel", ["model", "version", "path", "loaded_at"])
+
+
+class ModelNotAvailableError(Exception):
+    """模型文件不存在或加载失败（由接口转换成 500）"""
+
+
+def latest_artifact(directory, pattern, settle_seconds=2.0):
+    """
+    在目录里找版本号最大的模型文件，返回 (版本号, 路径)；找不到返回 None
+    - pattern 是正则，第一个分组是版本数字，例如 r"regressor_v(\\d+)_rf_tuned\\.joblib"
+    - 版本号里带上文件修改时间，同名文件被覆盖也算新版本
+    - 刚修改不到 settle_seconds 秒的文件可能还没写完，这一轮先跳过（只在热更新检查时有意义，
+      第一次加载时还没有可用的版本，注册表传 0，直接用最新的文件）
+    """
+    candidates = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None
+    for filename in names:
+        match = re.fullmatch(pattern, filename)
+        if match:
+            path = os.path.join(directory, filename)
+            candidates.append((int(match.group(1)), os.path.getmtime(path), path))
+    if not candidates:
+        return None
+
+    number, mtime, path = max(candidates)
+    if time.time() - mtime < settle_seconds:
+        # 最新的文件还在写入，退回到其他已经稳定的文件
+        stable = [c for c in candidates if time.time() - c[1] >= settle_seconds]
+        if not stable:
+            return None
+        number, mtime, path = max(stable)
+    return f"v{number}@{int(mtime)}", path
+
+
+class ModelRegistry:
+    def __init__(self, settle_seconds=2.0):
+        self.settle_seconds = settle_seconds   # 热更新时，刚修改不到这么多秒的文件先不用（可能还没写完）
+        self._specs = {}          # 名字 -> (resolve, loader, probe)
+        self._models = {}         # 名字 -> 当前在线的 LoadedModel
+        self._locks = {}          # 名字 -> 这个模型专用的锁（首次加载时用）
+        self._reload_lock = threading.Lock()   # 同一时间只做一轮热更新检查
+        self._load_seconds = {}   # 名字 -> 最近一次加载耗时
+        self._errors = {}         # 名字 -> 最近一次加载失败的原因
+        self._swaps = {}          # 名字 -> 热更新替换次数
+
+    def register(self, name, resolve, loader, probe=None):
+        """
+        登记一个模型，只记住怎么加载，不立刻加载
+        - resolve(settle_seconds)：返回当前应该使用的 (版本号, 路径)，找不到返回 None；
+          刚修改不到 settle_seconds 秒的文件跳过（第一次加载时是 0）
+        - loader(path)：按路径加载模型
+        - probe(model)：用样例数据预测一次（预热，同时确认新模型能用）
+        """
+        self._specs[name] = (resolve, loader, probe)
+        self._locks[name] = threading.Lock()
+        self._swaps[name] = 0
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name):
+        """取出当前在线的模型；还没加载就在当前线程加载"""
+        return self.current(name).model
+
+    def current(self, name):
+        """取出当前在线的 LoadedModel（模型 + 版本号），同一模型同时只有一个线程在加载"""
+        loaded = self._models.get(name)
+        if loaded is not None:
+            return loaded
+
+        with self._locks[name]:
+            # 拿到锁后再检查一次：可能别的线程刚刚加载完
+            loaded = self._models.get(name)
+            if loaded is not None:
+                return loaded
+            loaded = self._load(name)
+            self._models[name] = loaded
+            return loaded
+
+    def _load(self, name, settle_seconds=0.0):
+        """
+        找到最新版本的文件，加载并预热；失败时抛出 ModelNotAvailableError
+        第一次加载（settle_seconds=0）不等文件“稳定”：刚部署 / 刚复制进来的文件也能马上用，
+        否则在文件满 settle_seconds 秒之前每个请求都会返回“找不到模型文件”
+        """
+        resolve, loader, probe = self._specs[name]
+        found = resolve(settle_seconds)
+        if found is None:
+            self._errors[name] = "找不到模型文件"
+            raise ModelNotAvailableError(self._errors[name])
+        version, path = found
+
+        print(f"🔍 正在加载模型: {name} {version}（{os.path.basename(path)}）...")
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        try:
+            model = loader(path)
+            if probe is not None:
+                probe(model)
+        except Exception as e:
+            self._errors[name] = f"{type(e).__name__}: {e}"
+            print(f"❌ 模型 {name} {version} 加载失败: {self._errors[name]}")
+            raise ModelNotAvailableError(self._errors[name]) from e
+
+        self._load_seconds[name] = time.perf_counter() - start
+        self._errors.pop(name, None)
+        print(
+            f"✅ [pid {os.getpid()}] 模型 {name} {version} 加载完成（{self._load_seconds[name]:.2f}s），"
+            f"进程内存: {format_rss(rss_before)} → {format_rss(rss_mb())}"
+        )
+        return LoadedModel(model, version, path, time.time())
+
+    def check_for_updates(self):
+        """
+        检查已加载的模型有没有新版本：有就在当前（后台）线程加载 + 预热，然后原子替换
+        - 替换只是一次字典赋值，正在处理的请求手里拿的还是旧模型对象，会用旧版本算完
+        - 新版本加载失败时保留旧版本继续服务，下次检查再试
+        返回本轮被替换的模型名字列表
+        """
+        swapped = []
+        with self._reload_lock:
+            for name in list(self._models):
+                resolve = self._specs[name][0]
+                found = resolve(self.settle_seconds)
+                if found is None or found[0] == self._models[name].version:
+                    continue
+                try:
+                    new = self._load(name, self.settle_seconds)
+                except ModelNotAvailableError:
+                    continue
+                old = self._models[name]
+                self._models[name] = new
+                self._swaps[name] += 1
+                swapped.append(name)
+                print(f"🔄 模型 {name} 已从 {old.version} 切换到 {new.version}")
+        return swapped
+
+    def warm_up(self, names):
+        """提前加载一批模型（失败的只记录原因，不影响其他模型）"""
+        for name in names:
+            try:
+                self.current(name)
+            except ModelNotAvailableError:
+                pass
+
+    def status(self):
+        """每个模型是否已常驻内存、当前版本、加载耗时、失败原因"""
+        report = {}
+        for name in self._specs:
+            loaded = self._models.get(name)
+            report[name] = {
+                "loaded": loaded is not None,
+                "version": loaded.version if loaded else None,
+                "path": os.path.basename(loaded.path) if loaded else None,
+                "load_seconds": round(self._load_seconds[name], 3) if name in self._load_seconds else None,
+                "swaps": self._swaps[name],
+                "error": self._errors.get(name),
+            }
+        return report
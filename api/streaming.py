@@ -0,0 +1,146 @@
+# ==============================
+# 🌊 流式打分（NDJSON / CSV）
+# 功能：边读请求体边打分，每攒够 chunk_size 行就预测一次并立刻把结果写回去
+# - 服务端内存只和 chunk_size 有关，和上传多少行无关
+# - 客户端在上传还没结束时就能收到前面的结果
+# - 每个输入行对应一个输出行（顺序不变）；某一行格式不对只返回这一行的错误，不影响其他行
+# 输入行格式：
+#   NDJSON：{"task_type": "housing", "features": [...]}，或者只写特征数组 [...]（需要 ?task_type=）
+#   CSV：每行一组特征，逗号分隔（需要 ?task_type=）；第一行不是数字时当作表头跳过
+# ==============================
+import json
+
+import numpy as np
+from starlette.responses import StreamingResponse
+
+from api import fastjson
+
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+MAX_LINE_BYTES = 64 * 1024   # 单行最长多少字节（防止没有换行的超大请求把内存撑爆）
+
+
+class RowError(ValueError):
+    """某一行的格式不对（只影响这一行）"""
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    边读请求体边返回的 StreamingResponse
+    Starlette 默认会同时开一个任务监听客户端断开，它会和我们抢着读请求体，
+    这里去掉那个任务：客户端断开时，读请求体或写响应会直接报错，一样能停下来
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks):
+    """把请求体的数据块切成一行一行（去掉行尾的 \\r\\n）"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" not in chunk:
+            if len(buffer) > MAX_LINE_BYTES:
+                raise RowError(f"单行超过 {MAX_LINE_BYTES} 字节")
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if buffer.strip():
+        yield buffer.rstrip(b"\r")
+
+
+def parse_ndjson_row(line: bytes, default_task, task_names):
+    try:
+        value = fastjson.loads(line)
+    except fastjson.PayloadError as e:
+        raise RowError(str(e))
+    if isinstance(value, list):
+        if default_task is None:
+            raise RowError("只写特征数组时需要查询参数 task_type")
+        return default_task, value
+    try:
+        return fastjson.parse_item(value, task_names)
+    except fastjson.PayloadError as e:
+        raise RowError(str(e))
+
+
+def parse_csv_row(line: bytes, default_task):
+    return default_task, line.decode("utf-8", errors="replace").split(",")
+
+
+def to_row(features, n_features: int, name: str) -> np.ndarray:
+    """一行特征 → float64 数组，检查数量和取值"""
+    if len(features) != n_features:
+        raise RowError(f"{name}需要 {n_features} 个特征，但收到了 {len(features)} 个")
+    try:
+        row = np.asarray(features, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise RowError("features 必须是数字列表")
+    if row.ndim != 1 or not np.isfinite(row).all():
+        raise RowError("features 必须是有限的数字")
+    return row
+
+
+def error_line(message: str) -> bytes:
+    return json.dumps({"error": message}, ensure_ascii=False).encode() + b"\n"
+
+
+async def score_stream(lines, parse_row, n_features, task_names, predict_rows, format_rows, chunk_size):
+    """
+    逐行解析，每 chunk_size 行按任务分组预测一次，按输入顺序输出 NDJSON
+    - parse_row(line) -> (task_type, features)，格式不对抛 RowError
+    - predict_rows(task_type, X) -> 预测结果（异步）
+    - format_rows(task_type, preds) -> 每行结果的 JSON 字节
+    """
+    pending = []   # 当前这一块里每一行：(task_type, 特征数组) 或 (None, 错误信息)
+
+    async def flush():
+        out = [None] * len(pending)
+        for task_type in task_names:
+            positions = [i for i, (t, _) in enumerate(pending) if t == task_type]
+            if not positions:
+                continue
+            X = np.stack([pending[i][1] for i in positions])
+            for i, fragment in zip(positions, format_rows(task_type, await predict_rows(task_type, X))):
+                out[i] = fragment + b"\n"
+        for i, (task_type, value) in enumerate(pending):
+            if task_type is None:
+                out[i] = error_line(value)
+        pending.clear()
+        return b"".join(out)
+
+    try:
+        async for line in lines:
+            if not line.strip():
+                continue
+            try:
+                task_type, features = parse_row(line)
+                pending.append((task_type, to_row(features, n_features[task_type], task_names[task_type])))
+            except RowError as e:
+                pending.append((None, str(e)))
+            if len(pending) >= chunk_size:
+                yield await flush()
+    except RowError as e:
+        # 请求体本身出问题（例如一行太长）：先把已经读到的行算完，再报错结束
+        pending.append((None, str(e)))
+    if pending:
+        yield await flush()
+
+
+def skip_csv_header(lines):
+    """CSV 第一行如果不是数字，就当作表头跳过"""
+    async def wrapped():
+        first = True
+        async for line in lines:
+            if first:
+                first = False
+                try:
+                    [float(v) for v in line.decode("utf-8", errors="replace").split(",")]
+                except ValueError:
+                    continue
+            yield line
+    return wrapped()
@@ -0,0 +1,146 @@
+# ==============================
+# 📦 二进制传输格式（批量打分用）
+# 功能：10 万行房价特征用 JSON 发送又大又慢，这里支持两种二进制格式，按 Content-Type / Accept 协商：
+# - application/x-raw-float32、application/x-raw-float64：小端序的原始浮点数，按行排列，
+#   形状放在请求头 X-Shape: 行数,列数；解析就是一次 np.frombuffer，不复制内存
+# - application/vnd.apache.arrow.stream：Apache Arrow IPC 流（需要安装 pyarrow，可选依赖）
+#   一列 FixedSizeList<float> 时直接零复制；每个特征一列时需要拼一次
+# 返回的预测结果同样按 Accept 编码，不写 Accept 时和请求用同一种格式
+# ==============================
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:   # pyarrow 是可选依赖，没装时只是不能用 Arrow 格式
+    pa = None
+
+JSON = "application/json"
+RAW_FLOAT32 = "application/x-raw-float32"
+RAW_FLOAT64 = "application/x-raw-float64"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+RAW_DTYPES = {RAW_FLOAT32: np.dtype("<f4"), RAW_FLOAT64: np.dtype("<f8")}
+BINARY_TYPES = (RAW_FLOAT32, RAW_FLOAT64, ARROW_STREAM)
+
+
+class WireFormatError(ValueError):
+    """二进制请求体格式不对（默认 400；不支持的格式 415 / 406）"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def media_type(header):
+    """'application/x-raw-float32; charset=binary' → 'application/x-raw-float32'"""
+    return (header or "").split(";")[0].strip().lower()
+
+
+def negotiate(accept, default):
+    """从 Accept 头里挑第一个支持的格式；没写或者是 */* 时用 default"""
+    for part in (accept or "").split(","):
+        candidate = media_type(part)
+        if candidate in (JSON,) + BINARY_TYPES:
+            return candidate
+        if candidate in ("*/*", "application/*"):
+            return default
+    if accept:
+        raise WireFormatError(f"不支持的返回格式: {accept}", status_code=406)
+    return default
+
+
+def _require_arrow():
+    if pa is None:
+        raise WireFormatError("服务器没有安装 pyarrow，不能使用 Arrow 格式（pip install pyarrow）", status_code=415)
+
+
+def _check_finite(X):
+    if not np.isfinite(X).all():
+        raise WireFormatError("特征里不能有 NaN 或无穷大", status_code=422)
+    return X
+
+
+def decode_raw(body: bytes, content_type: str, shape_header: str | None, n_features: int) -> np.ndarray:
+    """原始浮点数 → (n, n_features) 数组，直接引用请求体的内存（只读）"""
+    if not shape_header:
+        raise WireFormatError("原始浮点数格式需要请求头 X-Shape: 行数,列数")
+    try:
+        n_rows, n_cols = (int(v) for v in shape_header.split(","))
+    except ValueError:
+        raise WireFormatError(f"X-Shape 格式不对: {shape_header!r}，应为 行数,列数")
+    if n_cols != n_features:
+        raise WireFormatError(f"需要 {n_features} 个特征，但 X-Shape 里是 {n_cols} 个")
+    dtype = RAW_DTYPES[content_type]
+    if n_rows <= 0 or len(body) != n_rows * n_cols * dtype.itemsize:
+        raise WireFormatError(f"请求体 {len(body)} 字节，和 X-Shape {n_rows}x{n_cols}（{dtype.name}）对不上")
+    return _check_finite(np.frombuffer(body, dtype=dtype).reshape(n_rows, n_cols))
+
+
+def decode_arrow(body: bytes, n_features: int) -> np.ndarray:
+    """
+    Arrow IPC 流 → (n, n_features) 数组
+    - 一列 FixedSizeList<float32/float64>[n_features]：直接引用 Arrow 的内存，不复制
+    - n_features 列浮点数（按列顺序对应特征）：拼成按行排列的数组（复制一次）
+    """
+    _require_arrow()
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise WireFormatError(f"无法解析 Arrow 流: {e}")
+    if table.num_rows == 0:
+        raise WireFormatError("Arrow 流里没有数据")
+
+    if table.num_columns == 1 and pa.types.is_fixed_size_list(table.schema.field(0).type):
+        column = table.column(0).combine_chunks()
+        if column.type.list_size != n_features:
+            raise WireFormatError(f"需要 {n_features} 个特征，但每行有 {column.type.list_size} 个")
+        values = column.flatten()
+        if column.null_count or values.null_count:
+            raise WireFormatError("特征里不能有空值")
+        return _check_finite(values.to_numpy(zero_copy_only=True).reshape(-1, n_features))
+
+    if table.num_columns != n_features:
+        raise WireFormatError(f"需要 {n_features} 列特征，但收到了 {table.num_columns} 列")
+    if any(column.null_count for column in table.columns):
+        raise WireFormatError("特征里不能有空值")
+    try:
+        X = np.column_stack([column.to_numpy().astype(np.float64, copy=False) for column in table.columns])
+    except (TypeError, ValueError) as e:
+        raise WireFormatError(f"特征列必须是数字: {e}")
+    return _check_finite(X)
+
+
+def decode(body: bytes, content_type: str, shape_header: str | None, n_features: int) -> np.ndarray:
+    if content_type in RAW_DTYPES:
+        return decode_raw(body, content_type, shape_header, n_features)
+    if content_type == ARROW_STREAM:
+        return decode_arrow(body, n_features)
+    raise WireFormatError(f"不支持的请求格式: {content_type}", status_code=415)
+
+
+def encode(preds: np.ndarray, accept: str, labels=None):
+    """
+    把预测结果编码成 (字节, Content-Type, 额外响应头)
+    labels 不为空时（分类任务），preds 是类别编号：原始格式里返回编号，响应头 X-Classes 给出编号对应的名字；
+    Arrow 格式里同时返回 class_index 和 prediction（名字）两列
+    """
+    headers = {"X-Shape": str(len(preds))}
+    if labels is not None:
+        headers["X-Classes"] = ",".join(labels)
+
+    if accept in RAW_DTYPES:
+        return np.ascontiguousarray(preds, dtype=RAW_DTYPES[accept]).tobytes(), accept, headers
+
+    if accept == ARROW_STREAM:
+        _require_arrow()
+        if labels is not None:
+            index = np.asarray(preds, dtype=np.int8)
+            table = pa.table({"class_index": index, "prediction": pa.array(np.asarray(labels)[index])})
+        else:
+            table = pa.table({"prediction": np.asarray(preds, dtype=np.float64)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), accept, headers
+
+    raise WireFormatError(f"不支持的返回格式: {accept}", status_code=406)
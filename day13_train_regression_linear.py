@@ -1,5 +1,4 @@
 # train_regression.py —— Day 13 回归实战（支持离线 fallback）
-from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
@@ -8,63 +7,24 @@ import joblib
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 
+from training.dataset import load_housing_split
+
 # ==============================
-# 1. 加载加州房价数据（带 fallback）
+# 1. 加载加州房价数据（共享数据集，带 fallback）
 # ==============================
-print("📥 正在加载加州房价数据...")
-
-# 尝试加载真实数据
-try:
-    from sklearn.datasets import fetch_california_housing
-    housing = fetch_california_housing()
-    print("✅ 成功加载真实加州房价数据！")
-except Exception as e:
-    print(f"⚠️ 无法加载真实数据 ({type(e).__name__}: {e})，正在切换到模拟数据...")
-    
-    # --- 使用模拟数据替代 ---
-    from sklearn.datasets import make_regression
-    
-    X_sim, y_sim = make_regression(
-        n_samples=20640,
-        n_features=8,
-        n_informative=6,
-        noise=100,
-        random_state=42
-    )
-    
-    # 缩放目标值到合理房价范围 [0.15k, 5.0k]
-    y_sim = (y_sim - y_sim.min()) / (y_sim.max() - y_sim.min())
-    y_sim = y_sim * (5.0 - 0.15) + 0.15
-    
-    # 构造兼容对象
-    class MockHousing:
-        def __init__(self):
-            self.data = X_sim
-            self.target = y_sim
-            self.feature_names = [
-                'MedInc', 'HouseAge', 'AveRooms', 'AveBedrms',
-                'Population', 'AveOccup', 'Latitude', 'Longitude'
-            ]
-            self.DESCR = "Simulated California Housing Dataset (offline fallback)"
-    
-    housing = MockHousing()
-    print("✅ 已切换到模拟加州房价数据（离线模式）")
-
-# 提取特征和目标
-X, y = housing.data, housing.target
+# 数据集由 training/dataset.py 统一生成并缓存（真实数据下载失败时用模拟数据），训练集 / 测试集划分对所有脚本都一样
+data = load_housing_split()
+X_train, X_test, y_train, y_test = data.X_train, data.X_test, data.y_train, data.y_test
 
-print(f"📊 数据规模: {X.shape[0]} 条样本, {X.shape[1]} 个特征")
-print(f"🏷️  特征名: {housing.feature_names}")
-print(f"💰 目标（房价中位数）范围: ${y.min():.1f}k - ${y.max():.1f}k")
+print(f"📊 数据规模: {len(y_train) + len(y_test)} 条样本, {X_train.shape[1]} 个特征")
+print(f"🏷️  特征名: {data.feature_names}")
+print(f"💰 目标（房价中位数）范围: ${min(y_train.min(), y_test.min()):.1f}k - ${max(y_train.max(), y_test.max()):.1f}k")
 
 # ==============================
 # 2~7. 原有训练流程（完全不变）
 # ==============================
 
-# 2. 划分训练集/测试集
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
+# 2. 划分训练集/测试集（已经在 training/dataset.py 里按 random_state=42 划分好）
 
 # 3. 构建回归 Pipeline
 pipeline = Pipeline([
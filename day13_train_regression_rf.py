@@ -1,5 +1,10 @@
 # train_regression.py —— Day 13 回归实战（支持离线 fallback）
-from sklearn.model_selection import train_test_split
+# 用法：
+#   python day13_train_regression_rf.py                                # 100 棵树
+#   python day13_train_regression_rf.py --n-estimators 50 100 200      # 一个森林依次种到 50 / 100 / 200 棵，每步都打分
+#   python day13_train_regression_rf.py --n-estimators 300 --warm-start   # 接着上次保存的模型种到 300 棵（不重新训练已有的树）
+import argparse
+import os
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
@@ -8,72 +13,59 @@ import joblib
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 
-# ==============================
-# 1. 加载加州房价数据（带 fallback）
-# ==============================
-print("📥 正在加载加州房价数据...")
+from training.dataset import load_housing_split
+from training.tuning import grow_and_score
 
-# 尝试加载真实数据
-try:
-    from sklearn.datasets import fetch_california_housing
-    housing = fetch_california_housing()
-    print("✅ 成功加载真实加州房价数据！")
-except Exception as e:
-    print(f"⚠️ 无法加载真实数据 ({type(e).__name__}: {e})，正在切换到模拟数据...")
-    
-    # --- 使用模拟数据替代 ---
-    from sklearn.datasets import make_regression
-    
-    X_sim, y_sim = make_regression(
-        n_samples=20640,
-        n_features=8,
-        n_informative=6,
-        noise=100,
-        random_state=42
-    )
-    
-    # 缩放目标值到合理房价范围 [0.15k, 5.0k]
-    y_sim = (y_sim - y_sim.min()) / (y_sim.max() - y_sim.min())
-    y_sim = y_sim * (5.0 - 0.15) + 0.15
-    
-    # 构造兼容对象
-    class MockHousing:
-        def __init__(self):
-            self.data = X_sim
-            self.target = y_sim
-            self.feature_names = [
-                'MedInc', 'HouseAge', 'AveRooms', 'AveBedrms',
-                'Population', 'AveOccup', 'Latitude', 'Longitude'
-            ]
-            self.DESCR = "Simulated California Housing Dataset (offline fallback)"
-    
-    housing = MockHousing()
-    print("✅ 已切换到模拟加州房价数据（离线模式）")
+parser = argparse.ArgumentParser(description="训练随机森林房价模型")
+parser.add_argument('--n-estimators', type=int, nargs='+', default=[100], help="树的数量（写多个时依次种到每个数量并打分，保存最大的）")
+parser.add_argument('--warm-start', action='store_true', help="接着已保存的模型继续种树（训练集必须一样）")
+args = parser.parse_args()
 
-# 提取特征和目标
-X, y = housing.data, housing.target
+# ==============================
+# 1. 加载加州房价数据（共享数据集，带 fallback）
+# ==============================
+# 数据集由 training/dataset.py 统一生成并缓存（真实数据下载失败时用模拟数据），训练集 / 测试集划分对所有脚本都一样
+data = load_housing_split()
+X_train, X_test, y_train, y_test = data.X_train, data.X_test, data.y_train, data.y_test
 
-print(f"📊 数据规模: {X.shape[0]} 条样本, {X.shape[1]} 个特征")
-print(f"🏷️  特征名: {housing.feature_names}")
-print(f"💰 目标（房价中位数）范围: ${y.min():.1f}k - ${y.max():.1f}k")
+print(f"📊 数据规模: {len(y_train) + len(y_test)} 条样本, {X_train.shape[1]} 个特征")
+print(f"🏷️  特征名: {data.feature_names}")
+print(f"💰 目标（房价中位数）范围: ${min(y_train.min(), y_test.min()):.1f}k - ${max(y_train.max(), y_test.max()):.1f}k")
 
 # ==============================
 # 2~7. 原有训练流程（完全不变）
 # ==============================
 
-# 2. 划分训练集/测试集
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
+# 2. 划分训练集/测试集（已经在 training/dataset.py 里按 random_state=42 划分好）
 
-# 3. 构建回归 Pipeline
-pipeline = Pipeline([
-    ('scaler', StandardScaler()),
-     ('regressor', RandomForestRegressor(n_estimators=100, random_state=42))
-])
+# 3. 构建回归 Pipeline（--warm-start 时接着已保存的模型种树）
+MODEL_PATH = 'california_housing_pipeline_v1_rf.joblib'
+pipeline = None
+if args.warm_start and os.path.exists(MODEL_PATH):
+    saved = joblib.load(MODEL_PATH)
+    scaler = StandardScaler().fit(X_train)
+    # 只有在同一份训练集上训练的模型才能接着种（标准化参数一样就说明训练集一样）
+    if np.array_equal(saved.named_steps['scaler'].mean_, scaler.mean_) and np.array_equal(saved.named_steps['scaler'].scale_, scaler.scale_):
+        pipeline = saved
+        print(f"🌱 接着 {MODEL_PATH} 里已有的 {len(pipeline.named_steps['regressor'].estimators_)} 棵树继续训练")
+    else:
+        print(f"⚠️ {MODEL_PATH} 不是在当前训练集上训练的，从头开始")
+if pipeline is None:
+    pipeline = Pipeline([
+        ('scaler', StandardScaler()),
+         ('regressor', RandomForestRegressor(n_estimators=100, random_state=42))
+    ])
+    pipeline.named_steps['scaler'].fit(X_train)
 
-# 4. 训练
-pipeline.fit(X_train, y_train)
+# 4. 训练：依次种到每个树数，每次只训练新增的树，测试集 R² 也只用新增的树增量更新
+scaler, forest = pipeline.named_steps['scaler'], pipeline.named_steps['regressor']
+X_train_scaled, X_test_scaled = scaler.transform(X_train), scaler.transform(X_test)
+try:
+    for n, n_r2 in grow_and_score(forest, args.n_estimators, X_train_scaled, y_train, X_test_scaled, y_test):
+        print(f"  🌲 {n} 棵树：测试集 R² {n_r2:.4f}")
+except ValueError as e:
+    raise SystemExit(f"❌ {e}（去掉 --warm-start 从头训练，或者把 --n-estimators 设成不少于已有的树数）")
+forest.set_params(warm_start=False)
 
 # 5. 预测
 y_pred = pipeline.predict(X_test)
@@ -90,5 +82,5 @@ print(f"  RMSE (均方根误差): ${rmse:.2f}k")
 print(f"  R² (决定系数): {r2:.4f} (越接近1越好)")
 
 # 7. 保存模型
-joblib.dump(pipeline, 'california_housing_pipeline_v1_rf.joblib')
-print("\n💾 回归 Pipeline 已保存为 california_housing_pipeline_v1_rf.joblib")
\ No newline at end of file
+joblib.dump(pipeline, MODEL_PATH)
+print(f"\n💾 回归 Pipeline 已保存为 {MODEL_PATH}（{len(forest.estimators_)} 棵树）")
\ No newline at end of file
@@ -1,132 +1,198 @@
-# compare_models.py —— Day 14 模型对比（支持离线 fallback）
-import joblib
+# compare_models.py —— Day 14 模型对比（评估引擎，支持离线 fallback）
+# 自动找出 models/ 下所有模型文件（格式见 api/artifacts.py），在多个进程里并行预测测试集，然后生成 JSON / Markdown 报告
+# - 测试集来自 training/dataset.py 的共享数据集（.npy），工作进程直接内存映射读取，不通过进程间传输
+# - 预测结果按 (模型文件内容哈希, 测试集哈希) 缓存在 evals/prediction_cache/，模型和数据都没变时不再重新预测
+# - 特征数和测试集对不上的模型（例如鸢尾花模型）会跳过，也会记进缓存
+#
+# 用法：
+#   python day14_compare_models.py
+#   python day14_compare_models.py --workers 4 --no-cache
+import argparse
 import json
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import numpy as np
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from api.artifacts import content_hash, discover, load_artifact, load_hash_index, save_hash_index
+from training.dataset import DATASET_DIR, load_housing_split, split_hash
+
+MODELS_DIR = 'models'
+CACHE_DIR = 'evals/prediction_cache'
+REPORT_JSON = 'evals/model_comparison_day14.json'
+REPORT_MD = 'evals/model_comparison_day14.md'
+
+# Day 34 的模型性能报告（有的话）：按文件名查单行延迟和内存，选模型时一起考虑
+BENCHMARK_PATH = 'evals/model_benchmark.json'
+R2_TOLERANCE = 0.01   # R² 差距在这个范围内的模型算“一样准”，优先选更快、更省内存的
+
 
 # ==============================
-# 1. 加载数据（带 fallback，与训练时完全一致！）
+# 1. 工作进程：加载一个模型，预测测试集，结果写进缓存
 # ==============================
-print("📥 正在加载加州房价数据（用于评估）...")
-
-try:
-    from sklearn.datasets import fetch_california_housing
-    housing = fetch_california_housing()
-    print("✅ 使用真实加州房价数据")
-except Exception as e:
-    print(f"⚠️ 真实数据加载失败 ({type(e).__name__})，切换到模拟数据...")
-    from sklearn.datasets import make_regression
-    
-    X_sim, y_sim = make_regression(
-        n_samples=20640,
-        n_features=8,
-        noise=100,
-        random_state=42
-    )
-    # 缩放到合理房价范围 [0.15, 5.0]
-    y_sim = (y_sim - y_sim.min()) / (y_sim.max() - y_sim.min())
-    y_sim = y_sim * (5.0 - 0.15) + 0.15
-    
-    class MockHousing:
-        def __init__(self):
-            self.data = X_sim
-            self.target = y_sim
-            self.feature_names = [
-                'MedInc', 'HouseAge', 'AveRooms', 'AveBedrms',
-                'Population', 'AveOccup', 'Latitude', 'Longitude'
-            ]
-    housing = MockHousing()
-    print("✅ 使用模拟加州房价数据（离线模式）")
-
-X, y = housing.data, housing.target
-
-# 划分测试集（必须和训练时完全一致！）
-_, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+_X_test = None
+
+
+def init_worker(x_test_path):
+    global _X_test
+    _X_test = np.load(x_test_path, mmap_mode='r')
+
+
+def predict_artifact(path, fmt, cache_path):
+    """返回 (是否成功, 说明)；成功时预测结果写到 cache_path（先写临时文件再改名）"""
+    start = time.perf_counter()
+    model = load_artifact(path, fmt)
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is not None and n_features != _X_test.shape[1]:
+        return False, f"特征数是 {n_features}，不是房价模型（需要 {_X_test.shape[1]} 个）"
+    y_pred = np.asarray(model.predict(_X_test), dtype=np.float64)
+    tmp_path = cache_path + '.tmp.npy'
+    np.save(tmp_path, y_pred)
+    os.replace(tmp_path, cache_path)
+    return True, f"{time.perf_counter() - start:.2f}s"
+
 
 # ==============================
-# 2~5. 原有评估逻辑（保持不变）
+# 2. 评估指标 + 报告
 # ==============================
-os.makedirs('evals', exist_ok=True)
-
-model_configs = [
-    {
-        'name': 'Linear Regression',
-        'path': 'E:/AI_learning/models/california_housing_pipeline_v1_linear.joblib',
-        'type': 'regressor'
-    },
-    {
-        'name': 'Random Forest',
-        'path': 'E:/AI_learning/models/california_housing_pipeline_v1_rf.joblib',
-        'type': 'regressor'
+def evaluate(name, fmt, y_test, y_pred):
+    mae = float(mean_absolute_error(y_test, y_pred))
+    rmse = float(np.sqrt(mean_squared_error(y_test, y_pred)))
+    r2 = float(r2_score(y_test, y_pred))
+    negative_count = int((y_pred < 0).sum())
+    return {
+        'model_name': name,
+        'format': fmt,
+        'mae': round(mae, 4),
+        'rmse': round(rmse, 4),
+        'r2': round(r2, 4),
+        'negative_predictions': negative_count,
+        'is_business_safe': negative_count == 0
     }
-]
-
-
-results = []
-for config in model_configs:
-    try:
-        print(f"🔍 评估模型: {config['name']}")
-        if not os.path.exists(config['path']):
-            raise FileNotFoundError(f"模型文件不存在: {config['path']}")
-        
-        model = joblib.load(config['path'])
-        y_pred = model.predict(X_test)
-        
-        mae = float(mean_absolute_error(y_test, y_pred))
-        rmse = float(np.sqrt(mean_squared_error(y_test, y_pred)))
-        r2 = float(r2_score(y_test, y_pred))
-        negative_count = int((y_pred < 0).sum())
-        
-        result = {
-            'model_name': config['name'],
-            'mae': round(mae, 4),
-            'rmse': round(rmse, 4),
-            'r2': round(r2, 4),
-            'negative_predictions': negative_count,
-            'is_business_safe': negative_count == 0
-        }
-        results.append(result)
-        print(f"  ✅ MAE: ${mae:.2f}k, R²: {r2:.4f}, 负预测: {negative_count}")
-        
-    except Exception as e:
-        print(f"  ❌ 评估失败: {e}")
-        results.append({
-            'model_name': config['name'],
-            'error': str(e)
-        })
-
-# 保存报告
-report_path = 'E:/AI_learning/evals/model_comparison_day14.json'
-with open(report_path, 'w', encoding='utf-8') as f:
-    json.dump(results, f, indent=2, ensure_ascii=False)
-
-print(f"\n📊 模型对比报告已保存至: {report_path}")
-
-# 推荐逻辑
-safe_models = [r for r in results if r.get('is_business_safe', False)]
-if safe_models:
-    best = max(safe_models, key=lambda x: x['r2'])
-    print(f"\n🏆 推荐模型: {best['model_name']} (R²={best['r2']:.4f}, 无负预测)")
-else:
-    print("\n⚠️ 警告：所有模型均存在负预测！")
-
-    # 6. 生成 Markdown 报告（用于 README 或文档）
-md_lines = ["# 📊 Day 14 模型 A/B 测试报告\n"]
-md_lines.append("| 模型 | MAE ($k) | RMSE ($k) | R² | 负预测数 | 安全 |")
-md_lines.append("|------|----------|-----------|-----|----------|------|")
-
-for r in results:
-    if 'error' not in r:
-        safe_icon = "✅" if r['is_business_safe'] else "❌"
-        md_lines.append(
-            f"| {r['model_name']} | {r['mae']:.2f} | {r['rmse']:.2f} | {r['r2']:.4f} | {r['negative_predictions']} | {safe_icon} |"
-        )
-
-
-with open('E:/AI_learning/evals/model_comparison_day14.md', 'w', encoding='utf-8') as f:
-    f.write('\n'.join(md_lines))
-
-
-print("📄 Markdown 报告已生成: E:/AI_learning/evals/model_comparison_day14.md")
\ No newline at end of file
+
+
+def load_performance():
+    if not os.path.exists(BENCHMARK_PATH):
+        print(f"⚠️ 没有找到 {BENCHMARK_PATH}，只按准确率选模型（先运行 day34_benchmark_models.py 可以一起比较延迟和内存）")
+        return {}
+    with open(BENCHMARK_PATH, encoding='utf-8') as f:
+        performance = {m['artifact']: m for m in json.load(f)['models'] if 'error' not in m}
+    print(f"📈 已读取模型性能报告: {BENCHMARK_PATH}（{len(performance)} 个模型文件）")
+    return performance
+
+
+def recommend(results):
+    safe_models = [r for r in results if r.get('is_business_safe', False)]
+    if not safe_models:
+        print("\n⚠️ 警告：所有模型均存在负预测！")
+        return
+    # 先按 R² 找出“足够准”的模型，再在里面挑单行延迟最低、内存最小的（没有性能数据的排在最后）
+    best_r2 = max(r['r2'] for r in safe_models)
+    candidates = [r for r in safe_models if r['r2'] >= best_r2 - R2_TOLERANCE]
+    best = min(candidates, key=lambda x: (x.get('latency_us_p50', float('inf')), x.get('memory_mb') or float('inf'), -x['r2']))
+    perf_text = f", 单行 {best['latency_us_p50']:.0f}µs" if 'latency_us_p50' in best else ""
+    print(f"\n🏆 推荐模型: {best['model_name']} (R²={best['r2']:.4f}, 无负预测{perf_text})")
+
+
+def write_markdown(results):
+    md_lines = ["# 📊 Day 14 模型 A/B 测试报告\n"]
+    md_lines.append("| 模型 | MAE ($k) | RMSE ($k) | R² | 负预测数 | 安全 | 单行延迟 (µs) | 内存 (MB) |")
+    md_lines.append("|------|----------|-----------|-----|----------|------|---------------|-----------|")
+    for r in results:
+        if 'error' not in r and 'skipped' not in r:
+            safe_icon = "✅" if r['is_business_safe'] else "❌"
+            md_lines.append(
+                f"| {r['model_name']} | {r['mae']:.2f} | {r['rmse']:.2f} | {r['r2']:.4f} | {r['negative_predictions']} | {safe_icon} "
+                f"| {r.get('latency_us_p50', '-')} | {r.get('memory_mb') or '-'} |"
+            )
+    with open(REPORT_MD, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(md_lines))
+
+
+# ==============================
+# 3. 主流程
+# ==============================
+def main():
+    parser = argparse.ArgumentParser(description="并行评估 models/ 下所有房价模型，生成对比报告")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="并行预测的进程数")
+    parser.add_argument('--no-cache', action='store_true', help="忽略缓存的预测结果，全部重新预测")
+    args = parser.parse_args()
+    start_time = time.perf_counter()
+
+    data = load_housing_split()
+    y_test = data.y_test
+    data_key = split_hash()[:16]
+    x_test_path = os.path.join(DATASET_DIR, 'X_test.npy')
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # 算每个模型文件的内容哈希（大小和修改时间没变的文件直接用上次记下的哈希）
+    index_path = os.path.join(CACHE_DIR, 'hashes.json')
+    hash_index = load_hash_index(index_path)
+    artifacts = []
+    for path, fmt in discover(args.models_dir):
+        key = f'{content_hash(path, hash_index)[:16]}_{data_key}'
+        artifacts.append((path, fmt, os.path.join(CACHE_DIR, key + '.npy'), os.path.join(CACHE_DIR, key + '.skip')))
+    save_hash_index(index_path, hash_index)
+    if not artifacts:
+        raise SystemExit(f"❌ {args.models_dir}/ 下没有找到模型文件")
+
+    todo = [a for a in artifacts if args.no_cache or not (os.path.exists(a[2]) or os.path.exists(a[3]))]
+    print(f"🔍 共 {len(artifacts)} 个模型文件，{len(artifacts) - len(todo)} 个使用缓存，{len(todo)} 个需要预测")
+
+    errors = {}
+    if todo:
+        workers = max(1, min(args.workers, len(todo)))
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(x_test_path,)) as pool:
+            futures = {pool.submit(predict_artifact, path, fmt, cache_path): (path, skip_path)
+                       for path, fmt, cache_path, skip_path in todo}
+            for future in as_completed(futures):
+                path, skip_path = futures[future]
+                try:
+                    ok, message = future.result()
+                except Exception as e:
+                    errors[path] = str(e)
+                    print(f"  ❌ {path}: {e}")
+                    continue
+                if ok:
+                    if os.path.exists(skip_path):
+                        os.remove(skip_path)
+                    print(f"  ✅ {path}（{message}）")
+                else:
+                    with open(skip_path, 'w', encoding='utf-8') as f:
+                        f.write(message)
+                    print(f"  ⏭️ {path}: {message}")
+
+    # 汇总（所有指标都从缓存的预测结果算，很快）
+    performance = load_performance()
+    results = []
+    for path, fmt, cache_path, skip_path in artifacts:
+        name = os.path.basename(path)
+        if path in errors:
+            results.append({'model_name': name, 'format': fmt, 'error': errors[path]})
+        elif os.path.exists(skip_path) and not os.path.exists(cache_path):
+            with open(skip_path, encoding='utf-8') as f:
+                results.append({'model_name': name, 'format': fmt, 'skipped': f.read()})
+        else:
+            result = evaluate(name, fmt, y_test, np.load(cache_path))
+            perf = performance.get(name)
+            if perf is not None:
+                result['latency_us_p50'] = perf['single_row_us']['p50']
+                result['memory_mb'] = (perf['memory_mb'] or {}).get('rss')
+            results.append(result)
+            print(f"  📊 {name}: MAE ${result['mae']:.2f}k, R² {result['r2']:.4f}, 负预测 {result['negative_predictions']}")
+
+    with open(REPORT_JSON, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n📊 模型对比报告已保存至: {REPORT_JSON}")
+    recommend(results)
+    write_markdown(results)
+    print(f"📄 Markdown 报告已生成: {REPORT_MD}")
+    print(f"⏱️ 总耗时 {time.perf_counter() - start_time:.1f}s")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
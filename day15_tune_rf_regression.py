@@ -1,46 +1,43 @@
 # tune_rf_regression.py —— Day 15 超参数调优（支持离线 & 与 Day13/14 一致）
+# 两种搜索方式：
+#   python day15_tune_rf_regression.py                                  # 随机搜索：20 组参数 × 5 折，全部完整训练
+#   python day15_tune_rf_regression.py --search halving                 # 逐轮减半：差的参数用很少的资源就淘汰掉
+#   python day15_tune_rf_regression.py --search halving --time-budget 120
+#   python day15_tune_rf_regression.py --warm-start                     # 热启动：只有树数不同的参数共用一个森林，接着种
+#   python day15_tune_rf_regression.py --cores 8                        # 交叉验证用 8 个核（默认全部）
+# 中断后用同样的命令重新运行会从断点继续（逐轮减半加 --restart 从头开始）
+import argparse
+import json
 import os
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+import time
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 import numpy as np
 
-# ==============================
-# 1. 加载数据（与 Day 13/14 完全一致的 fallback 逻辑！）
-# ==============================
-print("📥 加载加州房价数据...")
-
-try:
-    from sklearn.datasets import fetch_california_housing
-    housing = fetch_california_housing()
-    X, y = housing.data, housing.target
-    print("✅ 使用真实加州房价数据")
-except Exception as e:
-    print(f"⚠️ 真实数据加载失败 ({type(e).__name__})，切换到模拟数据...")
-    from sklearn.datasets import make_regression
-    
-    # ⚠️ 关键：必须和 Day13/14 的模拟逻辑完全一致！
-    X, y = make_regression(
-        n_samples=20640,
-        n_features=8,
-        n_informative=6,
-        noise=100,
-        random_state=42
-    )
-    # 缩放到真实房价范围 [0.15, 5.0]（单位：千美元）
-    y = (y - y.min()) / (y.max() - y.min())  # 归一化到 [0, 1]
-    y = y * (5.0 - 0.15) + 0.15              # 缩放到 [0.15, 5.0]
-    print("✅ 使用模拟加州房价数据（离线模式，与 Day13/14 一致）")
+from training.dataset import load_housing_split, split_hash
+from training.cv_executor import CVExecutor
+from training.tuning import (SearchState, add_free_tree_counts, cross_validate, cv_folds, sample_candidates,
+                             successive_halving)
 
-print(f"📊 数据规模: {X.shape[0]} 样本, {X.shape[1]} 特征")
+parser = argparse.ArgumentParser(description="随机森林超参数调优")
+parser.add_argument('--search', choices=['random', 'halving'], default='random', help="搜索方式")
+parser.add_argument('--time-budget', type=float, help="逐轮减半的时间预算（秒），用完就停下")
+parser.add_argument('--factor', type=int, default=3, help="逐轮减半：每轮保留 1/factor 的候选")
+parser.add_argument('--rungs', type=int, default=3, help="逐轮减半：一共几轮（第一轮资源是 1/factor^(rungs-1)）")
+parser.add_argument('--restart', action='store_true', help="逐轮减半：忽略断点，从头开始")
+parser.add_argument('--warm-start', action='store_true',
+                    help="热启动：只有 n_estimators 不同的参数共用一个森林；随机搜索时更小的树数也顺便打分")
+parser.add_argument('--cores', type=int, help="交叉验证用几个核（默认全部）：先分给并行的 (候选, 折)，多出来的给森林的 n_jobs")
+args = parser.parse_args()
 
 # ==============================
-# 2. 划分数据集（random_state=42 保证一致性）
+# 1~2. 加载数据 + 划分（共享数据集，random_state=42 保证一致性）
 # ==============================
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
+# 数据集由 training/dataset.py 统一生成并缓存，训练集 / 测试集划分和 Day 13/14 完全一样
+data = load_housing_split()
+X_train, X_test, y_train, y_test = data.X_train, data.X_test, data.y_train, data.y_test
+print(f"📊 数据规模: {len(y_train) + len(y_test)} 样本, {X_train.shape[1]} 特征（{data.source}）")
 
 # ==============================
 # 3. 超参数调优
@@ -53,35 +50,85 @@ param_dist = {
     # 注意：random_state 不在此处搜索，直接在模型中固定
 }
 
-# 创建基础模型（固定 random_state 保证可复现）
-rf = RandomForestRegressor(random_state=42)
+N_CANDIDATES = 20
+STATE_PATH = 'evals/tuning_state_day15.json'
+LOG_PATH = 'evals/tuning_log_day15.json'
+CV_RESULTS_PATH = 'evals/cv_results_day15_{dataset}.jsonl'   # 随机搜索每个 (候选, 折) 的得分，一行一个；数据集变了就换一个文件
+search_name = args.search + ('_warm' if args.warm_start else '')   # 调优日志里按这个名字分别记录
+search_start = time.perf_counter()
 
-print("🔍 开始超参数随机搜索（5 折交叉验证，20 组组合）...")
-search = RandomizedSearchCV(
-    estimator=rf,
-    param_distributions=param_dist,
-    n_iter=20,
-    cv=5,
-    scoring='r2',
-    n_jobs=-1,
-    verbose=1,
-    random_state=42  # 控制搜索的随机性
-)
+if args.search == 'random':
+    # 同样的 20 个候选、同样的 5 折，得分和 RandomizedSearchCV 逐位相同；
+    # 每个 (候选, 折) 是一个任务，由 training/cv_executor.py 分给多个进程，结果逐条写进 evals/cv_results_day15_*.jsonl（中断后重跑会跳过）
+    # 热启动时每组种到最大树数的过程中，参数空间里更小的树数也顺便打分（不增加训练量）
+    candidates = sample_candidates(param_dist, N_CANDIDATES, random_state=42)
+    scored = add_free_tree_counts(candidates, param_dist['n_estimators']) if args.warm_start else candidates
+    extra_text = f" + 顺便打分的 {len(scored) - N_CANDIDATES} 组" if args.warm_start else ""
+    print(f"🔍 开始{'热启动' if args.warm_start else '超参数'}随机搜索（5 折交叉验证，{N_CANDIDATES} 组组合{extra_text}）...")
+    os.makedirs('evals', exist_ok=True)
+    results_path = CV_RESULTS_PATH.format(dataset=split_hash()[:16])
+    with CVExecutor(X_train, y_train, cv_folds(len(y_train), 5), n_cores=args.cores, results_path=results_path) as executor:
+        print(f"⚙️ {executor.n_cores} 个核：{len(executor.done)} 个 (候选, 折) 已有结果")
+        scores, trees_built, trees_naive = cross_validate(scored, executor, warm_start=args.warm_start, random_state=42)
+    mean_scores = {i: float(np.mean(fold_scores)) for i, fold_scores in scores.items()}
+    best_index = max(mean_scores, key=mean_scores.get)
+    best_params = scored[best_index]
+    cv_best_score = mean_scores[best_index]
+    best_model = RandomForestRegressor(**best_params, random_state=42, n_jobs=-1)
+    best_model.fit(X_train, y_train)
+    search_seconds = time.perf_counter() - search_start
+    search_info = {'n_fits': len(scored) * 5, 'completed': True, 'cores': executor.n_cores}
+    if args.warm_start:
+        naive_sampled = sum(c['n_estimators'] for c in candidates) * 5
+        print(f"🌱 实际训练 {trees_built} 棵树（逐个训练这 {N_CANDIDATES} 组需要 {naive_sampled} 棵，打分的 {len(scored)} 组需要 {trees_naive} 棵）")
+        search_info.update({'warm_start': True, 'trees_built': trees_built, 'trees_naive': naive_sampled})
+else:
+    # 逐轮减半：同样的 20 个候选、同样的 5 折，但大部分候选只用 1/9 的样本和树打分（见 training/tuning.py）
+    candidates = sample_candidates(param_dist, N_CANDIDATES, random_state=42)
+    fingerprint = {
+        'dataset': split_hash(), 'candidates': candidates,
+        'factor': args.factor, 'rungs': args.rungs, 'n_splits': 5, 'random_state': 42,
+    }
+    os.makedirs('evals', exist_ok=True)
+    state = SearchState(STATE_PATH, fingerprint, restart=args.restart)
+    previous_seconds = state.elapsed
+    if state.scores:
+        print(f"⏩ 从断点继续：已完成 {len(state.scores)} 个 (候选, 轮次)，已用时 {state.elapsed:.0f}s")
+    budget_text = f"，时间预算 {args.time_budget:.0f}s" if args.time_budget else ""
+    print(f"🔍 开始逐轮减半搜索（5 折交叉验证，{N_CANDIDATES} 组组合，{args.rungs} 轮，每轮保留 1/{args.factor}{budget_text}）...")
+    result = successive_halving(
+        X_train, y_train, candidates, state,
+        factor=args.factor, n_rungs=args.rungs, time_budget=args.time_budget, random_state=42,
+        n_cores=args.cores, warm_start=args.warm_start
+    )
+    if not result['completed']:
+        print("⚠️ 时间预算用完，没有跑完最后一轮：下面的 R² 是在较少资源下得到的")
+    best_params = result['best_params']
+    cv_best_score = result['best_score']
+    search_info = {
+        'n_fits': sum(len(scores) for scores in state.scores.values()),
+        'completed': result['completed'],
+        'rungs': result['rungs'],
+        'warm_start': args.warm_start,
+        'cores': args.cores or os.cpu_count(),
+    }
 
-search.fit(X_train, y_train)
+    # 用完整训练集重新训练最佳参数（和 RandomizedSearchCV 的 refit 一样）
+    best_model = RandomForestRegressor(**best_params, random_state=42, n_jobs=-1)
+    best_model.fit(X_train, y_train)
+    # 用时包括之前被中断的运行（和随机搜索一样，也算上最后的 refit）
+    search_seconds = previous_seconds + time.perf_counter() - search_start
 
 # ==============================
 # 4. 输出结果 & 保存模型
 # ==============================
 print("\n✅ 最佳超参数:")
-best_params = search.best_params_
 for k, v in best_params.items():
     print(f"  {k}: {v}")
 
-print(f"🏆 交叉验证最佳 R²: {search.best_score_:.4f}")
+print(f"🏆 交叉验证最佳 R²: {cv_best_score:.4f}（{search_name} 搜索，用时 {search_seconds:.0f}s）")
 
 # 评估测试集
-best_model = search.best_estimator_
 y_pred = best_model.predict(X_test)
 test_mae = mean_absolute_error(y_test, y_pred)
 test_r2 = r2_score(y_test, y_pred)
@@ -92,19 +139,37 @@ print(f"  R²: {test_r2:.4f}")
 
 # 保存模型
 os.makedirs('models', exist_ok=True)
-model_path = 'E:/AI_learning/models/regressor_v2_rf_tuned.joblib'
+model_path = 'models/regressor_v2_rf_tuned.joblib'
 joblib.dump(best_model, model_path)
 print(f"\n💾 调优后模型已保存至: {model_path}")
 
-# 在 tune_rf_regression.py 末尾添加
-#  在 evals/ 目录下保存调优日志
-import json
+#  在 evals/ 目录下保存调优日志（两种搜索方式的结果都保留，方便对比）
+previous = {}
+if os.path.exists(LOG_PATH):
+    with open(LOG_PATH, encoding='utf-8') as f:
+        previous = json.load(f)
+searches = previous.get('searches', {})
+searches[search_name] = {
+    'best_params': best_params,
+    'cv_best_score': cv_best_score,
+    'search_seconds': round(search_seconds, 1),
+    **search_info,
+}
 tuning_log = {
+    'search': search_name,
     'best_params': best_params,
-    'cv_best_score': float(search.best_score_),
+    'cv_best_score': cv_best_score,
     'test_mae': float(test_mae),
     'test_r2': float(test_r2),
-    'data_source': 'simulated (offline fallback)'
+    'data_source': data.source,
+    'searches': searches,
 }
-with open('E:/AI_learning/evals/tuning_log_day15.json', 'w') as f:
-    json.dump(tuning_log, f, indent=2)
\ No newline at end of file
+os.makedirs('evals', exist_ok=True)
+with open(LOG_PATH, 'w', encoding='utf-8') as f:
+    json.dump(tuning_log, f, indent=2, ensure_ascii=False)
+print(f"📝 调优日志已保存至: {LOG_PATH}")
+
+if len(searches) > 1:
+    print("\n📊 各种搜索方式对比:")
+    for name, info in searches.items():
+        print(f"  {name:>12}: R² {info['cv_best_score']:.4f}，用时 {info['search_seconds']:.0f}s，{info['n_fits']} 次拟合")
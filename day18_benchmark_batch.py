@@ -0,0 +1,86 @@
+# benchmark_batch.py —— Day 18 批量预测性能对比
+# 对比两种方式给 N 条房屋数据打分：
+#   1. 逐行：每条数据调用一次 /predict（或一次 model.predict）
+#   2. 批量：所有数据一次 /predict/batch（或一次向量化 model.predict）
+import json
+import os
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient  # 需要安装 httpx
+
+from api.main import app, registry
+from api.registry import ModelNotAvailableError
+
+N_ROWS = 1000        # 一共打分多少条
+REPEATS = 3          # 重复几次取最快的一次（减少偶然波动）
+
+# ==============================
+# 1. 构造测试数据（以 Day 13 的样例房屋为中心加一点随机扰动）
+# ==============================
+rng = np.random.default_rng(42)
+sample_house = np.array([8.3252, 41.0, 6.984127, 1.023810, 322.0, 2.555556, 37.88, -122.23])
+X = sample_house * (1 + 0.1 * rng.standard_normal((N_ROWS, 8)))
+rows = X.tolist()
+
+try:
+    housing_model = registry.get("housing")
+except ModelNotAvailableError:
+    raise SystemExit("❌ 房价模型未加载，请先运行 day15_tune_rf_regression.py 生成 models/regressor_v2_rf_tuned.joblib")
+
+
+def best_of(fn):
+    """运行 REPEATS 次，返回最短耗时（秒）"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# ==============================
+# 2. 模型层面：逐行 predict vs 一次 predict
+# ==============================
+print(f"🔍 模型层面对比（{N_ROWS} 条）...")
+model_row = best_of(lambda: [housing_model.predict([row]) for row in rows])
+model_batch = best_of(lambda: housing_model.predict(X))
+
+# ==============================
+# 3. 接口层面：逐条 /predict vs 一次 /predict/batch
+# ==============================
+print(f"🔍 接口层面对比（{N_ROWS} 条）...")
+client = TestClient(app)
+single_payloads = [{"task_type": "housing", "features": row} for row in rows]
+batch_payload = {"items": single_payloads}
+
+api_row = best_of(lambda: [client.post("/predict", json=p) for p in single_payloads])
+api_batch = best_of(lambda: client.post("/predict/batch", json=batch_payload))
+
+# 确认两种方式结果完全一致
+single_results = [client.post("/predict", json=p).json() for p in single_payloads]
+batch_results = client.post("/predict/batch", json=batch_payload).json()["results"]
+assert single_results == batch_results, "批量结果与逐条结果不一致！"
+
+# ==============================
+# 4. 输出 & 保存报告
+# ==============================
+report = {
+    "n_rows": N_ROWS,
+    "model_per_row_us": round(model_row / N_ROWS * 1e6, 2),
+    "model_batch_per_row_us": round(model_batch / N_ROWS * 1e6, 2),
+    "model_speedup": round(model_row / model_batch, 1),
+    "api_per_row_us": round(api_row / N_ROWS * 1e6, 2),
+    "api_batch_per_row_us": round(api_batch / N_ROWS * 1e6, 2),
+    "api_speedup": round(api_row / api_batch, 1),
+}
+
+print("\n📊 每条数据平均耗时（微秒）:")
+print(f"  模型逐行: {report['model_per_row_us']:.1f}µs  →  模型批量: {report['model_batch_per_row_us']:.1f}µs  (快 {report['model_speedup']}x)")
+print(f"  接口逐条: {report['api_per_row_us']:.1f}µs  →  接口批量: {report['api_batch_per_row_us']:.1f}µs  (快 {report['api_speedup']}x)")
+
+os.makedirs("evals", exist_ok=True)
+report_path = "evals/batch_benchmark_day18.json"
+with open(report_path, "w", encoding="utf-8") as f:
+    json.dump(report, f, indent=2, ensure_ascii=False)
+print(f"\n💾 报告已保存至: {report_path}")
@@ -0,0 +1,74 @@
+# export_compiled_forest.py —— Day 21 把调优后的随机森林“拍平”成 NumPy 数组
+# 1. 加载 Day 15 的 regressor_v2_rf_tuned.joblib
+# 2. 导出成 models/regressor_v2_rf_tuned.forest.npz（特征、阈值、左右孩子、叶子值）
+# 3. 检查拍平后的预测与 best_model.predict 逐位相同
+# 4. 对比单行延迟和内存占用
+import os
+import pickle
+import time
+
+import joblib
+import numpy as np
+
+from api.forest import export_forest, load_compiled_forest, save_compiled_forest
+
+model_path = 'models/regressor_v2_rf_tuned.joblib'
+forest_path = 'models/regressor_v2_rf_tuned.forest.npz'
+
+# ==============================
+# 1. 加载模型 & 导出
+# ==============================
+print(f"📥 加载模型: {model_path}")
+best_model = joblib.load(model_path)
+
+save_compiled_forest(best_model, forest_path)
+compiled = load_compiled_forest(forest_path)
+print(f"💾 已导出: {forest_path}（{compiled.n_estimators} 棵树，最大深度 {compiled.max_depth}）")
+
+# ==============================
+# 2. 逐位一致性检查
+# 用森林里真实出现过的阈值构造测试数据：既覆盖各个分支，也覆盖“刚好等于阈值”的边界
+# ==============================
+arrays = export_forest(best_model)
+rng = np.random.default_rng(42)
+n_check = 20000
+X_check = np.empty((n_check, compiled.n_features_in_))
+for j in range(compiled.n_features_in_):
+    thresholds = arrays['threshold'][arrays['feature'] == j]
+    if len(thresholds) == 0:
+        X_check[:, j] = rng.standard_normal(n_check)
+        continue
+    X_check[:, j] = rng.uniform(thresholds.min() - 1, thresholds.max() + 1, n_check)
+    X_check[::10, j] = rng.choice(thresholds, size=len(X_check[::10, j]))   # 恰好落在阈值上
+
+expected = best_model.predict(X_check)
+assert np.array_equal(compiled.predict(X_check), expected), "拍平后的预测与 sklearn 不一致！"
+for i in range(200):
+    assert np.array_equal(compiled.predict(X_check[i:i + 1]), expected[i:i + 1]), "单行预测不一致！"
+print(f"✅ {n_check} 条数据预测结果与 best_model.predict 逐位相同")
+
+# ==============================
+# 3. 单行延迟对比（取多轮中最快的一轮，减少偶然波动）
+# ==============================
+def single_row_us(predict, repeats=5, n=500):
+    x = X_check[:1]
+    predict(x)  # 预热
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(n):
+            predict(x)
+        best = min(best, (time.perf_counter() - start) / n * 1e6)
+    return best
+
+sklearn_us = single_row_us(best_model.predict)
+compiled_us = single_row_us(compiled.predict)
+
+print("\n⚡ 单行预测延迟:")
+print(f"  sklearn:        {sklearn_us:.1f}µs")
+print(f"  CompiledForest: {compiled_us:.1f}µs  (快 {sklearn_us / compiled_us:.1f}x)")
+
+print("\n🧠 内存占用:")
+print(f"  sklearn 模型（pickle 大小）: {len(pickle.dumps(best_model)) / 1e6:.1f} MB")
+print(f"  CompiledForest（推理数组）:  {compiled.nbytes / 1e6:.1f} MB")
+print(f"  .npz 文件大小:               {os.path.getsize(forest_path) / 1e6:.1f} MB")
@@ -0,0 +1,65 @@
+# save_models_mmap.py —— Day 22 让多个 uvicorn worker 共享同一份模型内存
+# 1. 把房价随机森林拍平后逐个数组存成 .npy，放到 models/regressor_v2_rf_tuned.forest/
+# 2. 启动几个子进程模拟多个 worker，对比普通加载和内存映射加载时每个 worker 的私有内存
+# 只新写 .forest/ 目录，不动 models/ 下的 .joblib：重写会更新它们的修改时间，
+# 已经导出的 .forest.npz / .compact.npz / .linear.npz 就会被当成过期文件不再使用，运行中的服务也会把它当成新版本热更新
+#
+# 启动服务时设置 MODEL_MMAP=1 即可使用：
+#   MODEL_MMAP=1 uvicorn api.main:app --workers 4
+import multiprocessing
+import os
+
+import joblib
+import numpy as np
+
+from api.forest import CompiledForest, export_forest, load_forest_mmap, save_forest_mmap
+from api.memory import format_rss, rss_mb
+
+MODEL_DIR = 'models'
+HOUSING_MODEL_PATH = os.path.join(MODEL_DIR, 'regressor_v2_rf_tuned.joblib')
+MMAP_FOREST_DIR = os.path.join(MODEL_DIR, 'regressor_v2_rf_tuned.forest')
+N_WORKERS = 4
+
+
+def load_in_worker(mode, queue):
+    """子进程：按指定方式加载房价模型，预测一批数据（让所有页面真正被读到），再汇报内存"""
+    before = rss_mb()
+    if mode == 'joblib':
+        model = joblib.load(HOUSING_MODEL_PATH)
+    else:
+        model = load_forest_mmap(MMAP_FOREST_DIR)
+    model.predict(np.random.default_rng(0).standard_normal((2000, 8)))
+    queue.put((mode, before, rss_mb()))
+
+
+if __name__ == '__main__':
+    # ==============================
+    # 1. 导出内存映射目录，并检查预测一致
+    # ==============================
+    best_model = joblib.load(HOUSING_MODEL_PATH)
+    save_forest_mmap(CompiledForest.from_export(export_forest(best_model)), MMAP_FOREST_DIR)
+    X_check = np.random.default_rng(42).standard_normal((5000, 8))
+    assert np.array_equal(load_forest_mmap(MMAP_FOREST_DIR).predict(X_check), best_model.predict(X_check))
+    print(f"🗺️ 已导出内存映射目录: {MMAP_FOREST_DIR}（预测与 sklearn 逐位相同）")
+
+    # ==============================
+    # 2. 模拟多个 worker，对比每个 worker 的内存
+    # ==============================
+    if rss_mb() is None:
+        raise SystemExit("ℹ️ 当前系统读不到 /proc，跳过内存对比（请在 Linux / Docker 中运行）")
+
+    ctx = multiprocessing.get_context('spawn')
+    for mode in ('joblib', 'mmap'):
+        queue = ctx.Queue()
+        workers = [ctx.Process(target=load_in_worker, args=(mode, queue)) for _ in range(N_WORKERS)]
+        for w in workers:
+            w.start()
+        results = [queue.get() for _ in workers]
+        for w in workers:
+            w.join()
+
+        print(f"\n📊 {mode} 加载，{N_WORKERS} 个 worker:")
+        for _, before, after in results:
+            print(f"  加载前 {format_rss(before)} → 加载后 {format_rss(after)}")
+        private = sum(after['anon'] - before['anon'] for _, before, after in results)
+        print(f"  所有 worker 新增私有内存合计: {private:.1f} MB（文件映射部分由操作系统页缓存共享）")
@@ -0,0 +1,80 @@
+# measure_cold_start.py —— Day 23 测量 API 冷启动时间
+# 启动一个全新的 uvicorn 进程，记录：
+#   - 多久开始能响应 /health（服务开始接收流量）
+#   - 多久拿到第一个鸢尾花 / 房价预测的 200
+#   - 多久 /ready 变成 200（MODEL_WARMUP 里的模型都加载完）
+# 分别测 “完全懒加载” 和 “后台预热全部模型” 两种配置
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+PORT = 8765
+BASE_URL = f"http://127.0.0.1:{PORT}"
+TIMEOUT = 120   # 秒
+
+CONFIGS = {
+    "lazy": {},
+    "warmup_all": {"MODEL_WARMUP": "all"},
+}
+PAYLOADS = {
+    "iris": {"task_type": "iris", "features": [5.1, 3.5, 1.4, 0.2]},
+    "housing": {"task_type": "housing", "features": [8.3252, 41.0, 6.984127, 1.023810, 322.0, 2.555556, 37.88, -122.23]},
+}
+
+
+def request_status(path, payload=None):
+    """发一个请求，返回 HTTP 状态码（连不上返回 None）"""
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(BASE_URL + path, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=TIMEOUT) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError):
+        return None
+
+
+def wait_for(path, start, payload=None):
+    """一直重试，直到拿到 200，返回从进程启动开始经过的秒数"""
+    while time.perf_counter() - start < TIMEOUT:
+        if request_status(path, payload) == 200:
+            return round(time.perf_counter() - start, 3)
+        time.sleep(0.01)
+    raise TimeoutError(f"{path} 在 {TIMEOUT}s 内没有返回 200")
+
+
+def measure(extra_env):
+    env = {**os.environ, **extra_env}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        result = {"health_200_s": wait_for("/health", start)}
+        for task_type, payload in PAYLOADS.items():
+            result[f"first_{task_type}_200_s"] = wait_for("/predict", start, payload)
+        result["ready_200_s"] = wait_for("/ready", start)
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    report = {}
+    for name, extra_env in CONFIGS.items():
+        print(f"🚀 测量配置: {name} {extra_env}")
+        report[name] = measure(extra_env)
+        print(f"  {report[name]}")
+
+    os.makedirs("evals", exist_ok=True)
+    report_path = "evals/cold_start_day23.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 冷启动报告已保存至: {report_path}")
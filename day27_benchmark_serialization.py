@@ -0,0 +1,110 @@
+# benchmark_serialization.py —— Day 27 请求解析 / 响应序列化的耗时对比
+# 对比两条路径：
+#   1. 原路径：json 解析 → Pydantic 校验 PredictionRequest → 创建 PredictionResponse → JSONResponse
+#   2. 快速路径（api/fastjson.py）：orjson 解析 → 直接转成 float64 数组向量化校验 → 拼好的 JSON 字节
+# 先只测“解析 + 校验 + 序列化”这部分（不调用模型），再通过 TestClient 测完整接口
+import json
+import os
+import time
+
+import numpy as np
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient  # 需要安装 httpx
+
+from api import fastjson
+from api.main import (
+    IRIS_FRAGMENTS, N_FEATURES, SPECIES_MAP, TASK_NAMES,
+    PredictionRequest, PredictionResponse, app
+)
+
+N_CALLS = 5000       # 序列化部分每种方式重复多少次
+N_API_CALLS = 300    # 完整接口每种方式请求多少次
+N_BATCH_ROWS = 1000  # 批量接口一次多少行
+REPEATS = 3          # 重复几次取最快的一次
+
+PAYLOADS = {
+    "iris": {"task_type": "iris", "features": [5.1, 3.5, 1.4, 0.2]},
+    "housing": {"task_type": "housing", "features": [8.3252, 41.0, 6.984127, 1.023810, 322.0, 2.555556, 37.88, -122.23]},
+}
+
+
+def best_of(fn, n):
+    """运行 REPEATS 轮，每轮调用 n 次，返回单次调用的最短平均耗时（微秒）"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        timings.append(time.perf_counter() - start)
+    return round(min(timings) / n * 1e6, 2)
+
+
+def pydantic_path(body, pred):
+    """原路径：和 FastAPI 处理 /predict 的步骤一样（解析、校验、建响应对象、序列化）"""
+    request = PredictionRequest.model_validate(json.loads(body))
+    np.asarray([request.features], dtype=np.float64)
+    if request.task_type == "iris":
+        response = PredictionResponse(task_type="iris", prediction=SPECIES_MAP[pred], label=SPECIES_MAP[pred])
+    else:
+        response = PredictionResponse(task_type="housing", prediction=round(max(0.0, pred), 2), label=None)
+    return JSONResponse(response.model_dump()).body
+
+
+def fast_path(body, pred):
+    task_type, features = fastjson.parse_item(fastjson.loads(body), N_FEATURES)
+    fastjson.to_matrix([features], [0], N_FEATURES[task_type], TASK_NAMES[task_type])
+    if task_type == "iris":
+        return IRIS_FRAGMENTS[pred]
+    return fastjson.housing_fragment(round(max(0.0, pred), 2))
+
+
+if __name__ == "__main__":
+    report = {"orjson": fastjson.orjson is not None, "serialization_us": {}, "api_us": {}}
+
+    # ==============================
+    # 1. 只测解析 + 校验 + 序列化（模型输出用固定值代替）
+    # ==============================
+    print(f"🔍 序列化对比（每种 {N_CALLS} 次）...")
+    fake_preds = {"iris": 0, "housing": 2.0873}
+    for task_type, payload in PAYLOADS.items():
+        body = json.dumps(payload).encode()
+        pred = fake_preds[task_type]
+        assert json.loads(pydantic_path(body, pred)) == json.loads(fast_path(body, pred)), "两条路径返回的 JSON 不一致！"
+        slow = best_of(lambda: pydantic_path(body, pred), N_CALLS)
+        fast = best_of(lambda: fast_path(body, pred), N_CALLS)
+        report["serialization_us"][task_type] = {"pydantic": slow, "fast": fast, "speedup": round(slow / fast, 1)}
+
+    # ==============================
+    # 2. 完整接口：/predict vs /predict/fast，/predict/batch vs /predict/batch/fast
+    # ==============================
+    print(f"🔍 接口对比（单条 {N_API_CALLS} 次，批量 {N_BATCH_ROWS} 行）...")
+    client = TestClient(app)
+    for task_type, payload in PAYLOADS.items():
+        assert client.post("/predict", json=payload).json() == client.post("/predict/fast", json=payload).json()
+        slow = best_of(lambda: client.post("/predict", json=payload), N_API_CALLS)
+        fast = best_of(lambda: client.post("/predict/fast", json=payload), N_API_CALLS)
+        report["api_us"][task_type] = {"pydantic": slow, "fast": fast, "speedup": round(slow / fast, 1)}
+
+    rng = np.random.default_rng(42)
+    base = np.array(PAYLOADS["housing"]["features"])
+    batch_payload = {
+        "items": [{"task_type": "housing", "features": row} for row in (base * (1 + 0.1 * rng.standard_normal((N_BATCH_ROWS, 8)))).tolist()]
+    }
+    assert client.post("/predict/batch", json=batch_payload).json() == client.post("/predict/batch/fast", json=batch_payload).json()
+    slow = best_of(lambda: client.post("/predict/batch", json=batch_payload), 5)
+    fast = best_of(lambda: client.post("/predict/batch/fast", json=batch_payload), 5)
+    report["api_us"][f"housing_batch_{N_BATCH_ROWS}"] = {"pydantic": slow, "fast": fast, "speedup": round(slow / fast, 1)}
+
+    # ==============================
+    # 3. 输出 & 保存报告
+    # ==============================
+    print(f"\n📊 单次耗时（微秒），orjson: {'已安装' if report['orjson'] else '未安装（用标准库 json）'}")
+    for section in ("serialization_us", "api_us"):
+        for name, r in report[section].items():
+            print(f"  [{section}] {name}: Pydantic {r['pydantic']:.1f}µs  →  快速路径 {r['fast']:.1f}µs  (快 {r['speedup']}x)")
+
+    os.makedirs("evals", exist_ok=True)
+    report_path = "evals/serialization_benchmark_day27.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 报告已保存至: {report_path}")
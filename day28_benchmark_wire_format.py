@@ -0,0 +1,99 @@
+# benchmark_wire_format.py —— Day 28 批量打分的传输格式对比
+# 同样 N_ROWS 行房价特征，对比：
+#   1. JSON（/predict/batch/fast 的 {"items": [...]}）
+#   2. 原始 float32 / float64（请求头 X-Shape: 行数,8）
+#   3. Arrow IPC 流（装了 pyarrow 才测）
+# 记录：请求体字节数、服务端解析耗时、完整接口耗时
+import json
+import os
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient  # 需要安装 httpx
+
+from api import fastjson, wire
+from api.main import N_FEATURES, TASK_NAMES, app
+
+N_ROWS = 10000   # JSON 批量接口默认最多 10000 行（MAX_BATCH_ROWS）
+REPEATS = 5
+
+rng = np.random.default_rng(42)
+sample_house = np.array([8.3252, 41.0, 6.984127, 1.023810, 322.0, 2.555556, 37.88, -122.23])
+X = sample_house * (1 + 0.1 * rng.standard_normal((N_ROWS, 8)))
+
+
+def best_of(fn):
+    """运行 REPEATS 次，返回最短耗时（毫秒）"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return round(min(timings) * 1000, 2)
+
+
+def parse_json(body):
+    items = fastjson.loads(body)["items"]
+    rows = [fastjson.parse_item(item, N_FEATURES)[1] for item in items]
+    return fastjson.to_matrix(rows, range(len(rows)), 8, TASK_NAMES["housing"])
+
+
+def arrow_body(X):
+    """按一列 FixedSizeList<float32>[8] 编码（服务端零复制）"""
+    pa = wire.pa
+    values = pa.array(X.astype(np.float32).ravel())
+    table = pa.table({"features": pa.FixedSizeListArray.from_arrays(values, 8)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+if __name__ == "__main__":
+    # 每种格式：(请求体, 请求头, 服务端解析函数)
+    formats = {
+        "json": (
+            json.dumps({"items": [{"task_type": "housing", "features": row} for row in X.tolist()]}).encode(),
+            {"content-type": wire.JSON},
+            parse_json,
+        ),
+    }
+    for name, content_type in (("raw_float32", wire.RAW_FLOAT32), ("raw_float64", wire.RAW_FLOAT64)):
+        formats[name] = (
+            X.astype(wire.RAW_DTYPES[content_type]).tobytes(),
+            {"content-type": content_type, "x-shape": f"{N_ROWS},8"},
+            lambda body, ct=content_type: wire.decode(body, ct, f"{N_ROWS},8", 8),
+        )
+    if wire.pa is not None:
+        formats["arrow"] = (arrow_body(X), {"content-type": wire.ARROW_STREAM}, lambda body: wire.decode_arrow(body, 8))
+    else:
+        print("ℹ️ 没有安装 pyarrow，跳过 Arrow 格式")
+
+    client = TestClient(app)
+    report = {"n_rows": N_ROWS, "formats": {}}
+    print(f"🔍 对比 {N_ROWS} 行房价特征的传输格式...")
+    for name, (body, headers, parse) in formats.items():
+        url = "/predict/batch/fast" + ("" if name == "json" else "?task_type=housing")
+        assert client.post(url, content=body, headers=headers).status_code == 200
+        report["formats"][name] = {
+            "request_bytes": len(body),
+            "parse_ms": best_of(lambda: parse(body)),
+            "api_ms": best_of(lambda: client.post(url, content=body, headers=headers)),
+        }
+
+    # ==============================
+    # 输出 & 保存报告
+    # ==============================
+    baseline = report["formats"]["json"]
+    print("\n📊 结果（相对 JSON）:")
+    for name, r in report["formats"].items():
+        print(
+            f"  {name:12s} 请求体 {r['request_bytes'] / 1024:8.1f} KB（{baseline['request_bytes'] / r['request_bytes']:.1f}x 更小）  "
+            f"解析 {r['parse_ms']:7.2f}ms（快 {baseline['parse_ms'] / max(r['parse_ms'], 1e-3):.0f}x）  完整接口 {r['api_ms']:7.1f}ms"
+        )
+
+    os.makedirs("evals", exist_ok=True)
+    report_path = "evals/wire_format_benchmark_day28.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 报告已保存至: {report_path}")
@@ -0,0 +1,239 @@
+# bulk_score.py —— Day 30 离线批量打分（不经过 HTTP）
+# 把一个大文件（CSV / NPY / Parquet）按块读出来，分给多个进程并行预测，按输入顺序写出预测结果
+# - 每个工作进程只加载一次模型；加 --mmap 时房价随机森林用 Day 22 的内存映射目录，所有进程共享一份
+# - CSV 的解析也放在工作进程里做，主进程只负责切块和按顺序写结果
+# - 同时在途的块数有上限，内存不随文件大小增长
+# - 每写完一块就更新断点文件（输出文件名 + .ckpt.json），中断后用同样的命令重新运行会从断点继续
+#
+# 用法：
+#   python day30_bulk_score.py houses.csv --model models/regressor_v2_rf_tuned.joblib -o preds.csv
+#   python day30_bulk_score.py houses.npy --model models/regressor_v2_rf_tuned.joblib -o preds.csv --workers 8 --mmap
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+_model = None   # 每个工作进程里加载好的模型
+
+
+# ==============================
+# 1. 工作进程：加载模型 + 解析 + 预测 + 格式化
+# ==============================
+def load_model(model_path, use_mmap):
+    """加载模型；--mmap 且存在最新的 .forest 目录时，只加载内存映射的拍平森林"""
+    forest_dir = os.path.splitext(model_path)[0] + ".forest"
+    meta_path = os.path.join(forest_dir, "meta.json")
+    if use_mmap and os.path.exists(meta_path) and os.path.getmtime(meta_path) >= os.path.getmtime(model_path):
+        from api.forest import load_forest_mmap
+        return load_forest_mmap(forest_dir)
+    import joblib
+    return joblib.load(model_path)
+
+
+def init_worker(model_path, use_mmap):
+    global _model
+    _model = load_model(model_path, use_mmap)
+
+
+def score_chunk(task):
+    """
+    预测一块数据，返回 (输出文本的字节, 行数)
+    task 是下面三种之一：
+      ("csv", 原始字节)               —— 在工作进程里解析 CSV
+      ("npy", 文件路径, 起始行, 结束行) —— 在工作进程里内存映射读取，不经过进程间传输
+      ("array", 二维数组)
+    """
+    kind = task[0]
+    if kind == "csv":
+        X = np.loadtxt(io.BytesIO(task[1]), delimiter=",", dtype=np.float64, ndmin=2)
+    elif kind == "npy":
+        X = np.load(task[1], mmap_mode="r")[task[2]:task[3]]
+    else:
+        X = task[1]
+    preds = np.asarray(_model.predict(X)).tolist()
+    # str(float) 是能精确还原的最短写法，读回来和模型输出逐位相同
+    return "".join(f"{v}\n" for v in preds).encode(), len(preds)
+
+
+# ==============================
+# 2. 按块读取输入文件
+# 每个读取器产出 (task, 读完这一块之后的位置)；位置用来写断点：CSV 是字节偏移，其他格式是行号
+# ==============================
+def read_csv_chunks(path, chunk_size, start):
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start)
+        else:
+            first = f.readline()
+            try:
+                [float(v) for v in first.split(b",")]
+                f.seek(0)          # 第一行就是数据
+            except ValueError:
+                pass               # 第一行是表头，跳过
+        while True:
+            lines = []
+            for line in f:
+                if line.strip():
+                    lines.append(line)
+                    if len(lines) >= chunk_size:
+                        break
+            if not lines:
+                return
+            yield ("csv", b"".join(lines)), f.tell()
+
+
+def read_npy_chunks(path, chunk_size, start):
+    n_rows = np.load(path, mmap_mode="r").shape[0]
+    for begin in range(start, n_rows, chunk_size):
+        end = min(begin + chunk_size, n_rows)
+        yield ("npy", path, begin, end), end
+
+
+def read_parquet_chunks(path, chunk_size, start):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("❌ 读取 Parquet 需要安装 pyarrow（pip install pyarrow）")
+    position = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        position += batch.num_rows
+        if position <= start:
+            continue   # 断点之前已经处理过的块
+        X = np.column_stack([column.to_numpy(zero_copy_only=False) for column in batch.columns]).astype(np.float64)
+        yield ("array", X), position
+
+
+def total_size(path, fmt):
+    """用于显示进度：CSV 返回字节数，其他格式返回行数"""
+    if fmt == "csv":
+        return os.path.getsize(path)
+    if fmt == "npy":
+        return np.load(path, mmap_mode="r").shape[0]
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("❌ 读取 Parquet 需要安装 pyarrow（pip install pyarrow）")
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+READERS = {".csv": ("csv", read_csv_chunks), ".npy": ("npy", read_npy_chunks), ".parquet": ("parquet", read_parquet_chunks)}
+
+
+# ==============================
+# 3. 断点文件
+# ==============================
+def input_fingerprint(args):
+    """输入文件 / 模型 / 块大小有任何变化，旧断点都不能再用"""
+    stat = os.stat(args.input)
+    return {
+        "input": os.path.abspath(args.input), "input_size": stat.st_size, "input_mtime": int(stat.st_mtime),
+        "model": os.path.abspath(args.model), "chunk_size": args.chunk_size,
+    }
+
+
+def load_checkpoint(path, fingerprint):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if {k: checkpoint.get(k) for k in fingerprint} != fingerprint:
+        raise SystemExit(f"❌ 断点文件 {path} 和当前的输入 / 模型 / 块大小不一致，确认后加 --restart 从头开始")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    """先写临时文件再改名，中途被杀掉也不会留下半个断点文件"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# ==============================
+# 4. 主流程
+# ==============================
+def main():
+    parser = argparse.ArgumentParser(description="离线批量打分：CSV / NPY / Parquet → 每行一个预测结果")
+    parser.add_argument("input", help="输入文件（.csv / .npy / .parquet），每行一组特征")
+    parser.add_argument("--model", required=True, help="models/ 下的 .joblib 模型文件")
+    parser.add_argument("-o", "--output", required=True, help="输出文件，每行一个预测结果")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="工作进程数（默认等于 CPU 核数）")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="每块多少行")
+    parser.add_argument("--mmap", action="store_true", help="房价模型用内存映射的拍平森林（先运行 day22_save_models_mmap.py；所有进程共享一份内存，但比 sklearn 慢 2~3 倍）")
+    parser.add_argument("--restart", action="store_true", help="忽略断点，从头开始")
+    args = parser.parse_args()
+
+    ext = os.path.splitext(args.input)[1].lower()
+    if ext not in READERS:
+        raise SystemExit(f"❌ 不支持的输入格式: {ext}（支持 .csv / .npy / .parquet）")
+    fmt, reader = READERS[ext]
+
+    checkpoint_path = args.output + ".ckpt.json"
+    fingerprint = input_fingerprint(args)
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path, fingerprint)
+    if checkpoint is None:
+        checkpoint = {**fingerprint, "position": 0, "rows_done": 0, "output_bytes": 0, "finished": False}
+    elif checkpoint["finished"]:
+        print(f"✅ {args.output} 已经打分完成（{checkpoint['rows_done']} 行），加 --restart 可以重新运行")
+        return
+    else:
+        print(f"⏩ 从断点继续：已完成 {checkpoint['rows_done']} 行")
+
+    # 输出文件截断到断点位置（断点之后可能写了半块）
+    out = open(args.output, "r+b" if checkpoint["output_bytes"] else "wb")
+    out.truncate(checkpoint["output_bytes"])
+    out.seek(checkpoint["output_bytes"])
+
+    total = total_size(args.input, fmt)
+    unit = "字节" if fmt == "csv" else "行"
+    max_in_flight = args.workers * 2   # 最多同时有多少块在处理 / 排队（控制内存）
+    start_time = time.perf_counter()
+    rows_this_run = 0
+    last_report = 0.0
+
+    print(f"🚀 {args.input} → {args.output}，{args.workers} 个进程，每块 {args.chunk_size} 行")
+    with ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(args.model, args.mmap)) as pool:
+        in_flight = deque()
+
+        def write_oldest():
+            """按提交顺序取回最早的一块，写入输出并更新断点"""
+            nonlocal rows_this_run, last_report
+            future, position = in_flight.popleft()
+            data, n_rows = future.result()
+            out.write(data)
+            out.flush()
+            rows_this_run += n_rows
+            checkpoint.update(position=position, rows_done=checkpoint["rows_done"] + n_rows, output_bytes=out.tell())
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.perf_counter() - start_time
+            if elapsed - last_report >= 2 or not in_flight:
+                last_report = elapsed
+                print(
+                    f"  ⏳ {checkpoint['rows_done']} 行，进度 {position / max(total, 1):.1%}（按{unit}），"
+                    f"{rows_this_run / max(elapsed, 1e-9):,.0f} 行/秒"
+                )
+
+        for task, position in reader(args.input, args.chunk_size, checkpoint["position"]):
+            in_flight.append((pool.submit(score_chunk, task), position))
+            if len(in_flight) >= max_in_flight:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+
+    out.close()
+    checkpoint["finished"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    elapsed = time.perf_counter() - start_time
+    print(f"\n✅ 打分完成：本次 {rows_this_run} 行，用时 {elapsed:.1f}s，{rows_this_run / max(elapsed, 1e-9):,.0f} 行/秒")
+    print(f"💾 预测结果已保存至: {args.output}（共 {checkpoint['rows_done']} 行）")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+# load_test.py —— Day 33 预测服务压测
+# 在本地启动一个 uvicorn（api.main:app），用 asyncio + httpx 按指定并发持续发请求，记录：
+#   - 吞吐（请求数 / 秒、行数 / 秒）和错误数
+#   - 延迟分位数 p50 / p95 / p99 / p999
+#   - 服务端进程（包括 uvicorn 的子进程）的 CPU 占用和常驻内存
+# 结果保存到 evals/load_test_<提交号>_<时间>.json，加 --baseline 可以和之前的结果对比，p99 变差超过阈值时返回非 0
+#
+# 用法：
+#   python day33_load_test.py                                   # 默认：并发 1 / 8 / 32，单条请求，鸢尾花和房价各一半
+#   python day33_load_test.py --concurrency 16 --batch-size 100 --iris-ratio 0
+#   python day33_load_test.py --env PREDICTION_CACHE=1 --env MICROBATCH_ENABLED=1
+#   python day33_load_test.py --baseline evals/load_test_abc1234_20260101_120000.json
+#   python day33_load_test.py --url http://127.0.0.1:8000     # 压已经在运行的服务（不统计服务端 CPU / 内存）
+# 注意：压测客户端和服务在同一台机器上时会抢 CPU，比较结果时要保证机器和参数一致
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import httpx
+import numpy as np
+
+SAMPLES = {
+    "iris": [5.1, 3.5, 1.4, 0.2],
+    "housing": [8.3252, 41.0, 6.984127, 1.023810, 322.0, 2.555556, 37.88, -122.23],
+}
+N_PAYLOADS = 2048           # 预先生成多少个不同的请求体（轮流发送，避免全部命中缓存）
+STARTUP_TIMEOUT = 120       # 秒
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+
+
+# ==============================
+# 1. 构造请求体（提前编码成字节，压测时客户端只负责发送）
+# ==============================
+def build_payloads(batch_size, iris_ratio, seed):
+    """返回 [(接口路径, 请求体字节, 行数)]；batch_size == 1 用 /predict，否则用 /predict/batch"""
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for _ in range(N_PAYLOADS):
+        items = []
+        for _ in range(batch_size):
+            task_type = "iris" if rng.random() < iris_ratio else "housing"
+            sample = np.array(SAMPLES[task_type])
+            features = np.round(sample * (1 + 0.1 * rng.standard_normal(len(sample))), 4).tolist()
+            items.append({"task_type": task_type, "features": features})
+        if batch_size == 1:
+            payloads.append(("/predict", json.dumps(items[0]).encode(), 1))
+        else:
+            payloads.append(("/predict/batch", json.dumps({"items": items}).encode(), batch_size))
+    return payloads
+
+
+# ==============================
+# 2. 服务端进程：启动 / 等待就绪 / CPU 和内存
+# ==============================
+def start_server(port, workers, extra_env):
+    env = {**os.environ, **extra_env}
+    cmd = [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    return subprocess.Popen(cmd, env=env)
+
+
+def wait_ready(base_url, server):
+    """等 /ready 返回 200（MODEL_WARMUP=all 时所有模型都加载完）"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < STARTUP_TIMEOUT:
+        if server is not None and server.poll() is not None:
+            raise SystemExit("❌ 服务启动失败，请看上面的报错")
+        try:
+            with urllib.request.urlopen(base_url + "/ready", timeout=5) as resp:
+                if resp.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.1)
+    raise SystemExit(f"❌ 服务在 {STARTUP_TIMEOUT}s 内没有就绪")
+
+
+def process_tree(pid):
+    """pid 和它的所有子进程（uvicorn --workers 会起多个子进程）"""
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children", encoding="utf-8") as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def resource_usage(pid):
+    """返回 (CPU 时间秒数, 常驻内存 MB)，统计整个进程树；读不到时返回 None（只支持 Linux）"""
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu_seconds, rss_mb, found = 0.0, 0.0, False
+    for p in process_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat", encoding="utf-8") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu_seconds += (int(fields[11]) + int(fields[12])) / ticks   # utime + stime
+            with open(f"/proc/{p}/status", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss_mb += int(line.split()[1]) / 1024
+            found = True
+        except (OSError, IndexError, ValueError):
+            continue
+    return (cpu_seconds, rss_mb) if found else None
+
+
+# ==============================
+# 3. 压测：concurrency 个协程各自循环发请求（闭环：上一个返回了才发下一个）
+# ==============================
+async def run_level(base_url, payloads, concurrency, duration, warmup, server_pid):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Content-Type": "application/json"}
+    latencies, rows, errors = [], [0], {}
+    recording = False
+    stop_at = time.perf_counter() + warmup + duration
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker(offset):
+            i = offset
+            while time.perf_counter() < stop_at:
+                path, body, n_rows = payloads[i % len(payloads)]
+                i += concurrency
+                start = time.perf_counter()
+                try:
+                    resp = await client.post(path, content=body, headers=headers)
+                    status = resp.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - start
+                if not recording:
+                    continue
+                if status == 200:
+                    latencies.append(elapsed)
+                    rows[0] += n_rows
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+
+        tasks = [asyncio.create_task(worker(k)) for k in range(concurrency)]
+        await asyncio.sleep(warmup)   # 预热阶段的结果不计入
+        recording = True
+        usage_before = resource_usage(server_pid) if server_pid else None
+        started = time.perf_counter()
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+        usage_after = resource_usage(server_pid) if server_pid else None
+
+    result = {
+        "concurrency": concurrency,
+        "duration_s": round(wall, 2),
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": round(len(latencies) / wall, 1),
+        "rows_per_s": round(rows[0] / wall, 1),
+    }
+    if latencies:
+        ms = np.array(latencies) * 1000
+        result["latency_ms"] = {name: round(float(np.percentile(ms, q)), 3) for name, q in PERCENTILES.items()}
+        result["latency_ms"]["mean"] = round(float(ms.mean()), 3)
+        result["latency_ms"]["max"] = round(float(ms.max()), 3)
+    if usage_before and usage_after:
+        # CPU 占用：100% 表示一个核跑满
+        result["server_cpu_percent"] = round((usage_after[0] - usage_before[0]) / wall * 100, 1)
+        result["server_rss_mb"] = round(usage_after[1], 1)
+    return result
+
+
+# ==============================
+# 4. 和之前的结果对比
+# ==============================
+def compare(report, baseline_path, threshold):
+    """按并发数逐个对比 p99 和吞吐，返回是否有退化"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config", {}).get("scenario") != report["config"]["scenario"]:
+        print(f"⚠️ 基线的压测参数不一样：{baseline.get('config', {}).get('scenario')}，对比结果仅供参考")
+    old_levels = {level["concurrency"]: level for level in baseline["results"]}
+    regressed = False
+    print(f"\n📊 和基线对比（{baseline.get('git_commit')}）：")
+    for level in report["results"]:
+        old = old_levels.get(level["concurrency"])
+        if old is None or "latency_ms" not in old or "latency_ms" not in level:
+            continue
+        p99_change = level["latency_ms"]["p99"] / old["latency_ms"]["p99"] - 1
+        rps_change = level["requests_per_s"] / old["requests_per_s"] - 1
+        flag = "❌" if p99_change > threshold else "✅"
+        regressed |= p99_change > threshold
+        print(
+            f"  {flag} 并发 {level['concurrency']:>3}: p99 {old['latency_ms']['p99']:.2f} → {level['latency_ms']['p99']:.2f}ms "
+            f"({p99_change:+.1%})，吞吐 {old['requests_per_s']:.0f} → {level['requests_per_s']:.0f}/s ({rps_change:+.1%})"
+        )
+    return regressed
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预测服务压测：吞吐、延迟分位数、服务端 CPU / 内存")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="并发数（可以写多个，逐个测）")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个并发数测多少秒")
+    parser.add_argument("--warmup", type=float, default=2.0, help="每个并发数先预热多少秒（不计入结果）")
+    parser.add_argument("--batch-size", type=int, default=1, help="每个请求多少行（1 用 /predict，大于 1 用 /predict/batch）")
+    parser.add_argument("--iris-ratio", type=float, default=0.5, help="鸢尾花请求占多少比例（其余是房价）")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn 进程数")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="传给服务的环境变量，可以写多次")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--url", help="压已经在运行的服务，不在本地启动")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="之前保存的压测结果，用来对比")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p99 变差超过这个比例算退化（默认 10%%）")
+    args = parser.parse_args()
+
+    if not 0 <= args.iris_ratio <= 1:
+        raise SystemExit("❌ --iris-ratio 必须在 0 到 1 之间")
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    extra_env.setdefault("MODEL_WARMUP", "all")   # 模型加载时间不算进压测
+    payloads = build_payloads(args.batch_size, args.iris_ratio, args.seed)
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        base_url = f"http://127.0.0.1:{args.port}"
+        print(f"🚀 启动服务: api.main:app（{args.workers} 个进程，环境变量 {extra_env}）")
+        server = start_server(args.port, args.workers, extra_env)
+
+    results = []
+    try:
+        wait_ready(base_url, server)
+        idle = resource_usage(server.pid) if server else None
+        for concurrency in args.concurrency:
+            print(f"🔍 并发 {concurrency}：预热 {args.warmup:.0f}s，压测 {args.duration:.0f}s ...")
+            level = asyncio.run(run_level(base_url, payloads, concurrency, args.duration, args.warmup, server.pid if server else None))
+            results.append(level)
+            latency = level.get("latency_ms", {})
+            print(
+                f"  {level['requests_per_s']:,.0f} 请求/秒，{level['rows_per_s']:,.0f} 行/秒，错误 {sum(level['errors'].values())}，"
+                f"p50 {latency.get('p50', 0):.2f}ms  p95 {latency.get('p95', 0):.2f}ms  "
+                f"p99 {latency.get('p99', 0):.2f}ms  p999 {latency.get('p999', 0):.2f}ms"
+                + (f"，服务端 CPU {level['server_cpu_percent']:.0f}%  内存 {level['server_rss_mb']:.0f}MB" if "server_cpu_percent" in level else "")
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "git_commit": git_commit(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {"cpu_count": os.cpu_count(), "python": sys.version.split()[0]},
+        "config": {
+            "scenario": {"batch_size": args.batch_size, "iris_ratio": args.iris_ratio, "workers": args.workers, "env": extra_env},
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "url": args.url,
+        },
+        "server_idle_rss_mb": round(idle[1], 1) if idle else None,
+        "results": results,
+    }
+    os.makedirs("evals", exist_ok=True)
+    report_path = f"evals/load_test_{report['git_commit']}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 压测结果已保存至: {report_path}")
+
+    if args.baseline and compare(report, args.baseline, args.threshold):
+        print(f"\n❌ p99 延迟变差超过 {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+# benchmark_models.py —— Day 34 每个模型文件的推理性能
+# 找出 models/ 下所有模型文件（.joblib、Day 21 的 .forest.npz、Day 22 的 .forest/ 目录、Day 40 的 .compact.npz、Day 41 的 .linear.npz，见 api/artifacts.py），
+# 每个文件在一个全新的子进程里测（互不影响内存和缓存）：
+#   - 文件大小、加载耗时、加载 + 预测后增加的常驻内存（私有 / 文件映射）
+#   - 单行预测延迟：先预热，再逐次计时，取 p50 / p99
+#   - 不同批量大小的吞吐（行 / 秒）：每个大小重复多次取中位数
+# 结果保存到 evals/model_benchmark_<提交号>.json，并复制一份到 evals/model_benchmark.json（Day 14 选模型时会读）
+# 加 --baseline 可以和之前的结果对比，变慢超过阈值时返回非 0
+#
+# 用法：
+#   python day34_benchmark_models.py
+#   python day34_benchmark_models.py --baseline evals/model_benchmark_abc1234.json
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from api.artifacts import discover, disk_size, load_artifact
+
+MODELS_DIR = "models"
+SCHEMA_VERSION = 1
+WARMUP_CALLS = 50            # 单行预测先预热多少次（不计时）
+SINGLE_ROW_REPEATS = 500     # 单行预测计时多少次
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+BATCH_MIN_REPEATS = 5        # 每个批量大小至少重复几次
+BATCH_MIN_SECONDS = 0.5      # …并且累计至少跑多久
+
+# 按特征数选一条样例数据，在它附近加随机扰动（和 Day 18 的做法一样）
+SAMPLES = {
+    4: [5.1, 3.5, 1.4, 0.2],
+    8: [8.3252, 41.0, 6.984127, 1.023810, 322.0, 2.555556, 37.88, -122.23],
+}
+
+
+# ==============================
+# 1. 在子进程里测一个模型文件
+# ==============================
+def make_rows(n_features, n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    sample = np.array(SAMPLES.get(n_features, np.ones(n_features)))
+    return sample * (1 + 0.1 * rng.standard_normal((n_rows, n_features)))
+
+
+def preload_libraries():
+    """先导入 sklearn 等库，加载耗时和内存里只算模型本身（不算第一次 import 的几百毫秒和几十 MB）"""
+    import joblib  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+    import sklearn.linear_model  # noqa: F401
+    import sklearn.pipeline  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+    import api.forest  # noqa: F401
+    import api.linear  # noqa: F401
+
+
+def bench_artifact(path, fmt):
+    from api.memory import rss_mb
+
+    preload_libraries()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    model = load_artifact(path, fmt)
+    load_seconds = time.perf_counter() - start
+
+    n_features = int(model.n_features_in_)
+    X = make_rows(n_features, max(BATCH_SIZES))
+
+    # 单行延迟：每次计时一个 predict 调用
+    rows = [X[i:i + 1] for i in range(WARMUP_CALLS + SINGLE_ROW_REPEATS)]
+    for row in rows[:WARMUP_CALLS]:
+        model.predict(row)
+    timings = []
+    for row in rows[WARMUP_CALLS:]:
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+    single_us = np.array(timings) * 1e6
+
+    # 批量吞吐：每个大小先预热一次，再重复计时取中位数
+    throughput = {}
+    for size in BATCH_SIZES:
+        batch = X[:size]
+        model.predict(batch)
+        timings, started = [], time.perf_counter()
+        while len(timings) < BATCH_MIN_REPEATS or time.perf_counter() - started < BATCH_MIN_SECONDS:
+            start = time.perf_counter()
+            model.predict(batch)
+            timings.append(time.perf_counter() - start)
+        throughput[str(size)] = round(size / float(np.median(timings)), 1)
+
+    rss_after = rss_mb()
+    memory = None
+    if rss_before and rss_after:
+        memory = {kind: round(rss_after[kind] - rss_before[kind], 1) for kind in rss_after}
+    return {
+        "artifact": os.path.basename(path),
+        "format": fmt,
+        "n_features": n_features,
+        "disk_mb": round(disk_size(path) / 1024 / 1024, 3),
+        "load_ms": round(load_seconds * 1000, 2),
+        "memory_mb": memory,
+        "single_row_us": {
+            "p50": round(float(np.percentile(single_us, 50)), 2),
+            "p99": round(float(np.percentile(single_us, 99)), 2),
+            "mean": round(float(single_us.mean()), 2),
+        },
+        "rows_per_s": throughput,
+    }
+
+
+# ==============================
+# 2. 和之前的结果对比
+# ==============================
+def compare(report, baseline_path, threshold):
+    """对比单行 p50 延迟和最大批量的吞吐，返回是否有退化"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old_models = {m["artifact"]: m for m in baseline["models"] if "error" not in m}
+    largest = str(max(BATCH_SIZES))
+    regressed = False
+    print(f"\n📊 和基线对比（{baseline.get('git_commit')}）：")
+    for model in report["models"]:
+        old = old_models.get(model["artifact"])
+        if old is None:
+            print(f"  🆕 {model['artifact']}：基线里没有")
+            continue
+        latency_change = model["single_row_us"]["p50"] / old["single_row_us"]["p50"] - 1
+        throughput_change = model["rows_per_s"][largest] / old["rows_per_s"][largest] - 1
+        bad = latency_change > threshold or throughput_change < -threshold
+        regressed |= bad
+        print(
+            f"  {'❌' if bad else '✅'} {model['artifact']}: 单行 p50 {old['single_row_us']['p50']:.1f} → "
+            f"{model['single_row_us']['p50']:.1f}µs ({latency_change:+.1%})，"
+            f"{largest} 行吞吐 {old['rows_per_s'][largest]:,.0f} → {model['rows_per_s'][largest]:,.0f}/s ({throughput_change:+.1%})"
+        )
+    return regressed
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量 models/ 下每个模型文件的加载耗时、内存、单行延迟和批量吞吐")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--baseline", help="之前保存的结果，用来对比")
+    parser.add_argument("--threshold", type=float, default=0.20, help="变慢超过这个比例算退化（默认 20%%，微基准波动较大）")
+    args = parser.parse_args()
+
+    artifacts = discover(args.models_dir)
+    if not artifacts:
+        raise SystemExit(f"❌ {args.models_dir}/ 下没有找到模型文件")
+
+    results = []
+    for path, fmt in artifacts:
+        print(f"🔍 {path}（{fmt}）...")
+        # 每个模型一个新的子进程（spawn），内存和预热状态不受前一个模型影响
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            try:
+                result = pool.submit(bench_artifact, path, fmt).result()
+            except Exception as e:
+                print(f"  ❌ 测量失败: {e}")
+                results.append({"artifact": os.path.basename(path), "format": fmt, "error": str(e)})
+                continue
+        results.append(result)
+        memory = result["memory_mb"] or {}
+        print(
+            f"  {result['disk_mb']:.2f}MB，加载 {result['load_ms']:.0f}ms，内存 +{memory.get('rss', 0):.1f}MB，"
+            f"单行 p50 {result['single_row_us']['p50']:.1f}µs / p99 {result['single_row_us']['p99']:.1f}µs，"
+            f"{max(BATCH_SIZES)} 行 {result['rows_per_s'][str(max(BATCH_SIZES))]:,.0f} 行/秒"
+        )
+
+    report = {
+        "schema_version": SCHEMA_VERSION,
+        "git_commit": git_commit(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {"cpu_count": os.cpu_count(), "python": sys.version.split()[0], "numpy": np.__version__},
+        "settings": {"warmup_calls": WARMUP_CALLS, "single_row_repeats": SINGLE_ROW_REPEATS, "batch_sizes": list(BATCH_SIZES)},
+        "models": results,
+    }
+    os.makedirs("evals", exist_ok=True)
+    report_path = f"evals/model_benchmark_{report['git_commit']}.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    shutil.copyfile(report_path, "evals/model_benchmark.json")
+    print(f"\n💾 模型性能报告已保存至: {report_path}（最新一份同时在 evals/model_benchmark.json）")
+
+    measured = [r for r in results if "error" not in r]
+    if args.baseline and compare({**report, "models": measured}, args.baseline, args.threshold):
+        print(f"\n❌ 有模型变慢超过 {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# export_compact_forest.py —— Day 40 把调优后的随机森林导出成精简格式（.compact.npz）
+# joblib 保存的 sklearn 森林里有大量推理用不到的东西（每个节点的样本数、不纯度、float64 的阈值和值……），
+# 镜像构建（COPY models/）、拉镜像、加载模型都被它拖慢。精简格式只保留推理需要的数组（格式说明见 api/forest.py）：
+#   - 阈值向下取整成 float32（不改变任何预测），重复多时再换成 uint16 下标
+#   - 叶子值存成 float64 / float32 / int16（只有这一项会带来很小的误差）
+#   - 剪掉走不到的节点、合并同值叶子，最后压缩
+# 1. 对比各种叶子值类型的文件大小、加载耗时、和原模型预测的最大误差、测试集 R²，报告存到 evals/
+# 2. 选定的类型误差在容差以内才保存到 models/<文件名>.compact.npz，否则返回非 0
+#
+# 用法：
+#   python day40_export_compact_forest.py                      # 默认 int16 叶子值，容差 1e-4（$0.01k）
+#   python day40_export_compact_forest.py --values float32 --tolerance 1e-6
+# 服务端设置 HOUSING_COMPACT=1 后直接加载精简格式
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.metrics import r2_score
+
+from training.dataset import load_housing_split
+from api.forest import COMPACT_SUFFIX, VALUE_DTYPES, export_forest, load_compact_forest, save_compact_forest
+
+MODEL_PATH = 'models/regressor_v2_rf_tuned.joblib'
+REPORT_PATH = 'evals/compact_forest_report.json'
+
+
+def probe_rows(model, n_rows=20000, seed=42):
+    """和 Day 21 一样：用森林里真实出现过的阈值构造数据，覆盖各个分支和“刚好等于阈值”的边界"""
+    arrays = export_forest(model)
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, model.n_features_in_))
+    for j in range(model.n_features_in_):
+        thresholds = arrays['threshold'][arrays['feature'] == j]
+        if len(thresholds) == 0:
+            X[:, j] = rng.standard_normal(n_rows)
+            continue
+        X[:, j] = rng.uniform(thresholds.min() - 1, thresholds.max() + 1, n_rows)
+        X[::10, j] = rng.choice(thresholds, size=len(X[::10, j]))
+    return X
+
+
+def load_seconds(load, path, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        load(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出精简格式的随机森林，并检查和原模型的预测误差")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--values', choices=VALUE_DTYPES, default='int16', help="叶子值的存储类型")
+    parser.add_argument('--tolerance', type=float, default=1e-4, help="和原模型预测的最大绝对误差（单位同房价，$100k）")
+    parser.add_argument('--no-prune', action='store_true', help="不剪枝")
+    parser.add_argument('--no-compress', action='store_true', help="不压缩（加载稍快，文件更大）")
+    args = parser.parse_args()
+
+    print(f"📥 加载模型: {args.model}")
+    model = joblib.load(args.model)
+    data = load_housing_split()
+    X_check = np.vstack([data.X_test, probe_rows(model)])
+    expected = model.predict(X_check)
+    n_test = len(data.y_test)
+    baseline_r2 = float(r2_score(data.y_test, expected[:n_test]))
+
+    # ==============================
+    # 1. 各种叶子值类型对比
+    # ==============================
+    variants = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for value_dtype in VALUE_DTYPES:
+            path = os.path.join(tmp, value_dtype + COMPACT_SUFFIX)
+            stats = save_compact_forest(model, path, compress=not args.no_compress,
+                                        value_dtype=value_dtype, prune=not args.no_prune)
+            predicted = load_compact_forest(path).predict(X_check)
+            error = np.abs(predicted - expected)
+            variants.append({
+                'values': value_dtype,
+                'size_mb': round(os.path.getsize(path) / 1e6, 3),
+                'load_ms': round(load_seconds(load_compact_forest, path) * 1000, 1),
+                'max_abs_error': float(error.max()),
+                'mean_abs_error': float(error.mean()),
+                'test_r2': float(r2_score(data.y_test, predicted[:n_test])),
+                **stats,
+            })
+
+    original = {
+        'values': 'joblib',
+        'size_mb': round(os.path.getsize(args.model) / 1e6, 3),
+        'load_ms': round(load_seconds(joblib.load, args.model) * 1000, 1),
+        'max_abs_error': 0.0,
+        'mean_abs_error': 0.0,
+        'test_r2': baseline_r2,
+    }
+    print(f"\n📊 精简格式对比（{len(X_check)} 行：测试集 + 阈值边界数据；剪掉 {variants[0]['n_nodes_pruned']} / {variants[0]['n_nodes']} 个节点，"
+          f"阈值存成 {variants[0]['threshold_encoding']}）:")
+    print(f"  {'格式':>8} | {'大小 (MB)':>9} | {'加载 (ms)':>9} | {'最大误差':>9} | {'测试集 R²':>10}")
+    for v in [original] + variants:
+        print(f"  {v['values']:>8} | {v['size_mb']:>9.2f} | {v['load_ms']:>9.1f} | {v['max_abs_error']:>9.1e} | {v['test_r2']:>10.6f}")
+
+    os.makedirs('evals', exist_ok=True)
+    with open(REPORT_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'model': args.model, 'tolerance': args.tolerance, 'original': original, 'variants': variants},
+                  f, indent=2, ensure_ascii=False)
+    print(f"📝 报告已保存至: {REPORT_PATH}")
+
+    # ==============================
+    # 2. 容差检查 + 保存选定的格式
+    # ==============================
+    chosen = next(v for v in variants if v['values'] == args.values)
+    if chosen['max_abs_error'] > args.tolerance:
+        print(f"❌ {args.values} 的最大误差 {chosen['max_abs_error']:.2e} 超过容差 {args.tolerance:.2e}，没有保存（换更精确的 --values）")
+        return 1
+
+    out_path = os.path.splitext(args.model)[0] + COMPACT_SUFFIX
+    save_compact_forest(model, out_path, compress=not args.no_compress, value_dtype=args.values, prune=not args.no_prune)
+    print(f"\n💾 已保存: {out_path}（{args.values}，{chosen['size_mb']:.2f} MB，原模型的 {chosen['size_mb'] / original['size_mb']:.1%}，"
+          f"最大误差 {chosen['max_abs_error']:.2e} ≤ 容差 {args.tolerance:.0e}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# export_linear_pipelines.py —— Day 41 把线性 Pipeline 融合成一次矩阵乘法
+# iris_pipeline_v2.joblib（StandardScaler → LogisticRegression）和 california_housing_pipeline_v1_linear.joblib
+# （StandardScaler → LinearRegression）数学上都只是一次仿射变换（分类再加一个 argmax），
+# 但每次 Pipeline.predict 都要做输入检查、逐步 transform、估计器分发。
+# 1. 把 models/ 下每个能融合的 .joblib 导出成 <文件名>.linear.npz（标准化折进权重，见 api/linear.py）
+# 2. 等价性检查：分类结果完全一致，概率 / 回归值误差 ≤ 容差（不满足就不保存，返回非 0）
+# 3. 对比单行预测延迟
+# 服务端默认开启（LINEAR_FUSED=1），有 .linear.npz 时直接加载，不用导入 sklearn
+import glob
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+from sklearn.datasets import load_iris
+
+from training.dataset import load_housing_split
+from api.linear import LINEAR_SUFFIX, check_equivalence, fuse_pipeline, load_fused_linear, save_fused_linear
+
+MODEL_DIR = 'models'
+TOLERANCE = 1e-9
+
+
+def check_rows(n_features, seed=42):
+    """真实数据 + 放大 / 平移后的随机数据（覆盖训练集范围以外的输入）"""
+    if n_features == 4:
+        X = load_iris().data
+    else:
+        X = np.asarray(load_housing_split().X_test)
+    rng = np.random.default_rng(seed)
+    noisy = X[rng.integers(0, len(X), 5000)] * rng.uniform(0.5, 2.0, (5000, n_features))
+    return np.vstack([X, noisy])
+
+
+def single_row_us(predict, x, repeats=5, n=2000):
+    predict(x)  # 预热
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(n):
+            predict(x)
+        best = min(best, (time.perf_counter() - start) / n * 1e6)
+    return best
+
+
+def main():
+    failed = False
+    for path in sorted(glob.glob(os.path.join(MODEL_DIR, '*.joblib'))):
+        pipeline = joblib.load(path)
+        try:
+            fuse_pipeline(pipeline)
+        except (TypeError, AttributeError) as e:
+            print(f"⏭️ {path}: 不是线性 Pipeline，跳过（{e}）")
+            continue
+
+        out_path = os.path.splitext(path)[0] + LINEAR_SUFFIX
+        tmp_path = out_path + '.tmp.npz'
+        save_fused_linear(pipeline, tmp_path)
+        fused = load_fused_linear(tmp_path, fallback_path=path)
+        X_check = check_rows(fused.n_features_in_)
+        try:
+            result = check_equivalence(fused, pipeline, X_check, atol=TOLERANCE)
+        except AssertionError as e:
+            os.remove(tmp_path)
+            print(f"❌ {path}: {e}，没有保存")
+            failed = True
+            continue
+        os.replace(tmp_path, out_path)
+
+        x = X_check[:1]
+        pipeline_us = single_row_us(pipeline.predict, x)
+        fused_us = single_row_us(fused.predict, x)
+        print(f"💾 {out_path}（{fused.kind}，{os.path.getsize(out_path)} 字节）")
+        print(f"  ✅ {len(X_check)} 行与 Pipeline 一致：最大误差 {result['max_abs_error']:.1e}，预测不同 {result['label_mismatches']} 个")
+        print(f"  ⚡ 单行延迟: Pipeline {pipeline_us:.1f}µs → 融合 {fused_us:.1f}µs（快 {pipeline_us / fused_us:.0f}x）")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,47 +1,63 @@
 # ====== Day 4: 模型评估与交叉验证 ====== 
+# 所有实验的 (模型, 划分) 都交给 training/cv_executor.py 并行跑：数据和划分下标只写一份，工作进程内存映射读取 
 from sklearn.datasets import load_iris 
-from sklearn.model_selection import train_test_split, cross_val_score 
+from sklearn.model_selection import StratifiedKFold, train_test_split 
 from sklearn.neighbors import KNeighborsClassifier 
 import numpy as np 
 
+from training.cv_executor import CVExecutor, score_estimator 
+
 # 加载数据（只用花瓣特征） 
 iris = load_iris() 
 X = iris.data[:, 2:] # 仅花瓣长度和宽度 
 y = iris.target 
 
+SEEDS = [0, 1, 2, 3, 42] 
+
+
+def seed_splits(n_samples, seeds): 
+    """实验1 的划分：每个种子一次 train_test_split（只划分下标，结果和直接划分数据一样）""" 
+    return [tuple(train_test_split(np.arange(n_samples), test_size=0.2, random_state=seed)) for seed in seeds] 
+
 
-print("数据形状:", X.shape) 
-print("目标分布:", np.bincount(y)) # 每类50朵 
+if __name__ == "__main__": 
+    print("数据形状:", X.shape) 
+    print("目标分布:", np.bincount(y)) # 每类50朵 
 
+    # 前 5 个划分是实验1 的随机种子，后 5 个是实验2/3 的 5 折（和 cross_val_score(cv=5) 一样用 StratifiedKFold） 
+    folds = seed_splits(len(y), SEEDS) + list(StratifiedKFold(5).split(X, y)) 
+    cv_fold_ids = range(len(SEEDS), len(folds)) 
+    model = KNeighborsClassifier(n_neighbors=3) 
+    overfit_model = KNeighborsClassifier(n_neighbors=1) 
+    tasks = [(f"seed_{seed}", (model, k)) for k, seed in enumerate(SEEDS)] 
+    tasks += [(f"k3_fold_{k}", (model, k)) for k in cv_fold_ids] 
+    tasks += [(f"k1_fold_{k}", (overfit_model, k)) for k in cv_fold_ids] 
+    with CVExecutor(X, y, folds) as executor: 
+        scores = executor.run(tasks, score_estimator) 
 
 
 
-# === 实验1：不同随机种子下的准确率 === 
-print("实验1：不同 random_state 下的准确率") 
-model = KNeighborsClassifier(n_neighbors=3) 
-for seed in [0, 1, 2, 3, 42]: 
-    X_train, X_test, y_train, y_test = train_test_split( 
-        X, y, test_size=0.2, random_state=seed ) 
-    model.fit(X_train, y_train) 
-    acc = model.score(X_test, y_test) 
-    print(f" Seed {seed:2d}: 准确率 = {acc:.2%}") 
 
+    # === 实验1：不同随机种子下的准确率 === 
+    print("实验1：不同 random_state 下的准确率") 
+    for seed in SEEDS: 
+        acc = scores[f"seed_{seed}"] 
+        print(f" Seed {seed:2d}: 准确率 = {acc:.2%}") 
 
 
 
-# === 实验2：5折交叉验证（更可靠！）=== 
-print("实验2：5折交叉验证") 
-cv_scores = cross_val_score(model, X, y, cv=5) 
-print(f" 平均准确率: {cv_scores.mean():.2%} ± {cv_scores.std():.2%}") 
-print(f" 各折得分: {[f'{s:.2%}' for s in cv_scores]}") 
 
+    # === 实验2：5折交叉验证（更可靠！）=== 
+    print("实验2：5折交叉验证") 
+    cv_scores = np.array([scores[f"k3_fold_{k}"] for k in cv_fold_ids]) 
+    print(f" 平均准确率: {cv_scores.mean():.2%} ± {cv_scores.std():.2%}") 
+    print(f" 各折得分: {[f'{s:.2%}' for s in cv_scores]}") 
 
 
 
-# === 实验3：尝试 K=1（可能过拟合）=== 
-print("实验3：使用 K=1（高风险过拟合）") 
-overfit_model = KNeighborsClassifier(n_neighbors=1) 
-overfit_scores = cross_val_score(overfit_model, X, y, cv=5) 
-print(f" K=1 平均准确率: {overfit_scores.mean():.2%} ± {overfit_scores.std():.2%}")
 
+    # === 实验3：尝试 K=1（可能过拟合）=== 
+    print("实验3：使用 K=1（高风险过拟合）") 
+    overfit_scores = np.array([scores[f"k1_fold_{k}"] for k in cv_fold_ids]) 
+    print(f" K=1 平均准确率: {overfit_scores.mean():.2%} ± {overfit_scores.std():.2%}")
 
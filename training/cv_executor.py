@@ -0,0 +1,153 @@
+# ==============================
+# 🧮 交叉验证执行器（多进程 + 共享数据 + 核数分配）
+# 功能：把 “候选 × 折” 拆成一个个任务，分给多个工作进程并行跑
+# - 训练矩阵、目标值和每折的下标只写一次 .npy，工作进程用 mmap_mode='r' 读取（不复制、不走进程间传输）
+# - 核数分配：外层（同时跑几个任务）优先，剩下的核给内层（例如随机森林的 n_jobs），
+#   并用 threadpoolctl 限制每个进程里 BLAS / OpenMP 的线程数，总线程数不超过核数
+# - 每个任务一完成就追加一行到结果文件（JSON Lines），中断后重新运行会跳过已完成的任务
+# - 只有 1 个核（或只有 1 个任务）时直接在当前进程里跑，不启动进程池
+# 任务函数写成 fn(shared, *args)：shared 是 {"X", "y", "folds", "inner"}，返回值要能转成 JSON
+# ==============================
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+_shared = {}   # 工作进程里的共享数据（进程初始化时加载）
+
+
+def plan_cores(n_tasks, n_cores):
+    """返回 (外层进程数, 每个任务的内层线程数)：任务够多时全部给外层，任务比核少时把多出来的核给内层"""
+    outer = max(1, min(n_cores, n_tasks))
+    inner = max(1, n_cores // outer)
+    return outer, inner
+
+
+def _load_shared(directory, n_folds, inner):
+    X = np.load(os.path.join(directory, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(directory, "y.npy"), mmap_mode="r")
+    folds = [
+        (np.load(os.path.join(directory, f"train_{k}.npy"), mmap_mode="r"),
+         np.load(os.path.join(directory, f"val_{k}.npy"), mmap_mode="r"))
+        for k in range(n_folds)
+    ]
+    return {"X": X, "y": y, "folds": folds, "inner": inner}
+
+
+def _init_worker(directory, n_folds, inner):
+    from threadpoolctl import threadpool_limits
+    _shared.update(_load_shared(directory, n_folds, inner))
+    _shared["limits"] = threadpool_limits(inner)   # 保存引用，进程存活期间一直有效
+
+
+def _run_task(fn, args):
+    start = time.perf_counter()
+    return fn(_shared, *args), time.perf_counter() - start
+
+
+class CVExecutor:
+    """
+    用法：
+        with CVExecutor(X, y, folds, n_cores=8, results_path="evals/cv_results.jsonl") as executor:
+            results = executor.run([(任务名, 参数元组), ...], 任务函数)
+    """
+
+    def __init__(self, X, y, folds, n_cores=None, results_path=None):
+        self.n_cores = n_cores or os.cpu_count() or 1
+        self.n_folds = len(folds)
+        self.results_path = results_path
+        self._directory = tempfile.mkdtemp(prefix="cv_shared_")
+        np.save(os.path.join(self._directory, "X.npy"), np.ascontiguousarray(X))
+        np.save(os.path.join(self._directory, "y.npy"), np.ascontiguousarray(y))
+        for k, (train_idx, val_idx) in enumerate(folds):
+            np.save(os.path.join(self._directory, f"train_{k}.npy"), np.asarray(train_idx))
+            np.save(os.path.join(self._directory, f"val_{k}.npy"), np.asarray(val_idx))
+
+        self.done = {}   # 任务名 -> 结果（包括之前运行留下的）
+        if results_path and os.path.exists(results_path):
+            with open(results_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.done[record["key"]] = record["result"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _record(self, key, result, seconds):
+        self.done[key] = result
+        if self.results_path:
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "result": result, "seconds": round(seconds, 3)}, ensure_ascii=False) + "\n")
+
+    def run(self, tasks, fn, should_stop=None, on_result=None):
+        """
+        跑完 tasks 里还没完成的任务，返回 {任务名: 结果}（只包括 tasks 里的）
+        - should_stop()：每提交一个新任务前检查，返回 True 就不再提交（已经在跑的会跑完）
+        - on_result(任务名, 结果)：每个任务完成时调用（包括之前运行就完成的）
+        """
+        for key, _ in tasks:
+            if key in self.done and on_result is not None:
+                on_result(key, self.done[key])
+        todo = [(key, args) for key, args in tasks if key not in self.done]
+        outer, inner = plan_cores(len(todo), self.n_cores)
+
+        if outer == 1:
+            # 单进程：直接用当前进程里的数据（同样限制 BLAS 线程数）
+            from threadpoolctl import threadpool_limits
+            shared = _load_shared(self._directory, self.n_folds, inner)
+            with threadpool_limits(inner):
+                for key, args in todo:
+                    if should_stop is not None and should_stop():
+                        break
+                    start = time.perf_counter()
+                    result = fn(shared, *args)
+                    self._record(key, result, time.perf_counter() - start)
+                    if on_result is not None:
+                        on_result(key, result)
+        elif todo:
+            with ProcessPoolExecutor(outer, initializer=_init_worker,
+                                     initargs=(self._directory, self.n_folds, inner)) as pool:
+                pending = {}
+                queue = iter(todo)
+                stopped = False
+                while True:
+                    # 在途任务最多 2 × 进程数，既不让进程空等，也能及时响应 should_stop
+                    while not stopped and len(pending) < outer * 2:
+                        item = next(queue, None)
+                        if item is None or (should_stop is not None and should_stop()):
+                            stopped = True
+                            break
+                        pending[pool.submit(_run_task, fn, item[1])] = item[0]
+                    if not pending:
+                        break
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        key = pending.pop(future)
+                        result, seconds = future.result()
+                        self._record(key, result, seconds)
+                        if on_result is not None:
+                            on_result(key, result)
+        return {key: self.done[key] for key, _ in tasks if key in self.done}
+
+
+def score_estimator(shared, estimator, fold):
+    """通用任务：克隆估计器，在第 fold 折上训练，返回 estimator.score（分类是准确率，回归是 R²）"""
+    from sklearn.base import clone
+    X, y = shared["X"], shared["y"]
+    train_idx, val_idx = shared["folds"][fold]
+    model = clone(estimator)
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=shared["inner"])
+    model.fit(X[train_idx], y[train_idx])
+    return float(model.score(X[val_idx], y[val_idx]))
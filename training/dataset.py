@@ -0,0 +1,135 @@
+# ==============================
+# 🏠 加州房价数据集（所有训练 / 评估脚本共用）
+# 功能：第一次用到时下载真实数据（失败就生成模拟数据），按 random_state=42 划分训练集 / 测试集，
+#      把四个数组存成 .npy，并在 manifest.json 里记下每个文件的 sha256；
+#      之后每次都直接用 mmap_mode='r' 读取这些 .npy，不再下载或重新生成，所有脚本拿到的划分完全一样
+# 用法：
+#   from training.dataset import load_housing_split
+#   data = load_housing_split()
+#   data.X_train, data.X_test, data.y_train, data.y_test, data.feature_names, data.source
+# 重新生成（例如之前离线、现在能下载真实数据了）：
+#   python -m training.dataset --rebuild
+# ==============================
+import argparse
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+DATASET_DIR = os.environ.get("DATASET_DIR", "data/california_housing")
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+ARRAYS = ("X_train", "X_test", "y_train", "y_test")
+FEATURE_NAMES = ["MedInc", "HouseAge", "AveRooms", "AveBedrms", "Population", "AveOccup", "Latitude", "Longitude"]
+
+HousingSplit = namedtuple("HousingSplit", ARRAYS + ("feature_names", "source"))
+
+
+class DatasetError(Exception):
+    """数据文件缺失或内容和 manifest.json 里的哈希对不上"""
+
+
+def _fetch():
+    """返回 (X, y, 来源)：真实数据下载失败时，用和 Day 13 / 15 一致的模拟数据"""
+    print("📥 正在加载加州房价数据...")
+    try:
+        from sklearn.datasets import fetch_california_housing
+        housing = fetch_california_housing()
+        print("✅ 使用真实加州房价数据")
+        return housing.data, housing.target, "california_housing"
+    except Exception as e:
+        print(f"⚠️ 真实数据加载失败 ({type(e).__name__})，切换到模拟数据...")
+        from sklearn.datasets import make_regression
+        X, y = make_regression(
+            n_samples=20640,
+            n_features=8,
+            n_informative=6,
+            noise=100,
+            random_state=RANDOM_STATE
+        )
+        # 缩放到真实房价范围 [0.15, 5.0]（单位：千美元）
+        y = (y - y.min()) / (y.max() - y.min())
+        y = y * (5.0 - 0.15) + 0.15
+        print("✅ 使用模拟加州房价数据（离线模式）")
+        return X, y, "simulated"
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build(directory=DATASET_DIR):
+    """下载 / 生成数据，划分后写成 .npy + manifest.json；返回 manifest"""
+    from sklearn.model_selection import train_test_split
+
+    X, y, source = _fetch()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+    arrays = {"X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test}
+
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    for name, array in arrays.items():
+        path = os.path.join(directory, f"{name}.npy")
+        np.save(path + ".tmp.npy", np.ascontiguousarray(array, dtype=np.float64))
+        os.replace(path + ".tmp.npy", path)
+        files[name] = {"sha256": _file_hash(path), "shape": list(array.shape)}
+    manifest = {
+        "source": source,
+        "feature_names": FEATURE_NAMES,
+        "test_size": TEST_SIZE,
+        "random_state": RANDOM_STATE,
+        "files": files,
+    }
+    # manifest 最后写：中途被打断时没有 manifest，下次会整体重建
+    with open(os.path.join(directory, "manifest.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(os.path.join(directory, "manifest.json.tmp"), os.path.join(directory, "manifest.json"))
+    print(f"💾 数据集已保存至: {directory}/（{source}，训练 {len(y_train)} 条，测试 {len(y_test)} 条）")
+    return manifest
+
+
+def load_housing_split(directory=DATASET_DIR, verify=True, mmap_mode="r"):
+    """
+    读取划分好的数据集（没有就先生成）
+    - 默认只读内存映射：多个进程同时读也只占一份页缓存；需要修改数组时先 np.array(...) 复制一份
+    - verify=True 时检查每个文件的 sha256，文件被改过就报 DatasetError（用 --rebuild 重新生成）
+    """
+    manifest_path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(manifest_path):
+        build(directory)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    arrays = {}
+    for name in ARRAYS:
+        path = os.path.join(directory, f"{name}.npy")
+        if not os.path.exists(path):
+            raise DatasetError(f"数据文件缺失: {path}（运行 python -m training.dataset --rebuild 重新生成）")
+        if verify and _file_hash(path) != manifest["files"][name]["sha256"]:
+            raise DatasetError(f"数据文件和 manifest.json 不一致: {path}（运行 python -m training.dataset --rebuild 重新生成）")
+        arrays[name] = np.load(path, mmap_mode=mmap_mode)
+    return HousingSplit(feature_names=manifest["feature_names"], source=manifest["source"], **arrays)
+
+
+def split_hash(directory=DATASET_DIR):
+    """整个划分的哈希（四个文件哈希合在一起），用作缓存键"""
+    with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+        files = json.load(f)["files"]
+    return hashlib.sha256("".join(files[name]["sha256"] for name in ARRAYS).encode()).hexdigest()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成 / 检查共享的加州房价数据集")
+    parser.add_argument("--dir", default=DATASET_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="重新下载 / 生成并覆盖现有文件")
+    args = parser.parse_args()
+    if args.rebuild:
+        build(args.dir)
+    data = load_housing_split(args.dir)
+    print(f"✅ 数据集校验通过: {args.dir}/（{data.source}，训练 {data.X_train.shape}，测试 {data.X_test.shape}）")
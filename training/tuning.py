@@ -0,0 +1,247 @@
+# ==============================
+# 🎯 随机森林超参数搜索：逐轮减半（successive halving）
+# 功能：先用很少的资源（一小部分训练样本 + 按比例减少的树）给所有候选打分，
+#      每一轮只留下最好的 1/factor，留下来的候选资源乘以 factor，最后一轮用完整的训练集和完整的树数
+#      → 和 RandomizedSearchCV 用同样的候选、同样的 5 折，但大部分候选只做很便宜的拟合
+# - 支持时间预算：超时就停下，用已经完成的最高一轮里最好的候选
+# - 每打完一个 (候选, 轮次) 就写一次状态文件，中断后重新运行会跳过已完成的部分
+# 热启动（warm_start）：只有 n_estimators 不同的候选共用一个森林，按树数从小到大“接着种”，
+#   每种到一个树数就用新增的树更新验证集预测（不用从头再预测一遍）并打分；
+#   sklearn 热启动时新树的随机种子和从头训练完全一样，所以结果和逐个训练逐位相同
+# 所有拟合都通过 training/cv_executor.py 按 “(候选组, 折)” 拆成任务并行跑，核数在进程和森林的 n_jobs 之间分配
+# ==============================
+import json
+import math
+import os
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold, ParameterSampler
+
+from training.cv_executor import CVExecutor
+
+MIN_TREES = 10   # 资源再少，每个森林也至少这么多棵树
+
+
+def sample_candidates(param_dist, n_candidates, random_state):
+    """和 RandomizedSearchCV(n_iter=n_candidates, random_state=...) 抽到的候选完全一样"""
+    return [dict(params) for params in ParameterSampler(param_dist, n_candidates, random_state=random_state)]
+
+
+def cv_folds(n_samples, n_splits):
+    """和 RandomizedSearchCV(cv=n_splits) 对回归模型用的 KFold（不打乱）一样"""
+    return list(KFold(n_splits).split(np.empty((n_samples, 1))))
+
+
+def rung_fractions(n_rungs, factor):
+    """每一轮的资源比例，例如 3 轮、factor=3 → [1/9, 1/3, 1]"""
+    return [factor ** (i - n_rungs + 1) for i in range(n_rungs)]
+
+
+def scaled_params(params, fraction):
+    """按资源比例缩小树的数量"""
+    return {**params, "n_estimators": max(MIN_TREES, int(round(params["n_estimators"] * fraction)))}
+
+
+def subsample(train_idx, fraction, random_state):
+    """从训练折里取固定的一部分样本（同一折、同一比例每次取的都一样）"""
+    if fraction >= 1:
+        return train_idx
+    rng = np.random.default_rng(random_state)
+    n = max(1, int(len(train_idx) * fraction))
+    return np.sort(rng.permutation(train_idx)[:n])
+
+
+def grow_and_score(forest, tree_counts, X_fit, y_fit, X_val, y_val):
+    """
+    热启动：把 forest 依次种到 tree_counts 里的每个树数（从小到大），每次只训练新增的树，
+    验证集预测也只加上新增树的结果；逐个产出 (树数, R²)
+    forest 可以是新建的，也可以是已经训练过的（会从现有的树数接着种）；
+    已有的树比某个树数还多时抛 ValueError（热启动只能加树，不会删树，打出来的分数会和最后的森林对不上）
+    """
+    existing = len(getattr(forest, "estimators_", []))
+    if min(tree_counts) < existing:
+        raise ValueError(f"森林里已经有 {existing} 棵树，不能再种到 {min(tree_counts)} 棵（热启动只能增加树）")
+    forest.set_params(warm_start=True)
+    X_val32 = np.asarray(X_val, dtype=np.float32)   # 和 RandomForestRegressor.predict 一样先转成 float32
+    pred_sum = np.zeros(len(y_val))
+    built = 0
+    for n in sorted(set(tree_counts)):
+        if n > len(getattr(forest, "estimators_", [])):
+            forest.set_params(n_estimators=n)
+            forest.fit(X_fit, y_fit)
+        for tree in forest.estimators_[built:n]:
+            pred_sum += tree.predict(X_val32, check_input=False)
+        built = n
+        yield n, float(r2_score(y_val, pred_sum / n))
+
+
+def group_by_n_estimators(candidates):
+    """把只有 n_estimators 不同的候选分到一组：{其他参数: [候选编号, ...]}"""
+    groups = {}
+    for i, params in enumerate(candidates):
+        key = tuple(sorted((k, v) for k, v in params.items() if k != "n_estimators"))
+        groups.setdefault(key, []).append(i)
+    return groups
+
+
+def add_free_tree_counts(candidates, n_values):
+    """
+    热启动时，一组候选种到最大树数的过程中，更小的树数都能顺便打分：
+    把参数空间里不超过组内最大树数的 n_estimators 都补成候选（不增加训练量）
+    """
+    expanded = [dict(params) for params in candidates]
+    for members in group_by_n_estimators(candidates).values():
+        largest = max(candidates[i]["n_estimators"] for i in members)
+        present = {candidates[i]["n_estimators"] for i in members}
+        for n in n_values:
+            if n <= largest and n not in present:
+                expanded.append({**candidates[members[0]], "n_estimators": n})
+    return expanded
+
+
+def score_forest_group(shared, base_params, tree_counts, fold, fraction, random_state):
+    """CVExecutor 的任务：在第 fold 折上种一个森林，依次打分每个树数；返回 [[树数, R²], ...]"""
+    X, y = shared["X"], shared["y"]
+    train_idx, val_idx = shared["folds"][fold]
+    fit_idx = subsample(train_idx, fraction, random_state + fold)
+    forest = RandomForestRegressor(**base_params, random_state=random_state, n_jobs=shared["inner"])
+    return [[n, score] for n, score in grow_and_score(forest, tree_counts, X[fit_idx], y[fit_idx], X[val_idx], y[val_idx])]
+
+
+def cross_validate(candidates, executor, fraction=1.0, warm_start=False, random_state=42,
+                   should_stop=None, on_candidate=None):
+    """
+    用 executor 给一批候选做交叉验证，每个 (候选组, 折) 是一个任务：
+    - warm_start=True 时只有 n_estimators 不同的候选是一组（每折种一个森林），否则每个候选自己一组
+    - on_candidate(候选编号, [每折得分])：某个候选所有折都打完分时调用
+    返回 ({候选编号: [每折得分]}（只包括打完的）, 这次实际训练的树数, 逐个训练需要的树数)
+    """
+    if warm_start:
+        units = list(group_by_n_estimators(candidates).values())
+    else:
+        units = [[i] for i in range(len(candidates))]
+
+    tasks, unit_of = [], {}
+    for u, members in enumerate(units):
+        counts = sorted({scaled_params(candidates[i], fraction)["n_estimators"] for i in members})
+        base = {k: v for k, v in candidates[members[0]].items() if k != "n_estimators"}
+        for fold in range(executor.n_folds):
+            # 任务名里带上参数和资源比例：结果文件可以跨运行复用
+            key = json.dumps([base, counts, fold, round(fraction, 6), random_state], sort_keys=True)
+            tasks.append((key, (base, counts, fold, fraction, random_state)))
+            unit_of[key] = (u, fold)
+
+    fold_results = {}   # 组号 -> {折: {树数: 得分}}
+    scores = {}
+    trees = [0, 0]
+    cached = {key for key, _ in tasks if key in executor.done}   # 之前运行留下的结果不算训练量
+
+    def collect(key, result):
+        u, fold = unit_of[key]
+        by_fold = fold_results.setdefault(u, {})
+        by_fold[fold] = {n: score for n, score in result}
+        counts = [scaled_params(candidates[i], fraction)["n_estimators"] for i in units[u]]
+        if key not in cached:
+            trees[0] += max(counts)
+            trees[1] += sum(counts)
+        if len(by_fold) == executor.n_folds:
+            for i, n in zip(units[u], counts):
+                scores[i] = [by_fold[k][n] for k in range(executor.n_folds)]
+                if on_candidate is not None:
+                    on_candidate(i, scores[i])
+
+    executor.run(tasks, score_forest_group, should_stop=should_stop, on_result=collect)
+    return scores, trees[0], trees[1]
+
+
+class SearchState:
+    """搜索进度：{"候选编号:轮次": [每折得分]}，外加累计用时；fingerprint 不一致时不能续跑"""
+
+    def __init__(self, path, fingerprint, restart=False):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.scores = {}
+        self.elapsed = 0.0
+        if not restart and path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("fingerprint") != fingerprint:
+                raise SystemExit(f"❌ 搜索状态文件 {path} 和当前的数据 / 参数空间不一致，确认后加 --restart 从头开始")
+            self.scores = saved["scores"]
+            self.elapsed = saved["elapsed"]
+
+    def get(self, candidate, rung):
+        return self.scores.get(f"{candidate}:{rung}")
+
+    def put(self, candidate, rung, fold_scores, elapsed):
+        self.scores[f"{candidate}:{rung}"] = fold_scores
+        self.elapsed = elapsed
+        if self.path:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": self.fingerprint, "elapsed": elapsed, "scores": self.scores}, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def successive_halving(X, y, candidates, state, factor=3, n_rungs=3, n_splits=5, time_budget=None,
+                       random_state=42, n_cores=None, warm_start=False):
+    """
+    返回 dict：best_params（完整树数）、best_score（最后完成那一轮的 5 折平均 R²）、
+    completed（是否跑完了最后一轮）、每一轮的候选数和拟合次数
+    """
+    folds = cv_folds(len(y), n_splits)
+    fractions = rung_fractions(n_rungs, factor)
+    alive = list(range(len(candidates)))
+    start = time.perf_counter() - state.elapsed   # 续跑时把之前用掉的时间也算进预算
+    rungs, n_fits = [], 0
+    trees_built = trees_naive = 0
+    best = None
+
+    def over_budget():
+        return time_budget is not None and time.perf_counter() - start > time_budget
+
+    with CVExecutor(X, y, folds, n_cores=n_cores) as executor:
+        for rung, fraction in enumerate(fractions):
+            todo = [c for c in alive if state.get(c, rung) is None]
+            if todo:
+                def save(j, fold_scores, rung=rung, todo=todo):
+                    state.put(todo[j], rung, fold_scores, time.perf_counter() - start)
+
+                computed, built, naive = cross_validate(
+                    [candidates[c] for c in todo], executor, fraction, warm_start, random_state,
+                    should_stop=over_budget, on_candidate=save)
+                n_fits += len(computed) * n_splits
+                trees_built += built
+                trees_naive += naive
+
+            results = {c: float(np.mean(state.get(c, rung))) for c in alive if state.get(c, rung) is not None}
+            stopped = len(results) < len(alive)
+            if results:
+                ranked = sorted(results, key=results.get, reverse=True)
+                best = (ranked[0], results[ranked[0]], rung)
+                rungs.append({
+                    "fraction": round(fraction, 4),
+                    "n_candidates": len(results),
+                    "best_score": round(results[ranked[0]], 4),
+                })
+                print(f"  第 {rung + 1}/{n_rungs} 轮：资源 {fraction:.0%}，{len(results)} 个候选，最好 R² {results[ranked[0]]:.4f}")
+            if stopped or rung == n_rungs - 1:
+                break
+            alive = ranked[:max(1, math.ceil(len(ranked) / factor))]
+
+    if best is None:
+        raise SystemExit("❌ 时间预算太小，一个候选都没有打完分")
+    candidate, score, rung = best
+    return {
+        "best_params": candidates[candidate],
+        "best_score": score,
+        "completed": not stopped and rung == n_rungs - 1,
+        "rungs": rungs,
+        "n_fits_this_run": n_fits,
+        "trees_built": trees_built,     # 实际训练的树数（按资源比例缩小后）
+        "trees_naive": trees_naive,     # 同样这些候选逐个训练需要的树数
+        "search_seconds": time.perf_counter() - start,
+    }